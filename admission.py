@@ -0,0 +1,249 @@
+import asyncio
+import contextlib
+import fcntl
+import heapq
+import itertools
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from metrics import LLM_ADMISSION
+
+# Poll interval while waiting for a host-wide slot held by another worker
+SLOT_POLL_INTERVAL = 0.01
+
+# Queue priorities: interactive chat is served ahead of bulk /api/ask traffic
+CHAT_PRIORITY = 1
+ASK_PRIORITY = 0
+
+
+class _Waiter:
+    __slots__ = ('wake', 'granted', 'cancelled')
+
+    def __init__(self, wake):
+        self.wake = wake
+        self.granted = False
+        self.cancelled = False
+
+
+class AdmissionController:
+    """Concurrency limit with a short priority queue in front of LLM calls.
+
+    At most max_in_flight calls run at once. Further callers wait in a queue
+    (higher priority first, then arrival order) for at most queue_timeout
+    seconds; callers beyond max_queue, or still waiting at the deadline,
+    are not admitted so the caller can answer without the LLM instead of
+    blocking. With a directory (ADMISSION_DIR) the limit is host-wide:
+    every admitted call also holds one of max_in_flight lock files, so
+    gunicorn workers together never run more LLM calls than that and the
+    remaining workers stay free for cheap routes. Locks held by a worker
+    that dies are released by the kernel.
+    """
+
+    def __init__(self, max_in_flight: int = 32, max_queue: int = 64, queue_timeout: float = 1.0,
+                 directory: Optional[str] = None):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiters = []
+        self._queued = 0
+        self._order = itertools.count()
+        self._slot_files = None
+        self._slot_pid = None
+        self._held_slots = set()
+        self.admitted = 0
+        self.shed = 0
+        self.timed_out = 0
+
+    @classmethod
+    def from_env(cls) -> 'AdmissionController':
+        """Build a controller configured from ADMISSION_* variables"""
+        return cls(
+            max_in_flight=int(os.getenv('ADMISSION_MAX_IN_FLIGHT', '32')),
+            max_queue=int(os.getenv('ADMISSION_MAX_QUEUE', '64')),
+            queue_timeout=float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '1')),
+            directory=os.getenv('ADMISSION_DIR') or None
+        )
+
+    # In-process slots and queue
+
+    def _enqueue(self, priority: int, wake) -> Optional[_Waiter]:
+        """Take a slot now (returns None), or join the queue; raises LookupError when the queue is full"""
+        with self._lock:
+            if self._in_flight < self.max_in_flight and not self._queued:
+                self._in_flight += 1
+                return None
+            if self._queued >= self.max_queue:
+                raise LookupError('admission queue full')
+            waiter = _Waiter(wake)
+            heapq.heappush(self._waiters, (-priority, next(self._order), waiter))
+            self._queued += 1
+            return waiter
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Leave the queue at the deadline; False if a slot was handed over meanwhile"""
+        with self._lock:
+            if waiter.granted:
+                return False
+            waiter.cancelled = True
+            self._queued -= 1
+            return True
+
+    def _release_local(self) -> None:
+        """Hand the slot to the best waiting caller, or free it"""
+        with self._lock:
+            while self._waiters:
+                _, _, waiter = heapq.heappop(self._waiters)
+                if waiter.cancelled:
+                    continue
+                waiter.granted = True
+                self._queued -= 1
+                waiter.wake()
+                return
+            self._in_flight -= 1
+
+    # Host-wide slots shared by all workers
+
+    def _try_slot(self) -> Optional[int]:
+        if not self.directory:
+            return -1
+        with self._lock:
+            if self._slot_pid != os.getpid():
+                # Lock files are opened per process; descriptors inherited over a fork share the parent's locks
+                os.makedirs(self.directory, exist_ok=True)
+                self._slot_files = [open(os.path.join(self.directory, f"slot-{i}.lock"), 'a')
+                                    for i in range(self.max_in_flight)]
+                self._slot_pid = os.getpid()
+                self._held_slots = set()
+            for i, slot_file in enumerate(self._slot_files):
+                if i in self._held_slots:
+                    continue
+                try:
+                    fcntl.flock(slot_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                self._held_slots.add(i)
+                return i
+        return None
+
+    def _release_slot(self, slot: int) -> None:
+        if slot < 0:
+            return
+        with self._lock:
+            if self._slot_pid == os.getpid() and slot in self._held_slots:
+                fcntl.flock(self._slot_files[slot], fcntl.LOCK_UN)
+                self._held_slots.discard(slot)
+
+    def _record(self, outcome: str) -> None:
+        with self._lock:
+            if outcome in ('admitted', 'queued'):
+                self.admitted += 1
+            elif outcome == 'shed':
+                self.shed += 1
+            else:
+                self.timed_out += 1
+        LLM_ADMISSION.inc(outcome=outcome)
+
+    def _acquire(self, priority: int) -> Optional[int]:
+        """Wait for admission; returns the host slot (-1 without a directory) or None if not admitted"""
+        deadline = time.monotonic() + self.queue_timeout
+        event = threading.Event()
+        try:
+            waiter = self._enqueue(priority, event.set)
+        except LookupError:
+            self._record('shed')
+            return None
+        if waiter is not None and not event.wait(self.queue_timeout) and self._abandon(waiter):
+            self._record('timeout')
+            return None
+        while True:
+            slot = self._try_slot()
+            if slot is not None:
+                self._record('admitted' if waiter is None else 'queued')
+                return slot
+            if time.monotonic() >= deadline:
+                self._release_local()
+                self._record('timeout')
+                return None
+            time.sleep(SLOT_POLL_INTERVAL)
+
+    async def _acquire_async(self, priority: int) -> Optional[int]:
+        """Async variant of _acquire; waiting does not block the event loop"""
+        deadline = time.monotonic() + self.queue_timeout
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(True))
+
+        try:
+            waiter = self._enqueue(priority, wake)
+        except LookupError:
+            self._record('shed')
+            return None
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(granted), self.queue_timeout)
+            except asyncio.TimeoutError:
+                if self._abandon(waiter):
+                    self._record('timeout')
+                    return None
+            except asyncio.CancelledError:
+                # The request went away while queued; pass on a slot it was just given
+                if not self._abandon(waiter):
+                    self._release_local()
+                raise
+        try:
+            while True:
+                slot = self._try_slot()
+                if slot is not None:
+                    self._record('admitted' if waiter is None else 'queued')
+                    return slot
+                if time.monotonic() >= deadline:
+                    self._release_local()
+                    self._record('timeout')
+                    return None
+                await asyncio.sleep(SLOT_POLL_INTERVAL)
+        except asyncio.CancelledError:
+            self._release_local()
+            raise
+
+    def _release(self, slot: int) -> None:
+        self._release_slot(slot)
+        self._release_local()
+
+    @contextlib.contextmanager
+    def admit(self, priority: int = 0):
+        """Yield True once admitted, or False if the call should be skipped (shed or queue deadline passed)"""
+        slot = self._acquire(priority)
+        try:
+            yield slot is not None
+        finally:
+            if slot is not None:
+                self._release(slot)
+
+    @contextlib.asynccontextmanager
+    async def admit_async(self, priority: int = 0):
+        """Async variant of admit"""
+        slot = await self._acquire_async(priority)
+        try:
+            yield slot is not None
+        finally:
+            if slot is not None:
+                self._release(slot)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'max_in_flight': self.max_in_flight,
+                'scope': 'host' if self.directory else 'process',
+                'in_flight': self._in_flight,
+                'queued': self._queued,
+                'admitted': self.admitted,
+                'shed': self.shed,
+                'timed_out': self.timed_out
+            }
@@ -1,14 +1,26 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 import os
 from dotenv import load_dotenv
-from chatbot import ZambianFarmerChatbot
+from chatbot import PROMPT_BUDGETS, PROMPT_MAX_TOKENS, ZambianFarmerChatbot
+from http_client import http_client
+from admission import ASK_PRIORITY
+from rate_limit import RateLimiter
+from auth import TokenVerifier
+from circuit_breaker import CircuitBreaker, circuit_breaker_stats
+from concurrency import SingleFlight, gather, single_flight_stats
+from farm_profile import FarmProfileStore
+from metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE, HTTP_LATENCY, HTTP_REQUESTS, STAGE_LATENCY, registry, stage
+)
+from prompt import PromptSection, assemble, prompt_stats
+from market_prices import parse_day
+from log_pipeline import begin_request, configure_logging, end_request, log_request, logging_stats, StreamWithFields
 import json
-import requests  # Add this import at the top with others
-import jwt
 import logging
-from logging.handlers import RotatingFileHandler
 import datetime
+import math
+import time
 
 # Load environment variables
 load_dotenv()
@@ -21,26 +33,134 @@ app.config['ENV'] = os.getenv('FLASK_ENV', 'production')
 app.config['DEBUG'] = False
 app.config['TESTING'] = False
 
-# Configure logging for production
+# Configure logging for production: records are queued and written as JSON
+# lines to logs/netagrow-chatbot.log by a background thread
 if not app.debug:
-    if not os.path.exists('logs'):
-        os.mkdir('logs')
-    file_handler = RotatingFileHandler('logs/netagrow-chatbot.log', maxBytes=10240, backupCount=10)
-    file_handler.setFormatter(logging.Formatter(
-        '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-    ))
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.setLevel(logging.INFO)
+    configure_logging()
     app.logger.info('Netagrow Chatbot startup')
 
-# Initialize the chatbot
+logger = logging.getLogger(__name__)
+
+# Initialize the chatbot. LAZY_STARTUP=true leaves importing openai and building
+# the clients and retrieval index to the first request that needs them, for
+# fast cold starts when instances scale to zero
 chatbot = ZambianFarmerChatbot()
+if os.getenv('LAZY_STARTUP', 'false').lower() != 'true':
+    chatbot.warm_up()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.log_token = begin_request()
+
+@app.after_request
+def record_request_metrics(response):
+    """Count, time and log every request by route template.
+
+    The latency metric of a stream stops when the headers are sent; its log
+    record is written once the body has been streamed, with the full latency
+    and everything annotated while streaming.
+    """
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    HTTP_REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+    if 'request_started' in g:
+        started = g.request_started
+        elapsed = time.perf_counter() - started
+        HTTP_LATENCY.observe(elapsed, route=route)
+        fields = end_request(g.pop('log_token'))
+        fields.update(route=route, method=request.method, status=response.status_code)
+        if response.is_streamed:
+            fields['first_byte_ms'] = round(elapsed * 1000, 1)
+
+            def finish():
+                log_request(dict(fields, latency_ms=round((time.perf_counter() - started) * 1000, 1)))
+            response.response = StreamWithFields(response.response, fields, finish)
+        else:
+            log_request(dict(fields, latency_ms=round(elapsed * 1000, 1)))
+    return response
 
-SUPABASE_JWT_SECRET = os.getenv('SUPABASE_JWT_SECRET')
 SUPABASE_ANON_KEY = os.getenv('SUPABASE_ANON_KEY')
-SUPABASE_USER_LOOKUP_URL = "https://eobkhsunhiqtfkgkaovv.supabase.co/functions/v1/user-lookup"
+SUPABASE_FUNCTIONS_URL = os.getenv('SUPABASE_FUNCTIONS_URL', 'https://eobkhsunhiqtfkgkaovv.supabase.co/functions/v1')
+SUPABASE_USER_LOOKUP_URL = f"{SUPABASE_FUNCTIONS_URL}/user-lookup"
+
+# Concurrent lookups for the same farmer share one Supabase request
+supabase_flight = SingleFlight('supabase')
+
+# Supabase calls fail fast while it is down; the timeout follows its recent latency
+supabase_breaker = CircuitBreaker.from_env('supabase', max_timeout=10)
+
+# Farmer lookups are cached already rendered for the /api/ask prompt
+farm_profiles = FarmProfileStore.from_env()
+FARM_PROFILE_WEBHOOK_SECRET = os.getenv('FARM_PROFILE_WEBHOOK_SECRET')
+
+# /api/ask gathers its inputs concurrently within these limits (seconds)
+ASK_DEADLINE = float(os.getenv('ASK_DEADLINE', '8'))
+ASK_LOOKUP_TIMEOUT = float(os.getenv('ASK_LOOKUP_TIMEOUT', '6'))
+ASK_WEATHER_TIMEOUT = float(os.getenv('ASK_WEATHER_TIMEOUT', '4'))
+
+# Per-farmer and per-IP request limits on /api/ask, plus a daily LLM token budget
+rate_limiter = RateLimiter.from_env()
+
+def client_ip(remote_addr, headers):
+    """Client address, trusting X-Real-IP only when it was set by a proxy on this host (nginx)"""
+    if remote_addr in ('127.0.0.1', '::1') and headers.get('X-Real-IP'):
+        return headers['X-Real-IP']
+    return remote_addr
+
+def ask_identity(email=None, phone=None, verified=False):
+    """Rate limit identity of the farmer asking, or None if anonymous.
 
+    Only an identity proven by a verified token counts: anyone can put a
+    farmer's email in the body, so claimed identities are limited and
+    charged by IP instead of using up that farmer's allowance."""
+    if not verified:
+        return None
+    if email:
+        return f"email:{email.strip().lower()}"
+    if phone:
+        return f"phone:{phone.strip()}"
+    return None
+
+# Verified access tokens are cached until they expire
+token_verifier = TokenVerifier.from_env()
+
+def bearer_token(headers):
+    auth_header = headers.get('Authorization', '')
+    return auth_header[len('Bearer '):] if auth_header.startswith('Bearer ') else None
+
+def authenticate(headers, email=None, phone=None):
+    """(email, phone, verified) to look the farmer up by: the verified token's when a bearer token
+    is sent, otherwise those given in the request (verified False). Raises PermissionError for an
+    invalid or expired token."""
+    token = bearer_token(headers)
+    if not token or not token_verifier.enabled:
+        return email, phone, False
+    verified = token_verifier.verify(token)
+    if verified is None:
+        raise PermissionError('invalid or expired token')
+    if verified['email'] or verified['phone']:
+        return verified['email'], verified['phone'], True
+    return email, phone, False
+
+def day_arg(args, name):
+    """ISO date query parameter as a day number, or None if absent; raises ValueError if malformed"""
+    value = args.get(name)
+    return parse_day(value) if value else None
+
+def rate_limit_error(retry_after):
+    """Body and headers of the 429 reply to a client over its request rate"""
+    seconds = max(1, math.ceil(retry_after))
+    return {'error': 'Too many requests, please try again shortly', 'retry_after': seconds}, {'Retry-After': str(seconds)}
+
+SUPPORTED_LANGUAGES = [
+    {'code': 'english', 'name': 'English'},
+    {'code': 'bemba', 'name': 'Bemba'},
+    {'code': 'njanja', 'name': 'Nyanja'},
+    {'code': 'tonga', 'name': 'Tonga'},
+    {'code': 'lozi', 'name': 'Lozi'}
+]
+
+@supabase_flight.coalesce
 def get_user_info(email=None, phone=None):
     headers = {
         "Authorization": f"Bearer {SUPABASE_ANON_KEY}",
@@ -52,23 +172,28 @@ def get_user_info(email=None, phone=None):
     if phone:
         params["phone"] = phone
     params["include"] = "basic,farms,crops"
-    try:
-        response = requests.get(SUPABASE_USER_LOOKUP_URL, headers=headers, params=params, timeout=10)
-        if response.status_code == 200:
-            return response.json()
-    except Exception:
-        pass
+    # Failures raise rather than return None, so an outage is not cached as "farmer unknown"
+    with supabase_breaker.guard() as call:
+        response = http_client.get(SUPABASE_USER_LOOKUP_URL, headers=headers, params=params, timeout=call.timeout)
+        call.check(response.status_code)
+    if call.outcome != 'ok':
+        raise RuntimeError(f"User lookup failed: {response.status_code}")
+    if response.status_code == 200:
+        return response.json()
     return None
 
+@supabase_flight.coalesce
 def get_farm_info_from_db(email):
-    url = "https://eobkhsunhiqtfkgkaovv.supabase.co/functions/v1/marketing-data"
+    url = f"{SUPABASE_FUNCTIONS_URL}/marketing-data"
     headers = {
         "Content-Type": "application/json",
         "Authorization": f"Bearer {SUPABASE_ANON_KEY}"
     }
     payload = {"email": email}
     try:
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
+        with supabase_breaker.guard() as call:
+            response = http_client.post(url, json=payload, headers=headers, timeout=call.timeout)
+            call.check(response.status_code)
         if response.status_code == 200:
             data = response.json()
             return {
@@ -80,21 +205,17 @@ def get_farm_info_from_db(email):
         else:
             return None
     except Exception as e:
-        print(f"Error calling Supabase Edge Function: {e}")
+        logger.warning("Error calling Supabase Edge Function: %s", e)
         return None
 
 def get_user_id_from_token():
-    auth_header = request.headers.get('Authorization', None)
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return None
-    token = auth_header.split(' ')[1]
-    try:
-        decoded = jwt.decode(token, SUPABASE_JWT_SECRET, algorithms=["HS256"])
-        return decoded.get('sub')  # 'sub' is the user ID in Supabase
-    except Exception as e:
-        print(f"JWT decode error: {e}")
+    token = bearer_token(request.headers)
+    if not token or not token_verifier.enabled:
         return None
+    verified = token_verifier.verify(token)
+    return verified['claims'].get('sub') if verified else None  # 'sub' is the user ID in Supabase
 
+@supabase_flight.coalesce
 def get_farm_info_from_user_lookup(search_value, search_type):
     headers = {
         "Authorization": f"Bearer {SUPABASE_ANON_KEY}",
@@ -102,7 +223,9 @@ def get_farm_info_from_user_lookup(search_value, search_type):
     }
     params = {search_type: search_value, "include": "basic,farms,crops"}
     try:
-        response = requests.get(SUPABASE_USER_LOOKUP_URL, headers=headers, params=params, timeout=10)
+        with supabase_breaker.guard() as call:
+            response = http_client.get(SUPABASE_USER_LOOKUP_URL, headers=headers, params=params, timeout=call.timeout)
+            call.check(response.status_code)
         if response.status_code == 200:
             data = response.json()
             if data.get("success") and data.get("data"):
@@ -110,12 +233,120 @@ def get_farm_info_from_user_lookup(search_value, search_type):
             else:
                 return None
         else:
-            print(f"User lookup failed: {response.status_code} {response.text}")
+            logger.warning("User lookup failed: %s %s", response.status_code, response.text)
             return None
     except Exception as e:
-        print(f"Error calling User Lookup API: {e}")
+        logger.warning("Error calling User Lookup API: %s", e)
         return None
 
+# /api/ask prompt budget; the chatbot's system prompt is sent alongside
+ASK_PROMPT_MAX_TOKENS = PROMPT_MAX_TOKENS - PROMPT_BUDGETS['system']
+
+ASK_INSTRUCTIONS = """Please provide a friendly, helpful response in {language} that:
+1. Addresses their specific question
+2. Uses their farm information when relevant
+3. Provides practical farming advice
+4. Is encouraging and supportive
+5. Uses simple, clear language suitable for farmers
+
+Keep your response conversational and under 200 words."""
+
+def build_ask_prompt(farm_context, user_message, language, extra_context=''):
+    """Build the /api/ask prompt from the farm context and the farmer's question.
+
+    Sections are held to their token budgets; if the prompt is still too long,
+    weather/knowledge lines are cut first, then the farm context.
+    """
+    instructions = ASK_INSTRUCTIONS.format(language=language)
+    texts, _ = assemble([
+        PromptSection('instructions', instructions, ASK_PROMPT_MAX_TOKENS, priority=4, required=True),
+        PromptSection('farm', farm_context, farm_profiles.max_tokens, priority=2, required=True),
+        PromptSection('knowledge', extra_context, PROMPT_BUDGETS['knowledge'], priority=1),
+        PromptSection('question', user_message, PROMPT_BUDGETS['question'], priority=3, required=True)
+    ], ASK_PROMPT_MAX_TOKENS, kind='ask')
+    extra = f"\nRelevant information:\n{texts['knowledge']}\n" if texts['knowledge'] else ""
+    return f"""You are a helpful Zambian farming assistant. Here is the farmer's information:
+
+{texts['farm']}
+{extra}
+Farmer's Question: {texts['question']}
+
+{instructions}"""
+
+def build_extra_context(weather, snippets):
+    """Render live weather and knowledge base snippets for the /api/ask prompt"""
+    lines = []
+    if weather and 'error' not in weather:
+        lines.append(f"- Current weather: {chatbot._format_weather(weather)}")
+    for snippet in snippets or []:
+        lines.append(f"- {snippet}")
+    return "\n".join(lines)
+
+def gather_ask_inputs(user_message, email=None, phone=None):
+    """Fetch the farmer record, question weather and knowledge snippets concurrently.
+
+    The request waits for the slowest source up to ASK_DEADLINE instead of the
+    sum of all of them; sources that time out come back as None.
+    """
+    sources = {
+        'user': (lambda: farm_profiles.get(get_user_info, email=email, phone=phone), ASK_LOOKUP_TIMEOUT),
+        'knowledge': (lambda: chatbot.get_knowledge_snippets(user_message), ASK_LOOKUP_TIMEOUT)
+    }
+    location = chatbot.get_weather_location(user_message)
+    if location:
+        sources['weather'] = (lambda: chatbot.get_weather_info(location), ASK_WEATHER_TIMEOUT)
+    return gather(sources, ASK_DEADLINE)
+
+def resolve_ask_context(user_message, language, email=None, phone=None):
+    """Return (profile, prompt) for /api/ask, or (None, None) if the farmer is unknown.
+
+    If the lookup times out or Supabase is unavailable the question is still
+    answered, without farm data.
+    """
+    with stage('ask', 'lookup'):
+        results, report = gather_ask_inputs(user_message, email=email, phone=phone)
+    for source, outcome in report.items():
+        STAGE_LATENCY.observe(outcome['elapsed'], flow='ask', stage=f"lookup_{source}")
+    profile = results['user']
+    if profile and profile['found']:
+        farm_context = profile['context']
+    elif report['user']['status'] in ('timeout', 'error'):
+        profile = {}
+        farm_context = "Farm data is temporarily unavailable."
+    else:
+        return None, None
+    with stage('ask', 'render'):
+        extra_context = build_extra_context(results.get('weather'), results['knowledge'])
+        return profile, build_ask_prompt(farm_context, user_message, language, extra_context)
+
+def sse_event(payload):
+    """Encode a payload as one Server-Sent Events message"""
+    return f"data: {json.dumps(payload)}\n\n"
+
+def sse_stream(chunks):
+    """Wrap text chunks as SSE token events followed by a final done event"""
+    try:
+        for chunk in chunks:
+            yield sse_event({'type': 'token', 'content': chunk})
+    except Exception as e:
+        yield sse_event({'type': 'error', 'error': str(e)})
+    yield sse_event({'type': 'done'})
+
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    # Stop nginx from buffering the stream
+    'X-Accel-Buffering': 'no'
+}
+
+def ask_fallback_response(profile, user_message=None, language='english'):
+    """Reply used by /api/ask when the LLM gives no answer (unavailable or shed under load)"""
+    if user_message:
+        name = profile['full_name'] if profile else 'farmer'
+        return f"Hello {name}! " + chatbot._get_rule_based_response(user_message, language)
+    if not profile:
+        return "Hello farmer! How can I help you with your farming today?"
+    return f"Hello {profile['full_name']}! I can see you have {profile['farm_count']} farm(s). How can I help you with your farming today?"
+
 @app.route('/')
 def home():
     return "Zambian Farmer Chatbot API is running."
@@ -132,7 +363,7 @@ def chat():
             return jsonify({'error': 'No message provided'}), 400
         
         # Get response from chatbot
-        response = chatbot.get_response(user_message, language)
+        response = chatbot.get_response(user_message, language, data.get('session_id'))
         
         return jsonify({
             'response': response,
@@ -142,6 +373,20 @@ def chat():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Stream the chat answer to the frontend as Server-Sent Events"""
+    data = request.get_json(silent=True) or {}
+    user_message = data.get('message', '')
+    language = data.get('language', 'english')
+    
+    if not user_message:
+        return jsonify({'error': 'No message provided'}), 400
+    
+    chunks = chatbot.stream_response(user_message, language, data.get('session_id'))
+    return Response(stream_with_context(sse_stream(chunks)),
+                    mimetype='text/event-stream', headers=SSE_HEADERS)
+
 @app.route('/api/weather/<location>')
 def get_weather(location):
     """Get weather information for a specific location"""
@@ -153,13 +398,52 @@ def get_weather(location):
 
 @app.route('/api/market-prices')
 def get_market_prices():
-    """Get current market prices for common crops"""
+    """Get current market prices for common crops (optionally ?crop=, ?market=, ?province=, ?as_of=)"""
+    try:
+        as_of = day_arg(request.args, 'as_of')
+    except ValueError:
+        return jsonify({'error': 'as_of must be a date (YYYY-MM-DD)'}), 400
     try:
-        prices = chatbot.get_market_prices()
+        crop = request.args.get('crop')
+        prices = chatbot.get_market_prices([crop] if crop else None, market=request.args.get('market'),
+                                           province=request.args.get('province'), as_of=as_of)
         return jsonify(prices)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/market-prices/<crop>/history')
+def get_market_price_history(crop):
+    """Average price of a crop per period with its moving average (?market=, ?province=, ?since=, ?until=, ?interval=)"""
+    try:
+        since, until = day_arg(request.args, 'since'), day_arg(request.args, 'until')
+        interval = int(request.args.get('interval', '7'))
+    except ValueError:
+        return jsonify({'error': 'since and until must be dates (YYYY-MM-DD), interval a number of days'}), 400
+    history = chatbot.market_prices.history(crop, market=request.args.get('market'),
+                                            province=request.args.get('province'),
+                                            since=since, until=until, interval=interval)
+    if history is None:
+        return jsonify({'error': f"No price data for {crop}"}), 404
+    return jsonify({
+        'crop': crop.lower(),
+        'unit': chatbot.market_prices.unit(crop),
+        'interval': max(1, interval),
+        'window': chatbot.market_prices.window,
+        'history': history
+    })
+
+@app.route('/api/market-prices/<crop>/regions')
+def get_market_price_regions(crop):
+    """Average price of a crop per province compared with the national average (optionally ?as_of=)"""
+    try:
+        as_of = day_arg(request.args, 'as_of')
+    except ValueError:
+        return jsonify({'error': 'as_of must be a date (YYYY-MM-DD)'}), 400
+    regions = chatbot.market_prices.regions(crop, as_of=as_of)
+    if regions is None:
+        return jsonify({'error': f"No price data for {crop}"}), 404
+    return jsonify(dict(regions, crop=crop.lower(), window=chatbot.market_prices.window))
+
 @app.route('/api/crop-info/<crop_name>')
 def get_crop_info(crop_name):
     """Get detailed information about a specific crop"""
@@ -181,103 +465,106 @@ def identify_pest_disease(query):
 @app.route('/api/languages')
 def get_supported_languages():
     """Get list of supported languages"""
-    languages = [
-        {'code': 'english', 'name': 'English'},
-        {'code': 'bemba', 'name': 'Bemba'},
-        {'code': 'njanja', 'name': 'Nyanja'},
-        {'code': 'tonga', 'name': 'Tonga'},
-        {'code': 'lozi', 'name': 'Lozi'}
-    ]
-    return jsonify(languages)
+    return jsonify(SUPPORTED_LANGUAGES)
 
 @app.route('/api/ask', methods=['POST'])
 def ask_chatbot():
     data = request.get_json()
     user_message = data.get('message', '')
     language = data.get('language', 'english')
-    email = data.get('email')
-    phone = data.get('phone')
     
     if not user_message:
         return jsonify({'error': 'No message provided'}), 400
     
-    user_info = get_user_info(email=email, phone=phone)
-    if not user_info or not user_info.get("data"):
-        return jsonify({"response": "Sorry, I couldn't find your farm information in the database."})
-    
-    # Extract farm information for context
-    user_data = user_info['data']
-    farms = user_data.get('farms', [])
-    
-    # Build farm context
-    farm_context = ""
-    if farms:
-        farm_context = f"Farmer: {user_data.get('full_name', 'Unknown')}\n"
-        farm_context += f"Location: {user_data.get('farmer_profile', {}).get('location', 'Not specified')}\n"
-        farm_context += f"Total Farms: {len(farms)}\n"
-        
-        for i, farm in enumerate(farms, 1):
-            farm_context += f"\nFarm {i}: {farm.get('name', 'Unknown Farm')}\n"
-            farm_context += f"  Size: {farm.get('size', 0)} hectares\n"
-            farm_context += f"  Location: {farm.get('location', 'Not specified')}\n"
-            
-            fields = farm.get('fields', [])
-            if fields:
-                farm_context += f"  Fields: {len(fields)}\n"
-                for field in fields:
-                    farm_context += f"    - {field.get('name', 'Unknown Field')} ({field.get('size', 0)} ha, {field.get('soil_type', 'unknown soil')})\n"
-                    
-                    crops = field.get('crops', [])
-                    if crops:
-                        farm_context += f"      Crops:\n"
-                        for crop in crops:
-                            status = crop.get('status', 'unknown')
-                            variety = crop.get('variety', '')
-                            planting_date = crop.get('planting_date', '')
-                            harvest_date = crop.get('expected_harvest_date', '')
-                            
-                            crop_info = f"        • {crop.get('name', 'Unknown')}"
-                            if variety:
-                                crop_info += f" ({variety})"
-                            if status:
-                                crop_info += f" - Status: {status}"
-                            if planting_date:
-                                crop_info += f" - Planted: {planting_date}"
-                            if harvest_date:
-                                crop_info += f" - Expected Harvest: {harvest_date}"
-                            
-                            farm_context += crop_info + "\n"
-    else:
-        farm_context = f"Farmer: {user_data.get('full_name', 'Unknown')}\nNo farm data available yet."
+    try:
+        email, phone, verified = authenticate(request.headers, data.get('email'), data.get('phone'))
+    except PermissionError:
+        return jsonify({'error': 'Invalid or expired token'}), 401
+    identity = ask_identity(email, phone, verified)
+    ip = client_ip(request.remote_addr, request.headers)
+    retry_after = rate_limiter.check(identity, ip)
+    if retry_after:
+        body, headers = rate_limit_error(retry_after)
+        return jsonify(body), 429, headers
     
-    # Create AI context
-    ai_context = f"""You are a helpful Zambian farming assistant. Here is the farmer's information:
-
-{farm_context}
-
-Farmer's Question: {user_message}
-
-Please provide a friendly, helpful response in {language} that:
-1. Addresses their specific question
-2. Uses their farm information when relevant
-3. Provides practical farming advice
-4. Is encouraging and supportive
-5. Uses simple, clear language suitable for farmers
-
-Keep your response conversational and under 200 words."""
+    profile, ai_context = resolve_ask_context(user_message, language, email=email, phone=phone)
+    if profile is None:
+        return jsonify({"response": "Sorry, I couldn't find your farm information in the database."})
 
-    # Generate AI response
+    # Generate AI response; over today's token budget the rule-based fallback answers
+    budget_identity = identity or f"ip:{ip}"
     try:
-        ai_response = chatbot._get_openai_response(ai_context, language)
+        ai_response = None
+        if not rate_limiter.over_budget(budget_identity):
+            with stage('ask', 'llm'), rate_limiter.charging(budget_identity):
+                ai_response = chatbot._get_openai_response(ai_context, language, ground=False,
+                                                           priority=ASK_PRIORITY)
         return jsonify({
-            "response": ai_response
+            "response": ai_response or ask_fallback_response(profile, user_message, language)
         })
     except Exception as e:
         # Fallback response if AI fails
         return jsonify({
-            "response": f"Hello {user_data.get('full_name', 'farmer')}! I can see you have {len(farms)} farm(s). How can I help you with your farming today?"
+            "response": ask_fallback_response(profile)
         })
 
+@app.route('/api/ask/stream', methods=['POST'])
+def ask_chatbot_stream():
+    """Streaming variant of /api/ask using Server-Sent Events"""
+    data = request.get_json(silent=True) or {}
+    user_message = data.get('message', '')
+    language = data.get('language', 'english')
+    
+    if not user_message:
+        return jsonify({'error': 'No message provided'}), 400
+    
+    try:
+        email, phone, verified = authenticate(request.headers, data.get('email'), data.get('phone'))
+    except PermissionError:
+        return jsonify({'error': 'Invalid or expired token'}), 401
+    identity = ask_identity(email, phone, verified)
+    ip = client_ip(request.remote_addr, request.headers)
+    retry_after = rate_limiter.check(identity, ip)
+    if retry_after:
+        body, headers = rate_limit_error(retry_after)
+        return jsonify(body), 429, headers
+    
+    profile, ai_context = resolve_ask_context(user_message, language, email=email, phone=phone)
+    if profile is None:
+        chunks = iter(["Sorry, I couldn't find your farm information in the database."])
+    else:
+        budget_identity = identity or f"ip:{ip}"
+        
+        def answer():
+            streamed = False
+            if not rate_limiter.over_budget(budget_identity):
+                with stage('ask', 'llm'), rate_limiter.charging(budget_identity):
+                    streamed = yield from chatbot._stream_openai_response(ai_context, language, ground=False,
+                                                                          priority=ASK_PRIORITY)
+            if not streamed:
+                yield ask_fallback_response(profile, user_message, language)
+        chunks = answer()
+    
+    return Response(stream_with_context(sse_stream(chunks)),
+                    mimetype='text/event-stream', headers=SSE_HEADERS)
+
+@app.route('/api/farm-profile/invalidate', methods=['POST'])
+def invalidate_farm_profile():
+    """Drop a farmer's cached profile after their farm record changes (e.g. from a Supabase webhook)"""
+    if FARM_PROFILE_WEBHOOK_SECRET and request.headers.get('X-Webhook-Secret') != FARM_PROFILE_WEBHOOK_SECRET:
+        return jsonify({'error': 'Unauthorized'}), 401
+    data = request.get_json(silent=True) or {}
+    email = data.get('email')
+    phone = data.get('phone')
+    if not email and not phone:
+        return jsonify({'error': 'email or phone required'}), 400
+    return jsonify({'invalidated': farm_profiles.invalidate(email=email, phone=phone)})
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics, summed over all gunicorn workers when METRICS_DIR is set"""
+    return Response(registry.render(), content_type=METRICS_CONTENT_TYPE)
+
 @app.route('/health')
 def health_check():
     """Health check endpoint for monitoring"""
@@ -287,7 +574,20 @@ def health_check():
             'status': 'healthy',
             'timestamp': str(datetime.datetime.now()),
             'version': '1.0.0',
-            'environment': app.config['ENV']
+            'environment': app.config['ENV'],
+            'response_cache': chatbot.response_cache.stats(),
+            'semantic_cache': chatbot.semantic_cache.stats(),
+            'sessions': chatbot.sessions.stats(),
+            'farm_profiles': farm_profiles.stats(),
+            'market_prices': chatbot.market_prices.stats(),
+            'prompt_tokens': prompt_stats.stats(),
+            'http_pools': http_client.stats(),
+            'single_flight': single_flight_stats(),
+            'circuit_breakers': circuit_breaker_stats(),
+            'admission': chatbot.admission.stats(),
+            'rate_limits': rate_limiter.stats(),
+            'verified_tokens': token_verifier.stats(),
+            'logging': logging_stats()
         }), 200
     except Exception as e:
         return jsonify({
@@ -297,5 +597,6 @@ def health_check():
         }), 500
 
 if __name__ == '__main__':
+    chatbot.start_weather_prefetcher()
     port = int(os.environ.get('PORT', 8000))
     app.run(host='0.0.0.0', port=port) 
\ No newline at end of file
@@ -0,0 +1,420 @@
+"""
+Async (ASGI) entry point serving the same API as app.py.
+
+Upstream calls to OpenAI, WeatherAPI and Supabase are awaited instead of
+blocking a worker, so one process can hold hundreds of in-flight requests.
+Run with:
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port 8000
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi_app:app
+"""
+
+import asyncio
+import contextlib
+import datetime
+import logging
+import time
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from admission import ASK_PRIORITY
+from app import (
+    ASK_DEADLINE, ASK_LOOKUP_TIMEOUT, ASK_WEATHER_TIMEOUT, FARM_PROFILE_WEBHOOK_SECRET, SSE_HEADERS,
+    SUPABASE_ANON_KEY, SUPABASE_USER_LOOKUP_URL, SUPPORTED_LANGUAGES, app as flask_app,
+    ask_fallback_response, ask_identity, authenticate, build_ask_prompt, build_extra_context, chatbot,
+    client_ip, day_arg, farm_profiles, rate_limit_error, rate_limiter, sse_event, supabase_breaker, token_verifier
+)
+from circuit_breaker import circuit_breaker_stats
+from concurrency import AsyncSingleFlight, single_flight_stats
+from http_client import async_http_client, http_client
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, HTTP_LATENCY, HTTP_REQUESTS, registry, stage
+from prompt import prompt_stats
+from log_pipeline import begin_request, end_request, log_request, logging_stats
+
+logger = logging.getLogger(__name__)
+
+supabase_flight = AsyncSingleFlight('supabase_async')
+
+
+@supabase_flight.coalesce
+async def get_user_info_async(email=None, phone=None):
+    """Async variant of app.get_user_info"""
+    headers = {
+        "Authorization": f"Bearer {SUPABASE_ANON_KEY}",
+        "Content-Type": "application/json"
+    }
+    params = {}
+    if email:
+        params["email"] = email
+    if phone:
+        params["phone"] = phone
+    params["include"] = "basic,farms,crops"
+    with supabase_breaker.guard() as call:
+        response = await async_http_client.get(SUPABASE_USER_LOOKUP_URL, headers=headers, params=params,
+                                               timeout=call.timeout)
+        call.check(response.status_code)
+    if call.outcome != 'ok':
+        raise RuntimeError(f"User lookup failed: {response.status_code}")
+    if response.status_code == 200:
+        return response.json()
+    return None
+
+
+async def _with_timeout(awaitable, timeout):
+    """Await with a timeout, returning (result, status) instead of raising"""
+    try:
+        return await asyncio.wait_for(awaitable, timeout), 'ok'
+    except asyncio.TimeoutError:
+        return None, 'timeout'
+    except Exception as e:
+        logger.warning("Fan-out source failed: %s", e)
+        return None, 'error'
+
+
+async def resolve_ask_context_async(user_message, language, email=None, phone=None):
+    """Async variant of app.resolve_ask_context; sources are awaited concurrently"""
+    location = chatbot.get_weather_location(user_message)
+    weather_source = chatbot.get_weather_info_async(location) if location else asyncio.sleep(0)
+    profile_source = farm_profiles.get_async(get_user_info_async, email=email, phone=phone)
+    with stage('ask', 'lookup'):
+        (profile, user_status), (weather, _) = await asyncio.gather(
+            _with_timeout(profile_source, min(ASK_LOOKUP_TIMEOUT, ASK_DEADLINE)),
+            _with_timeout(weather_source, min(ASK_WEATHER_TIMEOUT, ASK_DEADLINE))
+        )
+    if profile and profile['found']:
+        farm_context = profile['context']
+    elif user_status in ('timeout', 'error'):
+        profile = {}
+        farm_context = "Farm data is temporarily unavailable."
+    else:
+        return None, None
+    with stage('ask', 'render'):
+        extra_context = build_extra_context(weather, chatbot.get_knowledge_snippets(user_message))
+        return profile, build_ask_prompt(farm_context, user_message, language, extra_context)
+
+
+async def home(request):
+    return PlainTextResponse("Zambian Farmer Chatbot API is running.")
+
+
+async def chat(request):
+    """Handle chat messages from the frontend"""
+    try:
+        data = await request.json()
+        user_message = data.get('message', '')
+        language = data.get('language', 'english')
+
+        if not user_message:
+            return JSONResponse({'error': 'No message provided'}, status_code=400)
+
+        response = await chatbot.get_response_async(user_message, language, data.get('session_id'))
+
+        return JSONResponse({
+            'response': response,
+            'language': language
+        })
+
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+async def sse_stream_async(chunks):
+    """Async variant of app.sse_stream"""
+    try:
+        async for chunk in chunks:
+            yield sse_event({'type': 'token', 'content': chunk})
+    except Exception as e:
+        yield sse_event({'type': 'error', 'error': str(e)})
+    yield sse_event({'type': 'done'})
+
+
+async def chat_stream(request):
+    """Stream the chat answer to the frontend as Server-Sent Events"""
+    try:
+        data = await request.json()
+    except ValueError:
+        data = {}
+    user_message = data.get('message', '')
+    language = data.get('language', 'english')
+
+    if not user_message:
+        return JSONResponse({'error': 'No message provided'}, status_code=400)
+
+    chunks = chatbot.stream_response_async(user_message, language, data.get('session_id'))
+    return StreamingResponse(sse_stream_async(chunks), media_type='text/event-stream', headers=SSE_HEADERS)
+
+
+async def get_weather(request):
+    """Get weather information for a specific location"""
+    try:
+        weather_info = await chatbot.get_weather_info_async(request.path_params['location'])
+        return JSONResponse(weather_info)
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+async def get_market_prices(request):
+    """Get current market prices for common crops (optionally ?crop=, ?market=, ?province=, ?as_of=)"""
+    try:
+        as_of = day_arg(request.query_params, 'as_of')
+    except ValueError:
+        return JSONResponse({'error': 'as_of must be a date (YYYY-MM-DD)'}, status_code=400)
+    try:
+        crop = request.query_params.get('crop')
+        return JSONResponse(chatbot.get_market_prices([crop] if crop else None,
+                                                      market=request.query_params.get('market'),
+                                                      province=request.query_params.get('province'), as_of=as_of))
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+async def get_market_price_history(request):
+    """Average price of a crop per period with its moving average (?market=, ?province=, ?since=, ?until=, ?interval=)"""
+    crop = request.path_params['crop']
+    try:
+        since, until = day_arg(request.query_params, 'since'), day_arg(request.query_params, 'until')
+        interval = int(request.query_params.get('interval', '7'))
+    except ValueError:
+        return JSONResponse({'error': 'since and until must be dates (YYYY-MM-DD), interval a number of days'},
+                            status_code=400)
+    history = chatbot.market_prices.history(crop, market=request.query_params.get('market'),
+                                            province=request.query_params.get('province'),
+                                            since=since, until=until, interval=interval)
+    if history is None:
+        return JSONResponse({'error': f"No price data for {crop}"}, status_code=404)
+    return JSONResponse({
+        'crop': crop.lower(),
+        'unit': chatbot.market_prices.unit(crop),
+        'interval': max(1, interval),
+        'window': chatbot.market_prices.window,
+        'history': history
+    })
+
+
+async def get_market_price_regions(request):
+    """Average price of a crop per province compared with the national average (optionally ?as_of=)"""
+    crop = request.path_params['crop']
+    try:
+        as_of = day_arg(request.query_params, 'as_of')
+    except ValueError:
+        return JSONResponse({'error': 'as_of must be a date (YYYY-MM-DD)'}, status_code=400)
+    regions = chatbot.market_prices.regions(crop, as_of=as_of)
+    if regions is None:
+        return JSONResponse({'error': f"No price data for {crop}"}, status_code=404)
+    return JSONResponse(dict(regions, crop=crop.lower(), window=chatbot.market_prices.window))
+
+
+async def get_crop_info(request):
+    """Get detailed information about a specific crop"""
+    try:
+        return JSONResponse(chatbot.get_crop_information(request.path_params['crop_name']))
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+async def identify_pest_disease(request):
+    """Identify pests or diseases based on symptoms"""
+    try:
+        return JSONResponse(chatbot.identify_pest_disease(request.path_params['query']))
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+async def languages(request):
+    """Get list of supported languages"""
+    return JSONResponse(SUPPORTED_LANGUAGES)
+
+
+async def ask_chatbot(request):
+    data = await request.json()
+    user_message = data.get('message', '')
+    language = data.get('language', 'english')
+
+    if not user_message:
+        return JSONResponse({'error': 'No message provided'}, status_code=400)
+
+    try:
+        email, phone, verified = authenticate(request.headers, data.get('email'), data.get('phone'))
+    except PermissionError:
+        return JSONResponse({'error': 'Invalid or expired token'}, status_code=401)
+    identity = ask_identity(email, phone, verified)
+    ip = client_ip(request.client.host if request.client else None, request.headers)
+    retry_after = rate_limiter.check(identity, ip)
+    if retry_after:
+        body, headers = rate_limit_error(retry_after)
+        return JSONResponse(body, status_code=429, headers=headers)
+
+    profile, ai_context = await resolve_ask_context_async(user_message, language, email=email, phone=phone)
+    if profile is None:
+        return JSONResponse({"response": "Sorry, I couldn't find your farm information in the database."})
+
+    # Over today's token budget the rule-based fallback answers
+    budget_identity = identity or f"ip:{ip}"
+    ai_response = None
+    if not rate_limiter.over_budget(budget_identity):
+        with stage('ask', 'llm'), rate_limiter.charging(budget_identity):
+            ai_response = await chatbot._get_openai_response_async(ai_context, language, ground=False,
+                                                                   priority=ASK_PRIORITY)
+    return JSONResponse({"response": ai_response or ask_fallback_response(profile, user_message, language)})
+
+
+async def ask_chatbot_stream(request):
+    """Streaming variant of /api/ask using Server-Sent Events"""
+    try:
+        data = await request.json()
+    except ValueError:
+        data = {}
+    user_message = data.get('message', '')
+    language = data.get('language', 'english')
+
+    if not user_message:
+        return JSONResponse({'error': 'No message provided'}, status_code=400)
+
+    try:
+        email, phone, verified = authenticate(request.headers, data.get('email'), data.get('phone'))
+    except PermissionError:
+        return JSONResponse({'error': 'Invalid or expired token'}, status_code=401)
+    identity = ask_identity(email, phone, verified)
+    ip = client_ip(request.client.host if request.client else None, request.headers)
+    retry_after = rate_limiter.check(identity, ip)
+    if retry_after:
+        body, headers = rate_limit_error(retry_after)
+        return JSONResponse(body, status_code=429, headers=headers)
+
+    profile, ai_context = await resolve_ask_context_async(user_message, language, email=email, phone=phone)
+    budget_identity = identity or f"ip:{ip}"
+
+    async def answer():
+        if profile is None:
+            yield "Sorry, I couldn't find your farm information in the database."
+            return
+        streamed = False
+        if not rate_limiter.over_budget(budget_identity):
+            with stage('ask', 'llm'), rate_limiter.charging(budget_identity):
+                async for chunk in chatbot._stream_openai_response_async(ai_context, language, ground=False,
+                                                                         priority=ASK_PRIORITY):
+                    streamed = True
+                    yield chunk
+        if not streamed:
+            yield ask_fallback_response(profile, user_message, language)
+
+    return StreamingResponse(sse_stream_async(answer()), media_type='text/event-stream', headers=SSE_HEADERS)
+
+
+async def invalidate_farm_profile(request):
+    """Drop a farmer's cached profile after their farm record changes"""
+    if FARM_PROFILE_WEBHOOK_SECRET and request.headers.get('X-Webhook-Secret') != FARM_PROFILE_WEBHOOK_SECRET:
+        return JSONResponse({'error': 'Unauthorized'}, status_code=401)
+    try:
+        data = await request.json()
+    except ValueError:
+        data = {}
+    email = data.get('email')
+    phone = data.get('phone')
+    if not email and not phone:
+        return JSONResponse({'error': 'email or phone required'}, status_code=400)
+    return JSONResponse({'invalidated': farm_profiles.invalidate(email=email, phone=phone)})
+
+
+async def metrics(request):
+    """Prometheus metrics, summed over all gunicorn workers when METRICS_DIR is set"""
+    return Response(registry.render(), headers={'Content-Type': METRICS_CONTENT_TYPE})
+
+
+async def health_check(request):
+    """Health check endpoint for monitoring"""
+    return JSONResponse({
+        'status': 'healthy',
+        'timestamp': str(datetime.datetime.now()),
+        'version': '1.0.0',
+        'environment': flask_app.config['ENV'],
+        'mode': 'asgi',
+        'response_cache': chatbot.response_cache.stats(),
+        'semantic_cache': chatbot.semantic_cache.stats(),
+        'sessions': chatbot.sessions.stats(),
+        'farm_profiles': farm_profiles.stats(),
+        'market_prices': chatbot.market_prices.stats(),
+        'prompt_tokens': prompt_stats.stats(),
+        'http_pools': http_client.stats(),
+        'async_http_pools': async_http_client.stats(),
+        'single_flight': single_flight_stats(),
+        'circuit_breakers': circuit_breaker_stats(),
+        'admission': chatbot.admission.stats(),
+        'rate_limits': rate_limiter.stats(),
+        'verified_tokens': token_verifier.stats(),
+        'logging': logging_stats()
+    })
+
+
+class MetricsMiddleware:
+    """Count, time and log requests by route template, like app.record_request_metrics"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = {}
+        token = begin_request()
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+                status['elapsed'] = time.perf_counter() - started
+            elif message['type'] == 'http.response.body' and message.get('more_body'):
+                status['streamed'] = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get('route'), 'path', 'unmatched')
+            code = status.get('code', 500)
+            total = time.perf_counter() - started
+            elapsed = status.get('elapsed', total)
+            HTTP_REQUESTS.inc(route=route, method=scope['method'], status=code)
+            HTTP_LATENCY.observe(elapsed, route=route)
+            fields = dict(end_request(token), route=route, method=scope['method'], status=code,
+                          latency_ms=round(total * 1000, 1))
+            if status.get('streamed'):
+                fields['first_byte_ms'] = round(elapsed * 1000, 1)
+            log_request(fields)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    yield
+    await async_http_client.aclose()
+
+
+app = Starlette(
+    routes=[
+        Route('/', home),
+        Route('/api/chat', chat, methods=['POST']),
+        Route('/api/chat/stream', chat_stream, methods=['POST']),
+        Route('/api/weather/{location}', get_weather),
+        Route('/api/market-prices', get_market_prices),
+        Route('/api/market-prices/{crop}/history', get_market_price_history),
+        Route('/api/market-prices/{crop}/regions', get_market_price_regions),
+        Route('/api/crop-info/{crop_name}', get_crop_info),
+        Route('/api/pest-disease/{query}', identify_pest_disease),
+        Route('/api/languages', languages),
+        Route('/api/ask', ask_chatbot, methods=['POST']),
+        Route('/api/ask/stream', ask_chatbot_stream, methods=['POST']),
+        Route('/api/farm-profile/invalidate', invalidate_farm_profile, methods=['POST']),
+        Route('/metrics', metrics),
+        Route('/health', health_check),
+    ],
+    middleware=[
+        Middleware(MetricsMiddleware),
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])
+    ],
+    lifespan=lifespan
+)
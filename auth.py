@@ -0,0 +1,69 @@
+import hashlib
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+import jwt
+
+from cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+
+class TokenVerifier:
+    """Verifies Supabase access tokens (HS256 JWTs), caching each valid token until it expires.
+
+    Entries are keyed by the SHA-256 digest of the token, so raw tokens are
+    never kept, and hold the decoded claims together with the identity
+    (email/phone) the farmer is looked up by. A cached entry lives no
+    longer than the token's exp claim or max_ttl, whichever is sooner;
+    invalid and expired tokens are never cached. The farm record itself
+    stays in FarmProfileStore, so profile invalidation keeps working for
+    authenticated requests.
+    """
+
+    def __init__(self, secret: Optional[str], audience: Optional[str] = 'authenticated',
+                 max_entries: int = 10000, max_ttl: float = 3600):
+        self.secret = secret
+        self.audience = audience
+        self.max_ttl = max_ttl
+        self.cache = ResponseCache(max_entries=max_entries, ttl=max_ttl, namespace='jwt')
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls) -> 'TokenVerifier':
+        """Build a verifier configured from SUPABASE_JWT_* and JWT_CACHE_* variables"""
+        return cls(
+            os.getenv('SUPABASE_JWT_SECRET'),
+            audience=os.getenv('SUPABASE_JWT_AUDIENCE', 'authenticated') or None,
+            max_entries=int(os.getenv('JWT_CACHE_SIZE', '10000')),
+            max_ttl=float(os.getenv('JWT_CACHE_MAX_TTL', '3600'))
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.secret)
+
+    def verify(self, token: str) -> Optional[Dict]:
+        """Return {'claims', 'email', 'phone'} for a valid token, or None if it is invalid or expired"""
+        key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry
+        try:
+            claims = jwt.decode(token, self.secret, algorithms=["HS256"], audience=self.audience)
+        except jwt.PyJWTError as e:
+            self.rejected += 1
+            logger.warning("JWT decode error: %s", e)
+            return None
+        entry = {'claims': claims, 'email': claims.get('email') or None, 'phone': claims.get('phone') or None}
+        ttl = self.max_ttl
+        if 'exp' in claims:
+            ttl = min(ttl, claims['exp'] - time.time())
+        if ttl > 0:
+            self.cache.set(key, entry, ttl=ttl)
+        return entry
+
+    def stats(self) -> Dict:
+        return dict(self.cache.stats(), enabled=self.enabled, rejected=self.rejected)
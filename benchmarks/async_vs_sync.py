@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Compare the sync gunicorn deployment with the async ASGI app on /api/chat.
+
+Both servers talk to benchmarks/stub_llm.py instead of OpenAI, with the
+response cache disabled so every request pays the full LLM round trip.
+
+    python benchmarks/async_vs_sync.py --concurrency 200 --requests 1000
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.stub_llm import serve  # noqa: E402
+
+
+def wait_for(url: str, timeout: float = 30) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+def drive(base_url: str, total: int, concurrency: int) -> dict:
+    """Send total /api/chat requests with the given concurrency and collect latencies"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=concurrency)
+    session.mount('http://', adapter)
+
+    def one(i):
+        started = time.perf_counter()
+        try:
+            resp = session.post(
+                f"{base_url}/api/chat",
+                json={'message': f"How do I control fall armyworm on field {i}?", 'language': 'english'},
+                timeout=120
+            )
+            ok = resp.status_code == 200
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in results)
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        'requests': total,
+        'errors': sum(1 for _, ok in results if not ok),
+        'throughput': total / elapsed,
+        'p50': quantiles[49],
+        'p95': quantiles[94],
+        'p99': quantiles[98]
+    }
+
+
+def run_server(command, env, health_url):
+    process = subprocess.Popen(command, cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for(health_url)
+    except RuntimeError:
+        process.terminate()
+        raise
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sync vs async serving benchmark')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() * 2 + 1,
+                        help='sync gunicorn workers (default matches gunicorn.conf.py)')
+    parser.add_argument('--llm-latency', type=float, default=1.0)
+    parser.add_argument('--llm-port', type=int, default=9100)
+    parser.add_argument('--port', type=int, default=8100)
+    args = parser.parse_args()
+
+    stub = serve(args.llm_port, args.llm_latency, args.llm_latency / 10)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+    env = dict(os.environ,
+               OPENAI_API_KEY='stub',
+               OPENAI_BASE_URL=f"http://127.0.0.1:{args.llm_port}/v1",
+               RESPONSE_CACHE_SIZE='0',
+               WEATHER_API_KEY='')
+    base_url = f"http://127.0.0.1:{args.port}"
+    servers = {
+        f"sync gunicorn ({args.workers} workers)": [
+            sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+            '--bind', f"127.0.0.1:{args.port}", '--workers', str(args.workers),
+            '--pid', '/tmp/netagrow-bench.pid', '--access-logfile', '/dev/null', 'app:app'
+        ],
+        'async uvicorn (1 process)': [
+            sys.executable, '-m', 'uvicorn', 'asgi_app:app',
+            '--port', str(args.port), '--log-level', 'warning', '--no-access-log'
+        ]
+    }
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, stub LLM latency {args.llm_latency}s")
+    for name, command in servers.items():
+        process = run_server(command, env, f"{base_url}/health")
+        try:
+            result = drive(base_url, args.requests, args.concurrency)
+        finally:
+            process.terminate()
+            process.wait()
+        print(f"{name:32} {result['throughput']:8.1f} req/s  "
+              f"p50 {result['p50']:.2f}s  p95 {result['p95']:.2f}s  p99 {result['p99']:.2f}s  "
+              f"errors {result['errors']}")
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
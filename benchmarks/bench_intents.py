@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: compiled IntentClassifier vs the original _is_*_query scans.
+
+Generates a synthetic corpus of farmer messages mixing English and local
+language keywords, then times classifying every message both ways.
+
+    python benchmarks/bench_intents.py --messages 200000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intents import INTENT_KEYWORDS, IntentClassifier  # noqa: E402
+
+CROPS = [
+    'maize', 'cassava', 'sweet potato', 'groundnuts', 'soybeans',
+    'cotton', 'tobacco', 'sugarcane', 'coffee', 'tea', 'sunflower',
+    'sorghum', 'millet', 'beans', 'cowpeas', 'pigeon peas'
+]
+FILLER = ('my the in on for what when how should i we do is are this field farm '
+          'village week month year please help thank you chilli district').split()
+
+
+def legacy_classify(message):
+    """The keyword scans previously done by ZambianFarmerChatbot._is_*"""
+    message = message.lower()
+    intents = []
+    if any(k in message for k in ['hello', 'hi', 'good morning', 'good afternoon', 'good evening']):
+        intents.append('greeting')
+    if any(k in message for k in ['weather', 'rain', 'temperature', 'climate', 'forecast']):
+        intents.append('weather')
+    if any(k in message for k in ['plant', 'grow', 'harvest', 'fertilizer', 'soil']) or \
+            any(crop in message for crop in CROPS):
+        intents.append('crop')
+    if any(k in message for k in ['pest', 'disease', 'sick', 'damage', 'insect', 'fungus']):
+        intents.append('pest_disease')
+    if any(k in message for k in ['price', 'market', 'sell', 'buy', 'cost', 'kwacha']):
+        intents.append('market')
+    return intents
+
+
+def make_corpus(size, seed=7):
+    rng = random.Random(seed)
+    keywords = [k for table in INTENT_KEYWORDS.values() for words in table.values() for k in words]
+    corpus = []
+    for _ in range(size):
+        words = rng.choices(FILLER, k=rng.randint(4, 18))
+        for _ in range(rng.randint(0, 3)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(keywords + CROPS))
+        corpus.append(' '.join(words).capitalize() + '?')
+    return corpus
+
+
+def bench(name, func, corpus):
+    started = time.perf_counter()
+    for message in corpus:
+        func(message)
+    elapsed = time.perf_counter() - started
+    print(f"{name:28} {len(corpus) / elapsed:12,.0f} msg/s  {elapsed / len(corpus) * 1e6:6.2f} us/msg")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Intent classification microbenchmark')
+    parser.add_argument('--messages', type=int, default=100000)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.messages)
+    classifier = IntentClassifier(extra_keywords={'crop': CROPS})
+
+    started = time.perf_counter()
+    IntentClassifier(extra_keywords={'crop': CROPS})
+    print(f"classifier build time        {(time.perf_counter() - started) * 1e3:.2f} ms")
+
+    bench('legacy substring scans', legacy_classify, corpus)
+    bench('compiled classifier', classifier.classify, corpus)
+
+    false_greetings = sum(
+        1 for m in corpus if 'greeting' in legacy_classify(m) and 'greeting' not in classifier.classify(m)
+    )
+    print(f"legacy greetings rejected by word boundaries: {false_greetings} of {len(corpus)}")
+
+
+if __name__ == '__main__':
+    main()
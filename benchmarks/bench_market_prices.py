@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: market price store ingest and query latency over years of data.
+
+Writes synthetic daily price drops (one CSV per market, every crop) into a
+temporary directory, then times the first ingest (CSV parsing), a reload
+from the parsed-drop cache, an incremental drop, and the queries behind
+/api/market-prices.
+
+    python benchmarks/bench_market_prices.py --years 10 --markets 60
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from market_prices import PriceStore  # noqa: E402
+
+CROPS = [('maize', '50kg', 180), ('cassava', 'kg', 65), ('groundnuts', 'kg', 120), ('soybeans', 'kg', 200),
+         ('beans', 'kg', 35), ('sweet potato', 'kg', 15), ('sorghum', 'kg', 12), ('sunflower', 'kg', 9)]
+PROVINCES = ['Lusaka', 'Copperbelt', 'Central', 'Eastern', 'Western',
+             'Southern', 'Northern', 'North-Western', 'Luapula', 'Muchinga']
+
+
+def write_drops(directory, years, markets, seed=7):
+    """One CSV per market with a daily price for every crop; returns the number of rows"""
+    rng = np.random.default_rng(seed)
+    days = np.arange(years * 365)
+    first = np.datetime64('today', 'D') - len(days)
+    dates = [str(first + day) for day in days]
+    rows = 0
+    for m in range(markets):
+        market, province = f"Market {m + 1}", PROVINCES[m % len(PROVINCES)]
+        with open(os.path.join(directory, f"market-{m + 1:03d}.csv"), 'w') as f:
+            f.write('date,market,province,crop,price,unit\n')
+            for crop, unit, base in CROPS:
+                # Seasonal cycle, slow drift and noise
+                prices = base * (1 + 0.15 * np.sin(2 * np.pi * days / 365) + days / 3650
+                                 + rng.normal(0, 0.03, len(days)) + 0.05 * m / markets)
+                f.writelines(f"{date},{market},{province},{crop},{price:.2f},{unit}\n"
+                             for date, price in zip(dates, prices))
+                rows += len(days)
+    return rows
+
+
+def timed(function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - started) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Market price store microbenchmark')
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--markets', type=int, default=40)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='netagrow-prices-') as tmp:
+        drops, cache = os.path.join(tmp, 'drops'), os.path.join(tmp, 'cache')
+        os.makedirs(drops)
+        rows = write_drops(drops, args.years, args.markets)
+        print(f"{rows:,} observations: {args.years} years x {args.markets} markets x {len(CROPS)} crops")
+
+        ingest, store = timed(lambda: PriceStore(drops, cache_dir=cache, reload_interval=3600), 1)
+        cached, store = timed(lambda: PriceStore(drops, cache_dir=cache, reload_interval=3600), 1)
+        memory = sum(array.nbytes for series in store._prices.series.values()
+                     for array in (series.market, series.day, series.price))
+        print(f"  first ingest (CSV)     {ingest * 1e3:9.1f} ms")
+        print(f"  reload (parsed cache)  {cached * 1e3:9.1f} ms   columns {memory / 1e6:.1f} MB")
+
+        with open(os.path.join(drops, 'latest.csv'), 'w') as f:
+            f.write('date,market,province,crop,price,unit\n')
+            f.write(f"{np.datetime64('today', 'D')},Market 1,Lusaka,maize,190,50kg\n")
+        store.summaries()
+        incremental, _ = timed(lambda: store.reload_if_changed(force=True) or store.summaries(), 1)
+        print(f"  incremental drop       {incremental * 1e3:9.1f} ms   (ingest one row, refresh summaries)")
+
+        queries = [
+            ('summaries, all crops (cached)', lambda: store.summaries()),
+            ('summary, one province', lambda: store.summary('maize', province='Eastern')),
+            ('summary, one market', lambda: store.summary('maize', market='Market 1')),
+            ('weekly history, all years', lambda: store.history('maize')),
+            ('weekly history, one province', lambda: store.history('maize', province='Eastern')),
+            ('regional comparison', lambda: store.regions('maize')),
+        ]
+        for name, query in queries:
+            per_query, _ = timed(query, args.queries)
+            print(f"  {name:30} {per_query * 1e6:9.1f} us/query")
+
+
+if __name__ == '__main__':
+    main()
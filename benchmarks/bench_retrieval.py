@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: knowledge base retrieval latency as the index grows.
+
+Builds a RetrievalIndex over the real knowledge base padded with synthetic
+one-fact snippets, then times top-k search for a set of farmer questions.
+
+    python benchmarks/bench_retrieval.py --entries 50000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retrieval import RetrievalIndex  # noqa: E402
+
+CROPS = [
+    'maize', 'cassava', 'sweet potato', 'groundnuts', 'soybeans',
+    'cotton', 'tobacco', 'sugarcane', 'coffee', 'tea', 'sunflower',
+    'sorghum', 'millet', 'beans', 'cowpeas', 'pigeon peas'
+]
+FIELDS = ['planting season', 'harvest time', 'water needs', 'soil type', 'spacing',
+          'fertilizer', 'common pests', 'common diseases', 'storage', 'seed rate']
+REGIONS = ['Lusaka', 'Copperbelt', 'Central', 'Eastern', 'Western',
+           'Southern', 'Northern', 'North-Western', 'Luapula', 'Muchinga']
+VALUES = ('early late november december april june sandy loam clay well drained npk urea '
+          'compound lime aphids armyworm borers blight rust mosaic rosette weekly moderate '
+          'high low rows ridges 25cm 60cm 75cm bags hectare irrigate mulch rotate').split()
+QUESTIONS = [
+    'When should I plant maize?',
+    'What fertilizer is best for groundnuts in Eastern?',
+    'How far apart do I space cassava',
+    'My beans have rust on the leaves',
+    'how much water does sugarcane need in Southern province',
+]
+
+
+def make_snippets(size, seed=7):
+    rng = random.Random(seed)
+    snippets = []
+    for _ in range(size):
+        values = ' '.join(rng.choices(VALUES, k=rng.randint(3, 8)))
+        snippets.append(f"{rng.choice(CROPS).title()} {rng.choice(FIELDS)} in {rng.choice(REGIONS)}: {values}.")
+    return snippets
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Knowledge retrieval microbenchmark')
+    parser.add_argument('--entries', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--k', type=int, default=3)
+    args = parser.parse_args()
+
+    for size in sorted({1000, 10000, args.entries}):
+        snippets = make_snippets(size)
+        started = time.perf_counter()
+        index = RetrievalIndex(snippets)
+        build = time.perf_counter() - started
+        memory = index._rows.nbytes + index._values.nbytes + index._indptr.nbytes + index.idf.nbytes
+
+        started = time.perf_counter()
+        for i in range(args.queries):
+            index.search(QUESTIONS[i % len(QUESTIONS)], k=args.k)
+        per_query = (time.perf_counter() - started) / args.queries
+        print(f"{size:>8,} entries  build {build * 1e3:8.1f} ms  "
+              f"index {memory / 1e6:6.1f} MB  search {per_query * 1e6:8.1f} us/query")
+
+    print(f"\nTop {args.k} for {QUESTIONS[0]!r}:")
+    for score, snippet, _ in index.search(QUESTIONS[0], k=args.k):
+        print(f"  {score:.3f}  {snippet}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: semantic cache lookup latency and hit rate as the cache grows.
+
+Fills a SemanticCache with synthetic questions spread over crop/language
+partitions, then times lookups of reworded variants of cached questions.
+
+    python benchmarks/bench_semantic_cache.py --entries 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from semantic_cache import SemanticCache, partition_key  # noqa: E402
+
+CROPS = [
+    'maize', 'cassava', 'sweet potato', 'groundnuts', 'soybeans',
+    'cotton', 'tobacco', 'sugarcane', 'coffee', 'tea', 'sunflower',
+    'sorghum', 'millet', 'beans', 'cowpeas', 'pigeon peas'
+]
+LANGUAGES = ['english', 'bemba', 'njanja', 'tonga', 'lozi']
+TOPICS = ('plant harvest fertilizer spacing water soil pests diseases storage seed '
+          'irrigation weeding yield rotation intercrop manure lime drought frost').split()
+TEMPLATES = [
+    ('when should I {topic} {extra} {crop}?', 'what month do I {topic} my {extra} {crop}'),
+    ('how do I manage {topic} {extra} for {crop}', 'managing {topic} {extra} in {crop}'),
+    ('best {topic} {extra} for {crop}', 'which {topic} {extra} is best for my {crop}'),
+]
+
+
+def make_questions(size, seed=7):
+    rng = random.Random(seed)
+    questions = []
+    for _ in range(size):
+        asked, reworded = rng.choice(TEMPLATES)
+        words = {'topic': rng.choice(TOPICS), 'extra': ' '.join(rng.sample(TOPICS, 2)),
+                 'crop': rng.choice(CROPS)}
+        key = partition_key(rng.choice(LANGUAGES), [words['crop']])
+        questions.append((asked.format(**words), reworded.format(**words), key))
+    return questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Semantic cache microbenchmark')
+    parser.add_argument('--entries', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    args = parser.parse_args()
+
+    for size in sorted({1000, 10000, args.entries}):
+        questions = make_questions(size)
+        cache = SemanticCache(max_entries=size)
+        started = time.perf_counter()
+        for asked, _, key in questions:
+            cache.set(asked, key, asked)
+        fill = time.perf_counter() - started
+
+        sample = questions[-args.lookups:]
+        started = time.perf_counter()
+        hits = sum(1 for _, reworded, key in sample if cache.get(reworded, key) is not None)
+        per_lookup = (time.perf_counter() - started) / len(sample)
+        print(f"{size:>8,} entries  {cache.stats()['partitions']:3} partitions  "
+              f"fill {fill:6.2f} s  lookup {per_lookup * 1e6:8.1f} us  "
+              f"reworded hit rate {hits / len(sample):.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Load test the app against local stand-ins for OpenAI, WeatherAPI and Supabase.
+
+Starts benchmarks/stub_llm.py and benchmarks/stub_services.py in-process,
+then for each server configuration runs gunicorn with gunicorn.conf.py (plus
+the configuration's overrides), drives a weighted mix of /api/chat,
+/api/ask, /api/weather and /api/crop-info at a fixed concurrency, and
+reports p50/p95/p99 latency, throughput and error rate per endpoint. Every
+configuration gets a fresh cache file and the same seeded request sequence,
+so runs can be compared with each other.
+
+    python benchmarks/load_test.py --requests 2000 --concurrency 64
+    python benchmarks/load_test.py --configs sync,gthread --llm-latency 2 --error-rate 0.02
+    python benchmarks/load_test.py --no-cache --json results.json
+"""
+
+import argparse
+import json
+import os
+import random
+import runpy
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks import stub_llm, stub_services  # noqa: E402
+from benchmarks.async_vs_sync import wait_for  # noqa: E402
+
+# Server configurations: gunicorn arguments on top of gunicorn.conf.py
+CONFIGURATIONS = {
+    'sync': ['app:app'],
+    'gthread': ['--worker-class', 'gthread', '--threads', '8', 'app:app'],
+    'uvicorn': ['--worker-class', 'uvicorn.workers.UvicornWorker', 'asgi_app:app'],
+}
+
+QUESTIONS = [
+    "How do I control fall armyworm in my maize?",
+    "When should I plant groundnuts in Eastern Province?",
+    "What fertilizer is best for cassava on sandy soil?",
+    "How far apart should I plant soybeans?",
+    "My beans have yellow leaves, what is wrong?",
+    "How can I store maize so weevils do not get in?",
+    "Is it a good time to sell sunflower?",
+    "How much rain does sorghum need?",
+]
+LANGUAGES = ['english', 'english', 'english', 'bemba', 'njanja', 'tonga', 'lozi']
+TOWNS = ['Lusaka', 'Ndola', 'Kitwe', 'Chipata', 'Livingstone', 'Kasama', 'Mongu', 'Solwezi', 'Mansa', 'Kabwe']
+CROPS = ['maize', 'cassava', 'groundnuts', 'soybeans', 'sunflower', 'beans', 'sorghum', 'cotton', 'yams']
+
+
+def make_requests(total: int, mix: dict, farmers: int, seed: int) -> list:
+    """The seeded sequence of (endpoint, method, path, body) to send"""
+    rng = random.Random(seed)
+    endpoints = list(mix)
+    weights = [mix[name] for name in endpoints]
+    planned = []
+    for i in range(total):
+        endpoint = rng.choices(endpoints, weights)[0]
+        # A request number keeps most questions distinct, so the LLM path is exercised
+        question = f"{rng.choice(QUESTIONS)} (field {rng.randrange(total)})"
+        if endpoint == 'chat':
+            planned.append((endpoint, 'POST', '/api/chat', {'message': question, 'language': rng.choice(LANGUAGES)}))
+        elif endpoint == 'ask':
+            planned.append((endpoint, 'POST', '/api/ask', {
+                'message': question, 'language': rng.choice(LANGUAGES),
+                'email': f"farmer{rng.randrange(farmers)}@example.com"
+            }))
+        elif endpoint == 'weather':
+            planned.append((endpoint, 'GET', f"/api/weather/{rng.choice(TOWNS)}", None))
+        else:
+            planned.append((endpoint, 'GET', f"/api/crop-info/{rng.choice(CROPS)}", None))
+    return planned
+
+
+def summarize(results: list, elapsed: float) -> dict:
+    latencies = sorted(latency for latency, _ in results)
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    errors = sum(1 for _, ok in results if not ok)
+    return {
+        'requests': len(results),
+        'errors': errors,
+        'error_rate': errors / len(results),
+        'throughput': len(results) / elapsed,
+        'p50': quantiles[49],
+        'p95': quantiles[94],
+        'p99': quantiles[98]
+    }
+
+
+def drive(base_url: str, planned: list, concurrency: int, timeout: float) -> dict:
+    """Send the planned requests with the given concurrency; stats overall and per endpoint"""
+    session = requests.Session()
+    session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+
+    def one(item):
+        endpoint, method, path, body = item
+        started = time.perf_counter()
+        try:
+            resp = session.request(method, base_url + path, json=body, timeout=timeout)
+            # 404 is a valid answer for an unknown crop
+            ok = resp.status_code < 500 and resp.status_code != 429
+        except requests.RequestException:
+            ok = False
+        return endpoint, time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, planned))
+    elapsed = time.perf_counter() - started
+
+    by_endpoint = {}
+    for endpoint, latency, ok in results:
+        by_endpoint.setdefault(endpoint, []).append((latency, ok))
+    report = {'all': summarize([(latency, ok) for _, latency, ok in results], elapsed)}
+    for endpoint, endpoint_results in sorted(by_endpoint.items()):
+        report[endpoint] = summarize(endpoint_results, elapsed)
+    return report
+
+
+def server_command(name: str, port: int, workers: int, raw_env: list) -> list:
+    return [
+        sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+        '--bind', f"127.0.0.1:{port}", '--workers', str(workers),
+        '--pid', os.path.join(tempfile.gettempdir(), f"netagrow-load-{name}.pid"),
+        '--access-logfile', '/dev/null', '--error-logfile', '/dev/null'
+    ] + [arg for entry in raw_env for arg in ('-e', entry)] + CONFIGURATIONS[name]
+
+
+def bench_env(raw_env: list, overrides: dict) -> list:
+    """gunicorn.conf.py's raw_env with overrides applied ('-e' replaces the whole list)"""
+    env = dict(entry.split('=', 1) for entry in raw_env)
+    env.update(overrides)
+    return [f"{key}={value}" for key, value in env.items()]
+
+
+def print_report(name: str, report: dict, upstream: dict) -> None:
+    print(f"\n{name}")
+    for endpoint, result in report.items():
+        print(f"  {endpoint:10} {result['requests']:6} req  {result['throughput']:8.1f} req/s  "
+              f"p50 {result['p50'] * 1000:7.1f} ms  p95 {result['p95'] * 1000:7.1f} ms  "
+              f"p99 {result['p99'] * 1000:7.1f} ms  errors {result['error_rate']:6.2%}")
+    print("  upstream   " + "  ".join(
+        f"{stub}: {counts['requests']} calls ({counts['errors']} failed)" for stub, counts in upstream.items()
+    ))
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in ('chat', 'ask', 'weather', 'crop-info'):
+            raise argparse.ArgumentTypeError(f"unknown endpoint '{name}'")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test with local stub services')
+    parser.add_argument('--configs', default=','.join(CONFIGURATIONS),
+                        help=f"comma-separated server configurations ({', '.join(CONFIGURATIONS)})")
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() * 2 + 1,
+                        help='gunicorn workers (default matches gunicorn.conf.py)')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('chat=4,ask=2,weather=2,crop-info=2'),
+                        help='endpoint weights, e.g. chat=4,ask=2,weather=2,crop-info=2')
+    parser.add_argument('--farmers', type=int, default=200, help='distinct farmer emails used by /api/ask')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--timeout', type=float, default=60, help='client timeout per request in seconds')
+    parser.add_argument('--llm-latency', type=float, default=1.0)
+    parser.add_argument('--api-latency', type=float, default=0.15, help='WeatherAPI and Supabase mean latency')
+    parser.add_argument('--distribution', choices=['gauss', 'lognormal', 'fixed'], default='lognormal')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of upstream calls failing with 500')
+    parser.add_argument('--no-cache', action='store_true', help='disable response, semantic and profile caches')
+    parser.add_argument('--json', help='also write the results to this file')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--stub-port', type=int, default=9100, help='first of three ports for the stubs')
+    args = parser.parse_args()
+
+    configs = [name.strip() for name in args.configs.split(',') if name.strip()]
+    for name in configs:
+        if name not in CONFIGURATIONS:
+            parser.error(f"unknown configuration '{name}'")
+
+    stubs = {
+        'openai': stub_llm.serve(args.stub_port, args.llm_latency, args.llm_latency / 4,
+                                 args.error_rate, args.distribution),
+        'weather': stub_services.serve(stub_services.WeatherHandler, args.stub_port + 1, args.api_latency,
+                                       args.api_latency / 3, args.error_rate, args.distribution),
+        'supabase': stub_services.serve(stub_services.SupabaseHandler, args.stub_port + 2, args.api_latency,
+                                        args.api_latency / 3, args.error_rate, args.distribution),
+    }
+    for stub in stubs.values():
+        threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+    overrides = {
+        'OPENAI_API_KEY': 'stub',
+        'OPENAI_BASE_URL': f"http://127.0.0.1:{args.stub_port}/v1",
+        'WEATHER_API_KEY': 'stub',
+        'WEATHER_API_URL': f"http://127.0.0.1:{args.stub_port + 1}/v1/current.json",
+        'SUPABASE_ANON_KEY': 'stub',
+        'SUPABASE_FUNCTIONS_URL': f"http://127.0.0.1:{args.stub_port + 2}/functions/v1",
+        # Prefetching would add upstream traffic that is not caused by the load
+        'WEATHER_PREFETCH_INTERVAL': '0',
+        # gunicorn.conf.py derives this from its own worker count
+        'ADMISSION_MAX_IN_FLIGHT': str(max(1, args.workers - 2)),
+    }
+    if args.no_cache:
+        overrides.update(RESPONSE_CACHE_SIZE='0', SEMANTIC_CACHE_SIZE='0',
+                         FARM_PROFILE_CACHE_SIZE='0', WEATHER_CACHE_TTL='0')
+    raw_env = runpy.run_path(os.path.join(ROOT, 'gunicorn.conf.py')).get('raw_env', [])
+    planned = make_requests(args.requests, args.mix, args.farmers, args.seed)
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, {args.workers} workers, "
+          f"mix {args.mix}, LLM {args.llm_latency}s / APIs {args.api_latency}s {args.distribution}, "
+          f"upstream error rate {args.error_rate:.1%}, caches {'off' if args.no_cache else 'on'}")
+    results = {}
+    for name in configs:
+        with tempfile.TemporaryDirectory(prefix='netagrow-load-') as tmp:
+            env_list = bench_env(raw_env, dict(overrides, CACHE_PATH=os.path.join(tmp, 'cache.db'),
+                                               KNOWLEDGE_BASE_DB=os.path.join(tmp, 'knowledge.db'),
+                                               ADMISSION_DIR=os.path.join(tmp, 'admission')))
+            env = dict(os.environ, **dict(entry.split('=', 1) for entry in env_list))
+            process = subprocess.Popen(server_command(name, args.port, args.workers, env_list), cwd=ROOT,
+                                       env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                wait_for(f"{base_url}/health")
+                for stub in stubs.values():
+                    stub.stats.reset()
+                report = drive(base_url, planned, args.concurrency, args.timeout)
+            except RuntimeError as e:
+                print(f"\n{name}: skipped ({e})")
+                continue
+            finally:
+                process.terminate()
+                process.wait()
+        upstream = {stub_name: stub.stats.reset() for stub_name, stub in stubs.items()}
+        print_report(name, report, upstream)
+        results[name] = {'endpoints': report, 'upstream': upstream}
+
+    for stub in stubs.values():
+        stub.shutdown()
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'settings': {key: value for key, value in vars(args).items() if key != 'json'},
+                       'results': results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
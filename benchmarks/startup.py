@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Measure cold start: import time by package, time to first request and worker memory.
+
+For each startup mode (eager: everything imported and built before the first
+request; lazy: LAZY_STARTUP=true) gunicorn is started from scratch with a
+fresh cache and knowledge base file, as on a newly scaled-up instance, and
+timed until it answers a cheap route (/api/languages) and then a first LLM
+answer on /api/chat from benchmarks/stub_llm.py. Resident (RSS) and
+proportional (PSS, shared pages split between processes) memory is then
+read from /proc for every worker.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --modes lazy --configs sync,uvicorn --runs 5
+    python benchmarks/startup.py --profile-only --top 25
+"""
+
+import argparse
+import json
+import os
+import runpy
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks import stub_llm  # noqa: E402
+from benchmarks.load_test import CONFIGURATIONS, bench_env, server_command  # noqa: E402
+
+MODES = {'eager': 'false', 'lazy': 'true'}
+
+
+def import_profile(env: dict, module: str = 'app') -> tuple:
+    """Import module in a fresh interpreter with -X importtime; returns (total seconds, seconds by package)"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    by_package = defaultdict(float)
+    total = 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        by_package[name.strip().split('.')[0]] += int(self_us) / 1e6
+        # Nested imports are indented; the top-level line's cumulative time is the total
+        if name.rstrip() == f" {module}":
+            total = int(cumulative_us) / 1e6
+    return total, dict(by_package)
+
+
+def process_memory(pid: int) -> dict:
+    """RSS and PSS of one process in MiB"""
+    memory = {}
+    for path, field in ((f"/proc/{pid}/status", 'VmRSS:'), (f"/proc/{pid}/smaps_rollup", 'Pss:')):
+        try:
+            with open(path) as f:
+                line = next(line for line in f if line.startswith(field))
+        except (OSError, StopIteration):
+            continue
+        memory[field.rstrip(':').replace('Vm', '').lower()] = int(line.split()[1]) / 1024
+    return memory
+
+
+def worker_pids(master_pid: int) -> list:
+    try:
+        with open(f"/proc/{master_pid}/task/{master_pid}/children") as f:
+            return [int(pid) for pid in f.read().split()]
+    except OSError:
+        return []
+
+
+def wait_until_ok(send, deadline: float) -> float:
+    """Poll send() until it returns a 200 response; returns the time it first did"""
+    while time.perf_counter() < deadline:
+        try:
+            if send().status_code == 200:
+                return time.perf_counter()
+        except requests.RequestException:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError('server did not answer in time')
+
+
+def cold_start(config: str, env_list: list, port: int, workers: int, timeout: float) -> dict:
+    """Start gunicorn once and time its first responses"""
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, **dict(entry.split('=', 1) for entry in env_list))
+    started = time.perf_counter()
+    process = subprocess.Popen(server_command(config, port, workers, env_list), cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = started + timeout
+        first = wait_until_ok(lambda: requests.get(f"{base_url}/api/languages", timeout=1), deadline)
+        # A fresh question each run, so the answer cannot come from a cache
+        answered = wait_until_ok(lambda: requests.post(
+            f"{base_url}/api/chat",
+            json={'message': f"How should I rotate beans after maize? ({time.time()})", 'language': 'english'},
+            timeout=timeout
+        ), deadline)
+        # Let the remaining workers finish booting before reading their memory
+        time.sleep(1)
+        workers_memory = [process_memory(pid) for pid in worker_pids(process.pid)]
+        return {
+            'first_request': first - started,
+            'first_llm_answer': answered - started,
+            'master': process_memory(process.pid),
+            'workers': workers_memory
+        }
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def summarize(runs: list) -> dict:
+    workers = [memory for run in runs for memory in run['workers']]
+
+    def median(values):
+        return statistics.median(values) if values else None
+
+    return {
+        'runs': len(runs),
+        'first_request': median([run['first_request'] for run in runs]),
+        'first_llm_answer': median([run['first_llm_answer'] for run in runs]),
+        'master_rss': median([run['master'].get('rss', 0) for run in runs]),
+        'worker_rss': median([memory.get('rss', 0) for memory in workers]),
+        'worker_pss': median([memory['pss'] for memory in workers if 'pss' in memory])
+    }
+
+
+def print_profile(mode: str, total: float, by_package: dict, top: int) -> None:
+    print(f"\nimport app ({mode}): {total * 1000:.0f} ms")
+    for package, seconds in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {package:24} {seconds * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--modes', default=','.join(MODES), help='comma-separated: eager, lazy')
+    parser.add_argument('--configs', default='sync', help=f"comma-separated: {', '.join(CONFIGURATIONS)}")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--runs', type=int, default=3, help='cold starts per mode and configuration')
+    parser.add_argument('--top', type=int, default=15, help='packages listed in the import profile')
+    parser.add_argument('--profile-only', action='store_true', help='only report import times')
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--json', help='also write the results to this file')
+    parser.add_argument('--port', type=int, default=8200)
+    parser.add_argument('--stub-port', type=int, default=9200)
+    args = parser.parse_args()
+
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    configs = [name.strip() for name in args.configs.split(',') if name.strip()]
+    for mode in modes:
+        if mode not in MODES:
+            parser.error(f"unknown mode '{mode}'")
+    for name in configs:
+        if name not in CONFIGURATIONS:
+            parser.error(f"unknown configuration '{name}'")
+
+    stub = stub_llm.serve(args.stub_port, 0.05, 0.01)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    overrides = {
+        'OPENAI_API_KEY': 'stub',
+        'OPENAI_BASE_URL': f"http://127.0.0.1:{args.stub_port}/v1",
+        'WEATHER_PREFETCH_INTERVAL': '0',
+    }
+    raw_env = runpy.run_path(os.path.join(ROOT, 'gunicorn.conf.py')).get('raw_env', [])
+
+    results = {'imports': {}, 'cold_starts': {}}
+    for mode in modes:
+        with tempfile.TemporaryDirectory(prefix='netagrow-startup-') as tmp:
+            env = dict(os.environ, **overrides, LAZY_STARTUP=MODES[mode],
+                       KNOWLEDGE_BASE_DB=os.path.join(tmp, 'knowledge.db'))
+            total, by_package = import_profile(env)
+        print_profile(mode, total, by_package, args.top)
+        results['imports'][mode] = {'total': total, 'packages': by_package}
+
+    if not args.profile_only:
+        print(f"\nCold starts: {args.workers} workers, median of {args.runs} runs")
+        for name in configs:
+            for mode in modes:
+                runs = []
+                for _ in range(args.runs):
+                    with tempfile.TemporaryDirectory(prefix='netagrow-startup-') as tmp:
+                        env_list = bench_env(raw_env, dict(
+                            overrides, LAZY_STARTUP=MODES[mode], CACHE_PATH=os.path.join(tmp, 'cache.db'),
+                            KNOWLEDGE_BASE_DB=os.path.join(tmp, 'knowledge.db'),
+                            METRICS_DIR=os.path.join(tmp, 'metrics'), ADMISSION_DIR=os.path.join(tmp, 'admission')
+                        ))
+                        try:
+                            runs.append(cold_start(name, env_list, args.port, args.workers, args.timeout))
+                        except RuntimeError as e:
+                            print(f"  {name}/{mode}: run failed ({e})")
+                if not runs:
+                    continue
+                summary = summarize(runs)
+                results['cold_starts'][f"{name}/{mode}"] = summary
+                pss = f"{summary['worker_pss']:6.1f}" if summary['worker_pss'] is not None else '     -'
+                print(f"  {name + '/' + mode:16} first request {summary['first_request'] * 1000:7.0f} ms  "
+                      f"first LLM answer {summary['first_llm_answer'] * 1000:7.0f} ms  "
+                      f"master RSS {summary['master_rss']:6.1f} MiB  "
+                      f"worker RSS {summary['worker_rss'] or 0:6.1f} MiB  PSS {pss} MiB")
+
+    stub.shutdown()
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'settings': {key: value for key, value in vars(args).items() if key != 'json'},
+                       'results': results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
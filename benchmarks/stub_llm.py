@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI chat completions API.
+
+Answers POST /v1/chat/completions after a configurable delay so the chatbot
+can be benchmarked without real API calls. Requests with ``stream: true``
+get the answer word by word as Server-Sent Events, with the delay spread
+across the tokens. Delays follow the distributions of stub_services.py and
+a fraction of requests can be failed with HTTP 500. Point the app at it with:
+
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1 OPENAI_API_KEY=stub
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_services import StubStats, make_delay  # noqa: E402
+
+
+def make_handler(latency: float, jitter: float, error_rate: float = 0.0,
+                 distribution: str = 'gauss', stats: StubStats = None):
+    draw_delay = make_delay(latency, jitter, distribution)
+    stats = stats or StubStats()
+
+    class StubLLMHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            delay = draw_delay()
+            failed = random.random() < error_rate
+            stats.record(failed)
+            if failed:
+                time.sleep(delay)
+                self._error()
+                return
+            question = request.get('messages', [{}])[-1].get('content', '')
+            answer = f"Stub answer to: {question[:80]}"
+            if request.get('stream'):
+                self._stream(request, answer, delay)
+                return
+            time.sleep(delay)
+            body = json.dumps({
+                'id': 'chatcmpl-stub',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': request.get('model', 'stub'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': answer},
+                    'finish_reason': 'stop'
+                }],
+                'usage': {'prompt_tokens': 100, 'completion_tokens': 20, 'total_tokens': 120}
+            }).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _error(self):
+            body = json.dumps({'error': {'message': 'injected stub failure', 'type': 'server_error'}}).encode('utf-8')
+            self.send_response(500)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _stream(self, request, answer, delay):
+            words = answer.split(' ')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            for i, word in enumerate(words):
+                time.sleep(delay / len(words))
+                chunk = {
+                    'id': 'chatcmpl-stub',
+                    'object': 'chat.completion.chunk',
+                    'created': int(time.time()),
+                    'model': request.get('model', 'stub'),
+                    'choices': [{
+                        'index': 0,
+                        'delta': {'content': word if i == 0 else ' ' + word},
+                        'finish_reason': None
+                    }]
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubLLMHandler
+
+
+def serve(port: int, latency: float, jitter: float, error_rate: float = 0.0,
+          distribution: str = 'gauss') -> ThreadingHTTPServer:
+    """Create the stub server (call serve_forever() on the result); its counters are on server.stats"""
+    stats = StubStats()
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(latency, jitter, error_rate, distribution, stats))
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    server.stats = stats
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--latency', type=float, default=1.5, help='mean response delay in seconds')
+    parser.add_argument('--jitter', type=float, default=0.3, help='std deviation of the delay')
+    parser.add_argument('--distribution', choices=['gauss', 'lognormal', 'fixed'], default='gauss')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests failing with 500')
+    args = parser.parse_args()
+    print(f"Stub LLM listening on http://127.0.0.1:{args.port}/v1")
+    serve(args.port, args.latency, args.jitter, args.error_rate, args.distribution).serve_forever()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the WeatherAPI.com and Supabase user-lookup APIs.
+
+Each stub answers after a delay drawn from a configurable distribution and
+fails a configurable fraction of requests with HTTP 500, so the app can be
+load-tested without real API keys. Point the app at them with:
+
+    WEATHER_API_URL=http://127.0.0.1:9101/v1/current.json WEATHER_API_KEY=stub
+    SUPABASE_FUNCTIONS_URL=http://127.0.0.1:9102/functions/v1 SUPABASE_ANON_KEY=stub
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CROPS = ['Maize', 'Cassava', 'Groundnuts', 'Soybeans', 'Sunflower', 'Beans', 'Sorghum', 'Cotton']
+CONDITIONS = ['Sunny', 'Partly cloudy', 'Light rain shower', 'Overcast', 'Patchy rain possible']
+
+
+def make_delay(latency: float, jitter: float, distribution: str = 'gauss'):
+    """Return a function drawing one response delay in seconds.
+
+    'gauss' is normal around latency with std jitter, 'lognormal' has the
+    same mean and std but a long right tail (closer to real API latencies),
+    and 'fixed' always waits latency.
+    """
+    if distribution == 'fixed' or latency <= 0:
+        return lambda: max(0.0, latency)
+    if distribution == 'lognormal':
+        sigma2 = math.log(1 + (jitter / latency) ** 2)
+        mu = math.log(latency) - sigma2 / 2
+        return lambda: random.lognormvariate(mu, sigma2 ** 0.5)
+    return lambda: max(0.0, random.gauss(latency, jitter))
+
+
+class StubStats:
+    """Request and injected-error counters for one stub"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def record(self, failed: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            self.errors += failed
+
+    def reset(self) -> dict:
+        with self._lock:
+            counts = {'requests': self.requests, 'errors': self.errors}
+            self.requests = self.errors = 0
+        return counts
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Shared plumbing: delay, error injection and JSON responses"""
+
+    protocol_version = 'HTTP/1.1'
+    delay = staticmethod(lambda: 0.0)
+    error_rate = 0.0
+    stats = None
+
+    def _respond(self, payload_for):
+        time.sleep(self.delay())
+        failed = random.random() < self.error_rate
+        self.stats.record(failed)
+        if failed:
+            status, payload = 500, {'error': 'injected stub failure'}
+        else:
+            status, payload = payload_for(urlparse(self.path))
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class WeatherHandler(StubHandler):
+    def do_GET(self):
+        self._respond(self._current)
+
+    def _current(self, url):
+        query = parse_qs(url.query).get('q', ['Lusaka'])[0]
+        town = query.split(',')[0].strip().title() or 'Lusaka'
+        seed = zlib.crc32(town.encode('utf-8'))
+        return 200, {
+            'location': {'name': town, 'country': 'Zambia'},
+            'current': {
+                'temp_c': 18 + seed % 15,
+                'humidity': 30 + seed % 60,
+                'condition': {'text': CONDITIONS[seed % len(CONDITIONS)]}
+            }
+        }
+
+
+def make_farmer(key: str) -> dict:
+    """A deterministic synthetic farmer record in the user-lookup response shape"""
+    seed = zlib.crc32(key.encode('utf-8'))
+    rng = random.Random(seed)
+    farms = []
+    for i in range(1 + seed % 3):
+        fields = [{
+            'name': f"Field {j + 1}",
+            'size': round(rng.uniform(0.5, 5), 1),
+            'soil_type': rng.choice(['sandy loam', 'clay loam', 'loam']),
+            'crops': [{'name': rng.choice(CROPS), 'status': rng.choice(['planted', 'growing', 'harvested'])}]
+        } for j in range(1 + rng.randrange(4))]
+        farms.append({'name': f"Farm {i + 1}", 'size': sum(f['size'] for f in fields),
+                      'location': rng.choice(['Chongwe', 'Mazabuka', 'Chipata', 'Kabwe']), 'fields': fields})
+    return {
+        'full_name': f"Farmer {seed % 10000}",
+        'farmer_profile': {'location': farms[0]['location']},
+        'farms': farms
+    }
+
+
+class SupabaseHandler(StubHandler):
+    def do_GET(self):
+        self._respond(self._lookup)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self._respond(lambda url: (404, {'error': 'not stubbed'}))
+
+    def _lookup(self, url):
+        if not url.path.endswith('/user-lookup'):
+            return 404, {'error': 'not stubbed'}
+        params = parse_qs(url.query)
+        key = (params.get('email') or params.get('phone') or [''])[0]
+        # Addresses starting with "unknown" exercise the not-found path
+        if not key or key.startswith('unknown'):
+            return 200, {'success': False, 'data': None}
+        return 200, {'success': True, 'data': make_farmer(key)}
+
+
+def serve(handler, port: int, latency: float, jitter: float,
+          error_rate: float = 0.0, distribution: str = 'gauss') -> ThreadingHTTPServer:
+    """Create a stub server (call serve_forever() on the result); its counters are on server.stats"""
+    stats = StubStats()
+    configured = type(handler.__name__, (handler,), {
+        'delay': staticmethod(make_delay(latency, jitter, distribution)),
+        'error_rate': error_rate,
+        'stats': stats
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', port), configured)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    server.stats = stats
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--weather-port', type=int, default=9101)
+    parser.add_argument('--supabase-port', type=int, default=9102)
+    parser.add_argument('--latency', type=float, default=0.2, help='mean response delay in seconds')
+    parser.add_argument('--jitter', type=float, default=0.05, help='std deviation of the delay')
+    parser.add_argument('--distribution', choices=['gauss', 'lognormal', 'fixed'], default='gauss')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests failing with 500')
+    args = parser.parse_args()
+    servers = [
+        serve(handler, port, args.latency, args.jitter, args.error_rate, args.distribution)
+        for handler, port in ((WeatherHandler, args.weather_port), (SupabaseHandler, args.supabase_port))
+    ]
+    print(f"Stub WeatherAPI on http://127.0.0.1:{args.weather_port}/v1/current.json")
+    print(f"Stub Supabase on http://127.0.0.1:{args.supabase_port}/functions/v1")
+    threading.Thread(target=servers[0].serve_forever, daemon=True).start()
+    servers[1].serve_forever()
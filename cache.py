@@ -0,0 +1,322 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_message(message: str) -> str:
+    """Normalize a user message so trivially different phrasings share a cache key"""
+    message = message.lower().strip()
+    message = re.sub(r"[^\w\s]", " ", message)
+    return re.sub(r"\s+", " ", message).strip()
+
+
+def make_cache_key(*parts: str) -> str:
+    """Build a fixed-length cache key from arbitrary string parts"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """Bounded in-memory LRU cache with per-entry TTL and hit/miss/eviction counters"""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600, namespace: str = 'default'):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.namespace = namespace
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        record_cache_lookup(self.namespace, entry is not None)
+        return None if entry is None else entry[1]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store value under key, evicting the least recently used entries if full"""
+        if self.max_entries <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def append(self, key: str, item: Any, ttl: Optional[float] = None) -> None:
+        """Add item to the list stored under key (if not already in it) and refresh its ttl"""
+        if self.max_entries <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            items = entry[1] if entry is not None and entry[0] > now else []
+            if item not in items:
+                items = items + [item]
+            self._entries[key] = (now + (self.ttl if ttl is None else ttl), items)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: str) -> Optional[Any]:
+        """Remove key and return its unexpired value, or None"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return entry[1] if entry is not None and entry[0] > time.monotonic() else None
+
+    def delete(self, key: str) -> bool:
+        """Remove key from the cache if present; returns whether it was"""
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self) -> None:
+        """Drop every cached entry (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        """Return cache counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            'backend': 'memory',
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class SharedCache:
+    """SQLite (WAL) backed cache shared by every worker process on the host.
+
+    Entries survive gunicorn worker recycling. Each process opens its own
+    connection lazily, so the object is safe to build before the fork with
+    ``preload_app = True``. Values must be JSON serializable.
+    """
+
+    # Expired/over-limit entries are purged once every this many writes
+    PURGE_INTERVAL = 64
+
+    def __init__(self, path: str, namespace: str = 'default',
+                 max_entries: int = 10000, ttl: float = 3600):
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, reopening it after a fork"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, PRIMARY KEY (namespace, key))"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS cache_entries_expiry "
+            "ON cache_entries (namespace, expires_at)"
+        )
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired"""
+        try:
+            row = self._connection().execute(
+                "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Shared cache read failed: %s", e)
+            row = None
+        if row is not None and row[1] <= time.time():
+            self.expirations += 1
+            row = None
+        if row is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        record_cache_lookup(self.namespace, row is not None)
+        return None if row is None else json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Atomically store value under key"""
+        if self.max_entries <= 0:
+            return
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at) "
+                "VALUES (?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), expires_at)
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_INTERVAL == 0:
+                self.purge()
+        except sqlite3.Error as e:
+            logger.warning("Shared cache write failed: %s", e)
+
+    def append(self, key: str, item: Any, ttl: Optional[float] = None) -> None:
+        """Add item to the list stored under key (if not already in it) and refresh its ttl.
+
+        The read and write happen in one IMMEDIATE transaction, so workers
+        appending to the same key at once never drop each other's items.
+        """
+        if self.max_entries <= 0:
+            return
+        now = time.time()
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute(
+                    "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                    (self.namespace, key)
+                ).fetchone()
+                items = json.loads(row[0]) if row is not None and row[1] > now else []
+                if item not in items:
+                    items.append(item)
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (self.namespace, key, json.dumps(items), now + (self.ttl if ttl is None else ttl))
+                )
+            self._writes += 1
+            if self._writes % self.PURGE_INTERVAL == 0:
+                self.purge()
+        except sqlite3.Error as e:
+            logger.warning("Shared cache write failed: %s", e)
+
+    def pop(self, key: str) -> Optional[Any]:
+        """Atomically remove key and return its unexpired value, or None"""
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+            conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            )
+        return json.loads(row[0]) if row is not None and row[1] > time.time() else None
+
+    def purge(self) -> None:
+        """Drop expired entries, then the soonest-expiring ones beyond max_entries"""
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            expired = conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?",
+                (self.namespace, time.time())
+            ).rowcount
+            overflow = conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key IN ("
+                "SELECT key FROM cache_entries WHERE namespace = ? "
+                "ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (self.namespace, self.namespace, self.max_entries)
+            ).rowcount
+        self.expirations += max(expired, 0)
+        self.evictions += max(overflow, 0)
+
+    def delete(self, key: str) -> bool:
+        """Remove key from the cache if present; returns whether it was"""
+        return self._connection().execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+            (self.namespace, key)
+        ).rowcount > 0
+
+    def clear(self) -> None:
+        """Drop every entry in this namespace (counters are kept)"""
+        self._connection().execute(
+            "DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        )
+
+    def __len__(self) -> int:
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+
+    def stats(self) -> Dict:
+        """Return cache counters for monitoring (hits/misses are per worker)"""
+        lookups = self.hits + self.misses
+        try:
+            entries = len(self)
+        except sqlite3.Error:
+            entries = None
+        return {
+            'backend': 'sqlite',
+            'path': self.path,
+            'namespace': self.namespace,
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def create_cache(namespace: str, max_entries: int, ttl: float):
+    """Build the cache backend selected by CACHE_BACKEND ('memory' or 'sqlite')"""
+    backend = os.getenv('CACHE_BACKEND', 'memory').lower()
+    if backend == 'sqlite':
+        path = os.getenv('CACHE_PATH', '/tmp/netagrow-cache.db')
+        return SharedCache(path, namespace=namespace, max_entries=max_entries, ttl=ttl)
+    return ResponseCache(max_entries=max_entries, ttl=ttl, namespace=namespace)
@@ -1,29 +1,151 @@
 import os
 import json
-import requests
+import hashlib
+import logging
 from datetime import datetime
 import re
+import threading
+import time
 from typing import Dict, List, Optional
-from openai import OpenAI
+from admission import CHAT_PRIORITY, AdmissionController
+from cache import create_cache, make_cache_key, normalize_message
+from circuit_breaker import CircuitBreaker
+from http_client import async_http_client, http_client
+from concurrency import AsyncSingleFlight, SingleFlight
+from intents import IntentClassifier
+from knowledge_base import KnowledgeBase
+from log_pipeline import annotate
+from market_prices import PriceStore
+from metrics import is_timeout, record_tokens, stage
+from prompt import PromptSection, assemble, budget, count_tokens
+from rate_limit import charge_tokens
+from responses import ResponseCatalogue
+from retrieval import RetrievalIndex, knowledge_base_snippets
+from semantic_cache import SemanticCache, partition_key, question_qualifiers
+from sessions import SessionStore, history_messages
+
+logger = logging.getLogger(__name__)
+
+OPENAI_MODEL = "gpt-3.5-turbo"
+# Grounded prompts carry the relevant facts, so answers can be shorter
+COMPLETION_MAX_TOKENS = int(os.getenv('COMPLETION_MAX_TOKENS', '300'))
+GROUNDED_MAX_TOKENS = int(os.getenv('GROUNDED_MAX_TOKENS', '200'))
+# Prompt token budgets: whole prompt and per section (see prompt.py)
+PROMPT_MAX_TOKENS = budget('max', 1500)
+PROMPT_BUDGETS = {
+    'system': budget('system', 300),
+    'knowledge': budget('knowledge', 250),
+    'question': budget('question', 300),
+    'history': budget('history', 400)
+}
+WEATHER_API_URL = os.getenv('WEATHER_API_URL', 'http://api.weatherapi.com/v1/current.json')
+
+# Representative town queried for each region when prefetching weather
+REGION_WEATHER_TOWNS = {
+    'Lusaka': 'Lusaka',
+    'Copperbelt': 'Ndola',
+    'Central': 'Kabwe',
+    'Eastern': 'Chipata',
+    'Western': 'Mongu',
+    'Southern': 'Choma',
+    'Northern': 'Kasama',
+    'North-Western': 'Solwezi',
+    'Luapula': 'Mansa',
+    'Muchinga': 'Chinsali'
+}
+
+# Alternative spellings folded onto one weather cache entry
+LOCATION_ALIASES = {
+    'lsk': 'lusaka',
+    'lusaka city': 'lusaka',
+    'lusaka district': 'lusaka',
+    'copperbelt': 'ndola',
+    'central': 'kabwe',
+    'eastern': 'chipata',
+    'western': 'mongu',
+    'southern': 'choma',
+    'northern': 'kasama',
+    'north western': 'solwezi',
+    'northwestern': 'solwezi',
+    'luapula': 'mansa',
+    'muchinga': 'chinsali'
+}
+
+# Indicative prices served until market price data has been ingested
+REFERENCE_PRICES = {
+    'maize': {'price': 'K180/50kg', 'trend': 'stable'},
+    'cassava': {'price': 'K65/kg', 'trend': 'rising'},
+    'groundnuts': {'price': 'K120/kg', 'trend': 'stable'},
+    'soybeans': {'price': 'K200/kg', 'trend': 'falling'}
+}
 
 class ZambianFarmerChatbot:
-    def __init__(self):
+    def __init__(self, response_cache=None):
         """Initialize the Zambian Farmer Chatbot with agricultural knowledge"""
-        self.knowledge_base = self._load_knowledge_base()
+        # Compiled, memory-mapped knowledge base that reloads when its data file changes
+        self.knowledge = KnowledgeBase.from_env()
+        
+        # Price observations from market data drops, with trends per crop, market and province
+        self.market_prices = PriceStore.from_env()
+        
+        # Vector index over one-fact knowledge base snippets, for grounding prompts
+        self._knowledge_index = None
+        self.retrieval_top_k = int(os.getenv('RETRIEVAL_TOP_K', '3'))
+        self.retrieval_min_score = float(os.getenv('RETRIEVAL_MIN_SCORE', '0.1'))
+        # A fact scoring at least this well is returned directly instead of asking the LLM
+        self.retrieval_answer_score = float(os.getenv('RETRIEVAL_ANSWER_SCORE', '0.45'))
         self.weather_api_key = os.getenv('WEATHER_API_KEY', '')
         self.openai_api_key = os.getenv('OPENAI_API_KEY', '')
+        # Clients (and the openai package, the slowest import) are created on first use; see warm_up
+        self._openai_client = None
+        self._async_openai_client = None
+        
+        # Cache for OpenAI completions; any object with get/set/stats can be plugged in
+        if response_cache is None:
+            response_cache = create_cache(
+                'completions',
+                max_entries=int(os.getenv('RESPONSE_CACHE_SIZE', '2048')),
+                ttl=float(os.getenv('RESPONSE_CACHE_TTL', '21600'))
+            )
+        self.response_cache = response_cache
+        
+        # Near-duplicate questions ("when should I plant maize?" / "what month do
+        # I plant my maize") share answers through a per-process semantic cache
+        self.semantic_cache = SemanticCache(
+            max_entries=int(os.getenv('SEMANTIC_CACHE_SIZE', '10000')),
+            ttl=float(os.getenv('RESPONSE_CACHE_TTL', '21600')),
+            threshold=float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.75'))
+        )
+        
+        # Weather is served from cache while fresh, and stale data is used if WeatherAPI fails
+        self.weather_fresh_ttl = float(os.getenv('WEATHER_CACHE_TTL', '900'))
+        self.weather_stale_ttl = float(os.getenv('WEATHER_STALE_TTL', '10800'))
+        self.weather_cache = create_cache(
+            'weather', max_entries=512, ttl=self.weather_stale_ttl
+        )
+        
+        # Fail fast on a degraded upstream instead of waiting out its timeout;
+        # timeouts follow each service's recent latency
+        self.openai_breaker = CircuitBreaker.from_env('openai', max_timeout=30, min_timeout=5)
+        self.weather_breaker = CircuitBreaker.from_env('weather', max_timeout=8)
+        # Client-side retries multiply the wait on a failing API; the breaker handles outages
+        self.openai_max_retries = int(os.getenv('OPENAI_MAX_RETRIES', '1'))
+        # Bound concurrent LLM calls; callers that are not admitted answer without the LLM
+        self.admission = AdmissionController.from_env()
+        
+        # Coalesce identical in-flight upstream calls within this worker
+        self.completion_flight = SingleFlight('openai')
+        self.async_completion_flight = AsyncSingleFlight('openai_async')
+        self.weather_flight = SingleFlight('weather')
+        self.async_weather_flight = AsyncSingleFlight('weather_async')
+        self._weather_prefetch_stop = threading.Event()
+        self._weather_prefetch_thread = None
         
-        # Initialize OpenAI client if API key is available
         if self.openai_api_key:
-            try:
-                self.openai_client = OpenAI(api_key=self.openai_api_key)
-                self.openai_available = True
-                print("✅ OpenAI API configured successfully")
-            except Exception as e:
-                print(f"⚠️ OpenAI API configuration failed: {e}")
-                self.openai_available = False
+            self.openai_available = True
+            logger.info("OpenAI API configured successfully")
         else:
-            print("⚠️ No OpenAI API key found - using rule-based responses")
+            logger.warning("No OpenAI API key found - using rule-based responses")
             self.openai_available = False
         
         # Zambian agricultural context
@@ -37,339 +159,924 @@ class ZambianFarmerChatbot:
             'Lusaka', 'Copperbelt', 'Central', 'Eastern', 'Western',
             'Southern', 'Northern', 'North-Western', 'Luapula', 'Muchinga'
         ]
-
-    def _load_knowledge_base(self) -> Dict:
-        """Load agricultural knowledge base"""
-        knowledge = {
-            'crops': {
-                'maize': {
-                    'planting_season': 'November to December',
-                    'harvest_time': 'April to June',
-                    'water_needs': 'Moderate to high',
-                    'soil_type': 'Well-drained loamy soil',
-                    'spacing': '75cm x 25cm',
-                    'fertilizer': 'NPK 10-20-10 or 12-24-12',
-                    'pests': ['Fall armyworm', 'Stem borers', 'Aphids'],
-                    'diseases': ['Maize streak virus', 'Grey leaf spot', 'Rust']
-                },
-                'cassava': {
-                    'planting_season': 'October to December',
-                    'harvest_time': '8-18 months after planting',
-                    'water_needs': 'Low to moderate',
-                    'soil_type': 'Sandy loam to clay loam',
-                    'spacing': '1m x 1m',
-                    'fertilizer': 'NPK 12-24-12',
-                    'pests': ['Cassava mealybug', 'Green mite'],
-                    'diseases': ['Cassava mosaic virus', 'Bacterial blight']
-                },
-                'groundnuts': {
-                    'planting_season': 'November to December',
-                    'harvest_time': '4-5 months after planting',
-                    'water_needs': 'Moderate',
-                    'soil_type': 'Sandy loam',
-                    'spacing': '60cm x 15cm',
-                    'fertilizer': 'NPK 12-24-12',
-                    'pests': ['Aphids', 'Thrips'],
-                    'diseases': ['Groundnut rosette virus', 'Leaf spot']
-                }
-            },
-            'weather_patterns': {
-                'rainy_season': 'November to April',
-                'dry_season': 'May to October',
-                'average_rainfall': '800-1400mm annually'
-            },
-            'soil_types': {
-                'sandy': 'Good for root crops like cassava',
-                'clay': 'Good for rice and vegetables',
-                'loamy': 'Best for most crops including maize'
-            }
+        
+        # Rule-based answers in all supported languages, plus local crop names
+        self.responses = ResponseCatalogue.from_env()
+        # Outside English, a named crop, pest or disease (or a price question) is answered from the catalogue
+        self.local_direct_answers = os.getenv('LOCAL_LANGUAGE_DIRECT_ANSWERS', 'true').lower() == 'true'
+        
+        # Single-pass keyword classifier covering all supported languages
+        self.intent_classifier = IntentClassifier(
+            extra_keywords={'crop': self.zambian_crops + list(self.responses.crop_aliases)}
+        )
+        
+        # Recent turns per chat session, so follow-up questions keep their context
+        self.sessions = SessionStore.from_env()
+        
+        # Place names that must match exactly for two questions to share a semantic cache entry
+        self._place_names = {
+            word for name in list(REGION_WEATHER_TOWNS.values()) + list(LOCATION_ALIASES) + self.zambian_regions
+            for word in normalize_message(name).split()
         }
-        return knowledge
 
-    def get_response(self, user_message: str, language: str = 'english') -> str:
-        """Generate a response based on user input"""
-        user_message_lower = user_message.lower().strip()
+    @property
+    def knowledge_base(self) -> Dict:
+        """The current knowledge base as a dict (see data/knowledge_base.json)"""
+        return self.knowledge.snapshot()
+
+    @property
+    def openai_client(self):
+        """OpenAI client, created on first use"""
+        if self._openai_client is None:
+            from openai import OpenAI
+            self._openai_client = OpenAI(api_key=self.openai_api_key, max_retries=self.openai_max_retries)
+        return self._openai_client
+
+    def warm_up(self) -> None:
+        """Import openai, build the OpenAI client and the retrieval index now rather than on first use.
+
+        Called at startup unless LAZY_STARTUP is set; with gunicorn's
+        preload_app the work is done once in the master and shared by workers.
+        """
+        if self.openai_available:
+            try:
+                self.openai_client
+            except Exception as e:
+                logger.warning("OpenAI API configuration failed: %s", e)
+                self.openai_available = False
+        self.knowledge_index
+
+    @property
+    def knowledge_index(self) -> RetrievalIndex:
+        """Retrieval index over the current knowledge base, rebuilt after a reload"""
+        self.knowledge.reload_if_changed()
+        generation = self.knowledge.generation
+        current = self._knowledge_index
+        if current is None or current[0] != generation:
+            current = (generation, RetrievalIndex(*knowledge_base_snippets(self.knowledge_base)))
+            self._knowledge_index = current
+        return current[1]
+
+    def get_response(self, user_message: str, language: str = 'english',
+                     session_id: Optional[str] = None) -> str:
+        """Generate a response based on user input, continuing the session's conversation if given"""
+        answer = self._respond(user_message, language, self.sessions.history(session_id))
+        self.sessions.append(session_id, user_message, answer)
+        return answer
+
+    def _respond(self, user_message: str, language: str, history: List[str]) -> str:
+        with stage('chat', 'intent'):
+            intents = self.intent_classifier.classify(user_message)
+        annotate(intent=next(iter(intents), None))
         
-        # Check if this is a simple greeting first
-        if self._is_greeting(user_message_lower):
+        # Answer plain greetings directly; "hi, when do I plant maize?" is a real question
+        if list(intents) == ['greeting']:
             return self._get_greeting(language)
         
         # Hybrid: Weather queries use live data + AI summary
-        if self._is_weather_query(user_message_lower):
+        if 'weather' in intents:
             location = self._extract_location_from_message(user_message)
             if not location:
                 return "Please specify a location (e.g., 'weather in Lusaka')."
-            weather_data = self.get_weather_info(location)
+            with stage('chat', 'weather'):
+                weather_data = self.get_weather_info(location)
             if 'error' in weather_data:
                 return weather_data['error']
             # Compose a prompt for OpenAI
             if self.openai_available:
-                weather_prompt = (
-                    f"Here is the current weather for {weather_data['location']} in Zambia: "
-                    f"Temperature: {weather_data['temperature']}, "
-                    f"Condition: {weather_data['condition']}, "
-                    f"Humidity: {weather_data['humidity']}. "
-                    f"Forecast: {weather_data['forecast']}. "
-                    f"Please summarize this weather for a Zambian farmer in {language}."
-                )
+                weather_prompt = self._weather_summary_prompt(weather_data, language)
                 try:
-                    ai_response = self._get_openai_response(weather_prompt, language)
+                    with stage('chat', 'llm'):
+                        ai_response = self._get_openai_response(weather_prompt, language, ground=False)
                     if ai_response:
                         return ai_response
                 except Exception as e:
-                    print(f"OpenAI API error (weather): {e}")
+                    logger.warning("OpenAI API error (weather): %s", e)
             # Fallback: plain weather data
-            return (
-                f"Weather for {weather_data['location']}: "
-                f"{weather_data['temperature']}, {weather_data['condition']}, "
-                f"Humidity: {weather_data['humidity']}. Forecast: {weather_data['forecast']}"
-            )
+            return self._format_weather(weather_data)
+        
+        # A close knowledge base match (or a catalogue answer) is answered without the LLM
+        with stage('chat', 'retrieval'):
+            direct_answer = self._get_direct_answer(user_message, language, intents)
+        if direct_answer:
+            return direct_answer
         
         # Try OpenAI API for all other queries if available
         if self.openai_available:
             try:
-                ai_response = self._get_openai_response(user_message, language)
+                with stage('chat', 'llm'):
+                    ai_response = self._get_openai_response(user_message, language, history=history)
                 if ai_response:
                     return ai_response
             except Exception as e:
-                print(f"OpenAI API error: {e}")
+                logger.warning("OpenAI API error: %s", e)
                 # Fall back to rule-based system
         
         # Fallback to rule-based system for specific query types
-        return self._get_rule_based_response(user_message, language)
+        with stage('chat', 'rule_based'):
+            return self._get_rule_based_response(user_message, language, intents)
+
+    async def get_response_async(self, user_message: str, language: str = 'english',
+                                 session_id: Optional[str] = None) -> str:
+        """Async variant of get_response for the ASGI app; upstream calls do not block the event loop"""
+        answer = await self._respond_async(user_message, language, self.sessions.history(session_id))
+        self.sessions.append(session_id, user_message, answer)
+        return answer
+
+    async def _respond_async(self, user_message: str, language: str, history: List[str]) -> str:
+        with stage('chat', 'intent'):
+            intents = self.intent_classifier.classify(user_message)
+        annotate(intent=next(iter(intents), None))
+        
+        if list(intents) == ['greeting']:
+            return self._get_greeting(language)
+        
+        if 'weather' in intents:
+            location = self._extract_location_from_message(user_message)
+            if not location:
+                return "Please specify a location (e.g., 'weather in Lusaka')."
+            with stage('chat', 'weather'):
+                weather_data = await self.get_weather_info_async(location)
+            if 'error' in weather_data:
+                return weather_data['error']
+            if self.openai_available:
+                weather_prompt = self._weather_summary_prompt(weather_data, language)
+                with stage('chat', 'llm'):
+                    ai_response = await self._get_openai_response_async(weather_prompt, language, ground=False)
+                if ai_response:
+                    return ai_response
+            return self._format_weather(weather_data)
+        
+        with stage('chat', 'retrieval'):
+            direct_answer = self._get_direct_answer(user_message, language, intents)
+        if direct_answer:
+            return direct_answer
+        
+        if self.openai_available:
+            with stage('chat', 'llm'):
+                ai_response = await self._get_openai_response_async(user_message, language, history=history)
+            if ai_response:
+                return ai_response
+        
+        with stage('chat', 'rule_based'):
+            return self._get_rule_based_response(user_message, language, intents)
+
+    def _weather_summary_prompt(self, weather_data: Dict, language: str) -> str:
+        """Prompt asking the LLM to summarize live weather for a farmer"""
+        return (
+            f"Here is the current weather for {weather_data['location']} in Zambia: "
+            f"Temperature: {weather_data['temperature']}, "
+            f"Condition: {weather_data['condition']}, "
+            f"Humidity: {weather_data['humidity']}. "
+            f"Forecast: {weather_data['forecast']}. "
+            f"Please summarize this weather for a Zambian farmer in {language}."
+        )
+
+    def _format_weather(self, weather_data: Dict) -> str:
+        """Plain-text weather used when the LLM is unavailable"""
+        return (
+            f"Weather for {weather_data['location']}: "
+            f"{weather_data['temperature']}, {weather_data['condition']}, "
+            f"Humidity: {weather_data['humidity']}. Forecast: {weather_data['forecast']}"
+        )
+
+    def _build_system_context(self, language: str) -> str:
+        """Build the instructions part of the system prompt sent with every OpenAI request"""
+        return (
+            "You are a helpful agricultural assistant for Zambian farmers. "
+            "You have expertise in Zambian farming practices, crops, weather patterns, and local conditions.\n"
+            f"Key Zambian crops: {', '.join(self.zambian_crops)}\n"
+            f"Zambian regions: {', '.join(self.zambian_regions)}\n"
+            f"Respond in {language} if requested, otherwise use English. "
+            "Be helpful, practical, and specific to Zambian farming conditions. "
+            "Keep responses concise but informative."
+        )
+
+    def _build_knowledge_context(self, knowledge: Optional[List[str]] = None) -> str:
+        """Facts for the system prompt, best match first so truncation drops the weakest"""
+        if knowledge:
+            return "Relevant facts (base your answer on these where they apply):\n" + "\n".join(
+                f"- {fact}" for fact in knowledge
+            )
+        return ("Current knowledge base:\n"
+                "- Rainy season: November to April\n"
+                "- Dry season: May to October\n"
+                "- Average rainfall: 800-1400mm annually")
+
+    def _completion_cache_key(self, user_message: str, language: str, context: str) -> str:
+        """Cache key from the normalized message, language and a hash of the system context"""
+        context_hash = hashlib.sha256(context.encode('utf-8')).hexdigest()
+        return make_cache_key(
+            'completion', OPENAI_MODEL, normalize_message(user_message),
+            language.lower(), context_hash
+        )
+
+    def _completion_request(self, user_message: str, language: str, ground: bool = True,
+                            history: Optional[List[str]] = None):
+        """Return the response cache key and chat.completions.create arguments for a question.
+
+        With ground=True the top knowledge base facts for the question are put
+        in the system prompt and the answer is capped at GROUNDED_MAX_TOKENS.
+        Each prompt section is held to its PROMPT_*_TOKENS budget and the whole
+        prompt to PROMPT_MAX_TOKENS, cutting the oldest conversation history
+        first, then the knowledge facts.
+        """
+        knowledge = self.get_knowledge_snippets(user_message) if ground else []
+        texts, _ = assemble([
+            PromptSection('system', self._build_system_context(language), PROMPT_BUDGETS['system'],
+                          priority=3, required=True),
+            PromptSection('knowledge', self._build_knowledge_context(knowledge), PROMPT_BUDGETS['knowledge'],
+                          priority=1),
+            # Prompts built elsewhere (/api/ask) were budgeted there; only the overall cap applies
+            PromptSection('question', user_message,
+                          PROMPT_BUDGETS['question'] if ground else PROMPT_MAX_TOKENS, priority=2, required=True),
+            PromptSection('history', '\n'.join(history or []), PROMPT_BUDGETS['history'],
+                          priority=0, keep_tail=True)
+        ], PROMPT_MAX_TOKENS, kind='chat' if ground else 'prebuilt')
+        context = texts['system'] + ('\n\n' + texts['knowledge'] if texts['knowledge'] else '')
+        history = texts['history'].split('\n') if texts['history'] else []
+        if history and history[0].startswith('Earlier: '):
+            context += f"\n\nEarlier in this conversation the farmer asked: {history[0][len('Earlier: '):]}"
+        user_message = texts['question']
+        cache_key = self._completion_cache_key(user_message, language, '\n'.join([context] + history))
+        params = {
+            'model': OPENAI_MODEL,
+            'messages': [
+                {"role": "system", "content": context},
+                *history_messages(history),
+                {"role": "user", "content": user_message}
+            ],
+            'max_tokens': GROUNDED_MAX_TOKENS if knowledge else COMPLETION_MAX_TOKENS,
+            'temperature': 0.7
+        }
+        return cache_key, params
+
+    def _semantic_partition(self, user_message: str, language: str) -> tuple:
+        """Semantic cache partition: model, language, the crops, places and numbers mentioned,
+        whether the question is negated, and its season and time words"""
+        words = normalize_message(user_message).split()
+        negation, qualifiers = question_qualifiers(user_message)
+        return partition_key(
+            f"{OPENAI_MODEL}:{language}",
+            self.intent_classifier.match(user_message).get('crop', []),
+            [word for word in words if word in self._place_names],
+            [word for word in words if any(c.isdigit() for c in word)],
+            negation,
+            qualifiers
+        )
+
+    def _cached_answer(self, cache_key: str, user_message: str, language: str, shareable: bool):
+        """Exact cache hit, else a semantic hit for standalone questions"""
+        cached = self.response_cache.get(cache_key)
+        if cached is None and shareable:
+            cached = self.semantic_cache.get(user_message, self._semantic_partition(user_message, language))
+        return cached
+
+    def _cache_answer(self, cache_key: str, user_message: str, language: str, shareable: bool, answer: str) -> None:
+        self.response_cache.set(cache_key, answer)
+        # Prompts carrying farm data, weather or conversation history are never shared between near-duplicates
+        if shareable:
+            self.semantic_cache.set(user_message, self._semantic_partition(user_message, language), answer)
+
+    @staticmethod
+    def _record_usage(response, params: Optional[Dict] = None, answer: str = '', charge: bool = True) -> int:
+        """Count tokens from the API's usage report, or estimate them for a streamed answer.
+
+        The tokens are also charged to the daily budget of the farmer being
+        answered, if any, unless charge is False (coalesced completions
+        charge every caller themselves). Returns the total token count.
+        """
+        usage = getattr(response, 'usage', None)
+        if usage is not None:
+            prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
+        elif params is not None:
+            prompt_tokens = sum(count_tokens(m['content']) for m in params['messages'])
+            completion_tokens = count_tokens(answer)
+        else:
+            return 0
+        record_tokens(prompt_tokens, completion_tokens)
+        if charge:
+            charge_tokens(prompt_tokens + completion_tokens)
+        return prompt_tokens + completion_tokens
 
-    def _get_openai_response(self, user_message: str, language: str) -> str:
-        """Get response from OpenAI API"""
+    def _get_openai_response(self, user_message: str, language: str, ground: bool = True,
+                             history: Optional[List[str]] = None, priority: int = CHAT_PRIORITY) -> str:
+        """Get response from OpenAI API, serving repeat questions from the response cache"""
         try:
-            # Create context for the AI
-            context = f"""You are a helpful agricultural assistant for Zambian farmers. 
-            You have expertise in Zambian farming practices, crops, weather patterns, and local conditions.
+            cache_key, params = self._completion_request(user_message, language, ground, history)
+            shareable = ground and not history
+            cached = self._cached_answer(cache_key, user_message, language, shareable)
+            if cached is not None:
+                return cached
             
-            Key Zambian crops: {', '.join(self.zambian_crops)}
-            Zambian regions: {', '.join(self.zambian_regions)}
+            def fetch():
+                with self.admission.admit(priority) as admitted:
+                    if not admitted:
+                        return None, 0
+                    with self.openai_breaker.guard() as call:
+                        response = self.openai_client.chat.completions.create(timeout=call.timeout, **params)
+                tokens = self._record_usage(response, charge=False)
+                answer = response.choices[0].message.content.strip()
+                if answer:
+                    self._cache_answer(cache_key, user_message, language, shareable, answer)
+                return answer, tokens
             
-            Current knowledge base:
-            - Rainy season: November to April
-            - Dry season: May to October
-            - Average rainfall: 800-1400mm annually
+            # Identical questions already in flight share one API call, charged to every farmer waiting on it
+            answer, tokens = self.completion_flight.do(cache_key, fetch)
+            charge_tokens(tokens)
+            return answer
             
-            Respond in {language} if requested, otherwise use English.
-            Be helpful, practical, and specific to Zambian farming conditions.
-            Keep responses concise but informative."""
+        except Exception as e:
+            logger.warning("OpenAI API call failed: %s", e)
+            return None
+
+    def _stream_openai_response(self, user_message: str, language: str, ground: bool = True,
+                                history: Optional[List[str]] = None, priority: int = CHAT_PRIORITY):
+        """Yield the OpenAI answer token by token; a cached answer is yielded whole.
+
+        Returns True (via StopIteration) if anything was yielded, so callers
+        using ``yield from`` can fall back when the API is unavailable.
+        """
+        try:
+            cache_key, params = self._completion_request(user_message, language, ground, history)
+            shareable = ground and not history
+            cached = self._cached_answer(cache_key, user_message, language, shareable)
+            if cached is not None:
+                yield cached
+                return True
+        except Exception as e:
+            logger.warning("OpenAI API call failed: %s", e)
+            return False
+        
+        # The admission slot is held until the stream is fully read
+        with self.admission.admit(priority) as admitted:
+            if not admitted:
+                return False
+            try:
+                # Timed to the first byte, so streams keep their own timeout apart from whole completions
+                with self.openai_breaker.guard('stream') as call:
+                    stream = self.openai_client.chat.completions.create(stream=True, timeout=call.timeout, **params)
+            except Exception as e:
+                logger.warning("OpenAI API call failed: %s", e)
+                return False
             
-            response = self.openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": context},
-                    {"role": "user", "content": user_message}
-                ],
-                max_tokens=300,
-                temperature=0.7
-            )
+            parts = []
+            try:
+                for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+            except Exception as e:
+                logger.warning("OpenAI stream interrupted: %s", e)
+                self.openai_breaker.record_failure('stream', timed_out=is_timeout(e))
+                return bool(parts)
+        answer = ''.join(parts).strip()
+        self._record_usage(None, params, answer)
+        if answer:
+            self._cache_answer(cache_key, user_message, language, shareable, answer)
+        return bool(parts)
+
+    def stream_response(self, user_message: str, language: str = 'english',
+                        session_id: Optional[str] = None):
+        """Streaming variant of get_response yielding text chunks.
+
+        LLM answers are streamed as they are generated; greetings, rule-based,
+        cached and plain weather answers are yielded as a single chunk. The
+        turn is added to the session once the answer is complete.
+        """
+        parts = []
+        for chunk in self._stream(user_message, language, self.sessions.history(session_id)):
+            parts.append(chunk)
+            yield chunk
+        self.sessions.append(session_id, user_message, ''.join(parts).strip())
+
+    def _stream(self, user_message: str, language: str, history: List[str]):
+        with stage('chat', 'intent'):
+            intents = self.intent_classifier.classify(user_message)
+        annotate(intent=next(iter(intents), None))
+        
+        if list(intents) == ['greeting']:
+            yield self._get_greeting(language)
+            return
+        
+        if 'weather' in intents:
+            location = self._extract_location_from_message(user_message)
+            if not location:
+                yield "Please specify a location (e.g., 'weather in Lusaka')."
+                return
+            with stage('chat', 'weather'):
+                weather_data = self.get_weather_info(location)
+            if 'error' in weather_data:
+                yield weather_data['error']
+                return
+            if self.openai_available:
+                weather_prompt = self._weather_summary_prompt(weather_data, language)
+                with stage('chat', 'llm'):
+                    streamed = yield from self._stream_openai_response(weather_prompt, language, ground=False)
+                if streamed:
+                    return
+            yield self._format_weather(weather_data)
+            return
+        
+        with stage('chat', 'retrieval'):
+            direct_answer = self._get_direct_answer(user_message, language, intents)
+        if direct_answer:
+            yield direct_answer
+            return
+        
+        if self.openai_available:
+            with stage('chat', 'llm'):
+                streamed = yield from self._stream_openai_response(user_message, language, history=history)
+            if streamed:
+                return
+        
+        with stage('chat', 'rule_based'):
+            answer = self._get_rule_based_response(user_message, language, intents)
+        yield answer
+
+    @property
+    def async_openai_client(self):
+        """AsyncOpenAI client used by the ASGI app, created on first use"""
+        if self._async_openai_client is None:
+            from openai import AsyncOpenAI
+            self._async_openai_client = AsyncOpenAI(api_key=self.openai_api_key,
+                                                    max_retries=self.openai_max_retries)
+        return self._async_openai_client
+
+    async def _get_openai_response_async(self, user_message: str, language: str, ground: bool = True,
+                                         history: Optional[List[str]] = None, priority: int = CHAT_PRIORITY) -> str:
+        """Async variant of _get_openai_response sharing the same response cache"""
+        try:
+            cache_key, params = self._completion_request(user_message, language, ground, history)
+            shareable = ground and not history
+            cached = self._cached_answer(cache_key, user_message, language, shareable)
+            if cached is not None:
+                return cached
+            
+            async def fetch():
+                async with self.admission.admit_async(priority) as admitted:
+                    if not admitted:
+                        return None, 0
+                    with self.openai_breaker.guard() as call:
+                        response = await self.async_openai_client.chat.completions.create(timeout=call.timeout, **params)
+                tokens = self._record_usage(response, charge=False)
+                answer = response.choices[0].message.content.strip()
+                if answer:
+                    self._cache_answer(cache_key, user_message, language, shareable, answer)
+                return answer, tokens
             
-            return response.choices[0].message.content.strip()
+            answer, tokens = await self.async_completion_flight.do(cache_key, fetch)
+            charge_tokens(tokens)
+            return answer
             
         except Exception as e:
-            print(f"OpenAI API call failed: {e}")
+            logger.warning("OpenAI API call failed: %s", e)
             return None
 
-    def _get_rule_based_response(self, user_message: str, language: str) -> str:
-        """Generate response using rule-based system"""
-        # Check for specific queries
-        if self._is_weather_query(user_message):
-            return self._handle_weather_query(user_message, language)
+    async def _stream_openai_response_async(self, user_message: str, language: str, ground: bool = True,
+                                            history: Optional[List[str]] = None, priority: int = CHAT_PRIORITY):
+        """Async variant of _stream_openai_response (yields nothing if the API is unavailable)"""
+        try:
+            cache_key, params = self._completion_request(user_message, language, ground, history)
+            shareable = ground and not history
+            cached = self._cached_answer(cache_key, user_message, language, shareable)
+            if cached is not None:
+                yield cached
+                return
+        except Exception as e:
+            logger.warning("OpenAI API call failed: %s", e)
+            return
         
-        elif self._is_crop_query(user_message):
-            return self._handle_crop_query(user_message, language)
+        async with self.admission.admit_async(priority) as admitted:
+            if not admitted:
+                return
+            try:
+                with self.openai_breaker.guard('stream') as call:
+                    stream = await self.async_openai_client.chat.completions.create(stream=True, timeout=call.timeout, **params)
+            except Exception as e:
+                logger.warning("OpenAI API call failed: %s", e)
+                return
+            
+            parts = []
+            try:
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+            except Exception as e:
+                logger.warning("OpenAI stream interrupted: %s", e)
+                self.openai_breaker.record_failure('stream', timed_out=is_timeout(e))
+                return
+        answer = ''.join(parts).strip()
+        self._record_usage(None, params, answer)
+        if answer:
+            self._cache_answer(cache_key, user_message, language, shareable, answer)
+
+    async def stream_response_async(self, user_message: str, language: str = 'english',
+                                    session_id: Optional[str] = None):
+        """Async variant of stream_response"""
+        parts = []
+        async for chunk in self._stream_async(user_message, language, self.sessions.history(session_id)):
+            parts.append(chunk)
+            yield chunk
+        self.sessions.append(session_id, user_message, ''.join(parts).strip())
+
+    async def _stream_async(self, user_message: str, language: str, history: List[str]):
+        with stage('chat', 'intent'):
+            intents = self.intent_classifier.classify(user_message)
+        annotate(intent=next(iter(intents), None))
         
-        elif self._is_pest_disease_query(user_message):
-            return self._handle_pest_disease_query(user_message, language)
+        if list(intents) == ['greeting']:
+            yield self._get_greeting(language)
+            return
         
-        elif self._is_market_query(user_message):
-            return self._handle_market_query(user_message, language)
+        if 'weather' in intents:
+            location = self._extract_location_from_message(user_message)
+            if not location:
+                yield "Please specify a location (e.g., 'weather in Lusaka')."
+                return
+            with stage('chat', 'weather'):
+                weather_data = await self.get_weather_info_async(location)
+            if 'error' in weather_data:
+                yield weather_data['error']
+                return
+            if self.openai_available:
+                streamed = False
+                weather_prompt = self._weather_summary_prompt(weather_data, language)
+                with stage('chat', 'llm'):
+                    async for chunk in self._stream_openai_response_async(weather_prompt, language, ground=False):
+                        streamed = True
+                        yield chunk
+                if streamed:
+                    return
+            yield self._format_weather(weather_data)
+            return
         
-        else:
-            return self._get_general_advice(user_message, language)
+        with stage('chat', 'retrieval'):
+            direct_answer = self._get_direct_answer(user_message, language, intents)
+        if direct_answer:
+            yield direct_answer
+            return
+        
+        if self.openai_available:
+            streamed = False
+            with stage('chat', 'llm'):
+                async for chunk in self._stream_openai_response_async(user_message, language, history=history):
+                    streamed = True
+                    yield chunk
+            if streamed:
+                return
+        
+        with stage('chat', 'rule_based'):
+            answer = self._get_rule_based_response(user_message, language, intents)
+        yield answer
+
+    def _get_rule_based_response(self, user_message: str, language: str,
+                                 intents: Optional[Dict[str, float]] = None) -> str:
+        """Generate response using rule-based system, answering the highest scoring intent"""
+        if intents is None:
+            intents = self.intent_classifier.classify(user_message)
+        handlers = {
+            'weather': self._handle_weather_query,
+            'crop': self._handle_crop_query,
+            'pest_disease': self._handle_pest_disease_query,
+            'market': self._handle_market_query
+        }
+        for intent in intents:
+            if intent in handlers:
+                return handlers[intent](user_message, language)
+        facts = self.get_knowledge_snippets(user_message)
+        if facts and language == 'english':
+            return "Here is what I know:\n" + "\n".join(f"• {fact}" for fact in facts)
+        return self._get_general_advice(user_message, language)
+
+    def _get_retrieved_answer(self, user_message: str, language: str) -> Optional[str]:
+        """The best matching knowledge base fact, if it matches closely enough to answer on its own"""
+        if language != 'english':
+            return None
+        results = self.knowledge_index.search(user_message, k=1, min_score=self.retrieval_answer_score)
+        return results[0][1] if results else None
+
+    def _get_direct_answer(self, user_message: str, language: str,
+                           intents: Dict[str, float]) -> Optional[str]:
+        """An answer that needs no LLM: a close knowledge base fact in English; in other
+        languages, the catalogue answer about a named crop, pest or disease, or prices.
+
+        Only a message that is just the topic, optionally with greetings and
+        catalogue direct_words ("chimanga", "ndiuzeni za chimanga"), is
+        answered here. Questions touching several topics ("price of maize")
+        or saying anything more ("my maize has yellow leaves") go to the LLM.
+        """
+        if language == 'english':
+            return self._get_retrieved_answer(user_message, language)
+        topics = [intent for intent in intents if intent != 'greeting']
+        if not self.local_direct_answers or len(topics) != 1 or not self._is_topic_only(user_message, language):
+            return None
+        intent = topics[0]
+        if intent == 'crop':
+            return self._named_crop_answer(user_message, language)
+        if intent == 'pest_disease':
+            return self._named_pest_answer(user_message, language)
+        if intent == 'market':
+            return self._handle_market_query(user_message, language)
+        return None
+
+    def _is_topic_only(self, message: str, language: str) -> bool:
+        """Whether every word of message is a keyword, a known pest or disease name, or a direct word"""
+        left = set(self.intent_classifier.unmatched(message)) - self.responses.direct_words(language)
+        if left:
+            for kind in ('pest', 'disease'):
+                for match in self.knowledge.find_terms(kind, message):
+                    left -= set(match['name'].lower().split())
+        return not left
 
     def _is_weather_query(self, message: str) -> bool:
         """Check if message is about weather"""
-        weather_keywords = ['weather', 'rain', 'temperature', 'climate', 'forecast']
-        return any(keyword in message for keyword in weather_keywords)
+        return 'weather' in self.intent_classifier.classify(message)
 
     def _is_crop_query(self, message: str) -> bool:
         """Check if message is about crops"""
-        crop_keywords = ['plant', 'grow', 'harvest', 'fertilizer', 'soil']
-        return any(keyword in message for keyword in crop_keywords) or \
-               any(crop in message for crop in self.zambian_crops)
+        return 'crop' in self.intent_classifier.classify(message)
 
     def _is_pest_disease_query(self, message: str) -> bool:
         """Check if message is about pests or diseases"""
-        pest_keywords = ['pest', 'disease', 'sick', 'damage', 'insect', 'fungus']
-        return any(keyword in message for keyword in pest_keywords)
+        return 'pest_disease' in self.intent_classifier.classify(message)
 
     def _is_market_query(self, message: str) -> bool:
         """Check if message is about market prices"""
-        market_keywords = ['price', 'market', 'sell', 'buy', 'cost', 'kwacha']
-        return any(keyword in message for keyword in market_keywords)
+        return 'market' in self.intent_classifier.classify(message)
 
     def _is_greeting(self, message: str) -> bool:
         """Check if message is a greeting"""
-        greetings = ['hello', 'hi', 'good morning', 'good afternoon', 'good evening']
-        return any(greeting in message for greeting in greetings)
+        return 'greeting' in self.intent_classifier.classify(message)
 
     def _handle_weather_query(self, message: str, language: str) -> str:
         """Handle weather-related queries"""
-        if language == 'english':
-            return ("In Zambia, the rainy season runs from November to April, "
-                   "and the dry season from May to October. Average rainfall is "
-                   "800-1400mm annually. For specific weather forecasts, please "
-                   "provide your location.")
-        else:
-            return self._translate_to_local_language(
-                "Weather information for Zambia", language
-            )
+        return self.responses.render(language, 'weather')
+
+    def _named_crop_answer(self, message: str, language: str) -> Optional[str]:
+        """Crop sheet for the first known crop named in message (English or local name)"""
+        # Crop names found by the intent classifier, in message order
+        for name in self.intent_classifier.match(message).get('crop', []):
+            crop = self.responses.crop_aliases.get(name, name)
+            if crop in self.zambian_crops:
+                crop_info = self.knowledge.crop(crop)
+                if crop_info:
+                    return self._format_crop_info(crop, crop_info, language)
+        return None
+
+    def _named_pest_answer(self, message: str, language: str) -> Optional[str]:
+        """What the first known pest or disease named in message affects"""
+        for kind in ('pest', 'disease'):
+            for match in self.knowledge.find_terms(kind, message):
+                crops = ', '.join(self.responses.crop_name(language, crop) for crop in match['crops'])
+                return self.responses.render(language, 'pest_match', name=match['name'], crops=crops)
+        return None
 
     def _handle_crop_query(self, message: str, language: str) -> str:
         """Handle crop-related queries"""
-        # Extract crop name from message
-        for crop in self.zambian_crops:
-            if crop in message:
-                crop_info = self.knowledge_base['crops'].get(crop, {})
-                if crop_info:
-                    if language == 'english':
-                        return self._format_crop_info(crop, crop_info)
-                    else:
-                        return self._translate_to_local_language(
-                            f"Information about {crop}", language
-                        )
+        answer = self._named_crop_answer(message, language)
+        if answer:
+            return answer
         
-        if language == 'english':
-            return ("I can help you with information about maize, cassava, "
-                   "groundnuts, and other crops grown in Zambia. What specific "
-                   "crop would you like to know about?")
-        else:
-            return self._translate_to_local_language(
-                "I can help with crop information", language
-            )
+        # No crop named: list what is grown in a region the farmer mentions
+        regions = self.knowledge.find_terms('region', message)
+        if regions:
+            crops = ', '.join(self.responses.crop_name(language, crop).title() for crop in regions[0]['crops'])
+            return self.responses.render(language, 'region_crops', region=regions[0]['name'], crops=crops)
+        
+        return self.responses.render(language, 'crop_help')
 
     def _handle_pest_disease_query(self, message: str, language: str) -> str:
         """Handle pest and disease queries"""
-        if language == 'english':
-            return ("Common pests in Zambia include Fall Armyworm, Stem Borers, "
-                   "and Aphids. For diseases, watch out for Maize Streak Virus, "
-                   "Grey Leaf Spot, and Rust. Describe the symptoms you're seeing "
-                   "for more specific advice.")
-        else:
-            return self._translate_to_local_language(
-                "Pest and disease information", language
-            )
+        return self._named_pest_answer(message, language) or self.responses.render(language, 'pest_disease')
 
     def _handle_market_query(self, message: str, language: str) -> str:
         """Handle market price queries"""
-        if language == 'english':
-            return ("Market prices vary by location and season. Current maize "
-                   "prices range from K150-200 per 50kg bag. Cassava prices "
-                   "are around K50-80 per kg. For the most current prices, "
-                   "check with your local market.")
-        else:
-            return self._translate_to_local_language(
-                "Market price information", language
-            )
+        available = self.market_prices.crops()
+        named = [self.responses.crop_aliases.get(name, name)
+                 for name in self.intent_classifier.match(message).get('crop', [])]
+        prices = self.market_prices.summaries([crop for crop in named if crop in available] or None)
+        if not prices:
+            return self.responses.render(language, 'market')
+        listed = '; '.join(
+            self.responses.render(language, 'market_price', crop=self.responses.crop_name(language, crop),
+                                  price=summary['price'],
+                                  trend=self.responses.render(language, f"trend_{summary['trend']}"))
+            for crop, summary in prices.items()
+        )
+        return self.responses.render(language, 'market_latest', days=self.market_prices.window, prices=listed)
 
     def _get_greeting(self, language: str) -> str:
         """Get appropriate greeting based on language"""
-        greetings = {
-            'english': "Hello! I'm your Zambian farming assistant. How can I help you today?",
-            'bemba': "Muli shani! Ndi mufyashi wenu wa Zambia. Nga ndesha ukusunga?",
-            'njanja': "Moni! Ndine wothandiza a alimi a Zambia. Ndikuthandizeni bwanji?",
-            'tonga': "Mwapona! Ndi mufyashi wenu wa Zambia. Nga ndesha ukusunga?",
-            'lozi': "Lumela! Ndi mufyashi wenu wa Zambia. Nga ndesha ukusunga?"
-        }
-        return greetings.get(language, greetings['english'])
+        return self.responses.render(language, 'greeting')
 
     def _get_general_advice(self, message: str, language: str) -> str:
         """Provide general farming advice"""
-        if language == 'english':
-            return ("I'm here to help with farming advice for Zambia. You can ask me about: "
-                   "• Weather and climate information\n"
-                   "• Crop planting and harvesting\n"
-                   "• Pest and disease management\n"
-                   "• Market prices\n"
-                   "• Soil and fertilizer advice\n"
-                   "What would you like to know?")
-        else:
-            return self._translate_to_local_language(
-                "General farming advice", language
-            )
+        return self.responses.render(language, 'general')
 
-    def _format_crop_info(self, crop: str, info: Dict) -> str:
+    def _format_crop_info(self, crop: str, info: Dict, language: str = 'english') -> str:
         """Format crop information in a readable way"""
-        return f"""Here's information about {crop}:
-
-🌱 Planting Season: {info.get('planting_season', 'N/A')}
-🌾 Harvest Time: {info.get('harvest_time', 'N/A')}
-💧 Water Needs: {info.get('water_needs', 'N/A')}
-🌍 Soil Type: {info.get('soil_type', 'N/A')}
-📏 Spacing: {info.get('spacing', 'N/A')}
-🌿 Fertilizer: {info.get('fertilizer', 'N/A')}
-
-🐛 Common Pests: {', '.join(info.get('pests', []))}
-🦠 Common Diseases: {', '.join(info.get('diseases', []))}"""
-
-    def _translate_to_local_language(self, text: str, language: str) -> str:
-        """Simple translation to local languages (basic implementation)"""
-        translations = {
-            'bemba': f"Bemba: {text}",
-            'njanja': f"Nyanja: {text}",
-            'tonga': f"Tonga: {text}",
-            'lozi': f"Lozi: {text}"
-        }
-        return translations.get(language, text)
+        return self.responses.render(
+            language, 'crop_sheet',
+            crop=self.responses.crop_name(language, crop),
+            planting_season=info.get('planting_season', 'N/A'),
+            harvest_time=info.get('harvest_time', 'N/A'),
+            water_needs=info.get('water_needs', 'N/A'),
+            soil_type=info.get('soil_type', 'N/A'),
+            spacing=info.get('spacing', 'N/A'),
+            fertilizer=info.get('fertilizer', 'N/A'),
+            pests=', '.join(info.get('pests', [])),
+            diseases=', '.join(info.get('diseases', []))
+        )
+
+    def _normalize_location(self, location: str) -> str:
+        """Fold case, punctuation and common aliases so equivalent locations share a cache entry"""
+        location = re.sub(r"[^a-z\s]", " ", location.lower())
+        location = re.sub(r"\s+", " ", location).strip()
+        if location in LOCATION_ALIASES:
+            return LOCATION_ALIASES[location]
+        location = re.sub(r"\b(city|town|district|province|region|zambia)\b", " ", location)
+        location = re.sub(r"\s+", " ", location).strip()
+        return LOCATION_ALIASES.get(location, location)
 
     def get_weather_info(self, location: str) -> Dict:
-        """Get weather information for a location using WeatherAPI.com"""
+        """Get weather information for a location, served from the weather cache while fresh"""
+        if not self.weather_api_key:
+            return {'error': 'Weather API key not configured. Please contact support.'}
+        key = self._normalize_location(location)
+        if not key:
+            return {'error': f"Could not fetch weather for '{location}'. Please check the location name."}
+        
+        cached = self.weather_cache.get(key)
+        if cached and time.time() - cached['fetched_at'] < self.weather_fresh_ttl:
+            return dict(cached['data'])
+        
+        # Concurrent requests for the same location share one WeatherAPI call
+        weather = self.weather_flight.do(key, lambda: self._refresh_weather(key, location))
+        if 'error' in weather and cached:
+            stale = dict(cached['data'])
+            stale['stale'] = True
+            return stale
+        return dict(weather)
+
+    async def get_weather_info_async(self, location: str) -> Dict:
+        """Async variant of get_weather_info sharing the same weather cache"""
         if not self.weather_api_key:
             return {'error': 'Weather API key not configured. Please contact support.'}
+        key = self._normalize_location(location)
+        if not key:
+            return {'error': f"Could not fetch weather for '{location}'. Please check the location name."}
+        
+        cached = self.weather_cache.get(key)
+        if cached and time.time() - cached['fetched_at'] < self.weather_fresh_ttl:
+            return dict(cached['data'])
+        
+        async def refresh():
+            weather = await self._fetch_weather_async(key, location)
+            if 'error' not in weather:
+                self.weather_cache.set(key, {'data': weather, 'fetched_at': time.time()})
+            return weather
+        
+        weather = await self.async_weather_flight.do(key, refresh)
+        if 'error' in weather and cached:
+            stale = dict(cached['data'])
+            stale['stale'] = True
+            return stale
+        return dict(weather)
+
+    def _refresh_weather(self, key: str, location: str) -> Dict:
+        """Fetch weather and store it in the weather cache if the fetch succeeded"""
+        weather = self._fetch_weather(key, location)
+        if 'error' not in weather:
+            self.weather_cache.set(key, {'data': weather, 'fetched_at': time.time()})
+        return weather
+
+    def _fetch_weather(self, query: str, location: str) -> Dict:
+        """Fetch current weather from WeatherAPI.com"""
         try:
-            url = f"http://api.weatherapi.com/v1/current.json?key={self.weather_api_key}&q={location}"
-            resp = requests.get(url, timeout=8)
-            data = resp.json()
-            if resp.status_code != 200 or 'current' not in data:
-                return {'error': f"Could not fetch weather for '{location}'. Please check the location name."}
-            weather = data['current']['condition']['text']
-            temp = data['current']['temp_c']
-            humidity = data['current']['humidity']
-            city = data['location']['name']
-            forecast = weather
-            return {
-                'location': city,
-                'temperature': f"{temp}°C",
-                'condition': weather,
-                'humidity': f"{humidity}%",
-                'forecast': forecast
-            }
+            with self.weather_breaker.guard() as call:
+                resp = http_client.get(WEATHER_API_URL, params={'key': self.weather_api_key, 'q': query},
+                                       timeout=call.timeout)
+                call.check(resp.status_code)
+            return self._parse_weather(resp.status_code, resp.json(), location)
         except Exception as e:
             return {'error': f"Weather service error: {str(e)}"}
 
-    def get_market_prices(self) -> Dict:
-        """Get current market prices"""
+    async def _fetch_weather_async(self, query: str, location: str) -> Dict:
+        """Async variant of _fetch_weather"""
+        try:
+            with self.weather_breaker.guard() as call:
+                resp = await async_http_client.get(WEATHER_API_URL, params={'key': self.weather_api_key, 'q': query},
+                                                   timeout=call.timeout)
+                call.check(resp.status_code)
+            return self._parse_weather(resp.status_code, resp.json(), location)
+        except Exception as e:
+            return {'error': f"Weather service error: {str(e)}"}
+
+    def _parse_weather(self, status_code: int, data: Dict, location: str) -> Dict:
+        """Convert a WeatherAPI.com current.json payload into our weather dict"""
+        if status_code != 200 or 'current' not in data:
+            return {'error': f"Could not fetch weather for '{location}'. Please check the location name."}
+        weather = data['current']['condition']['text']
+        temp = data['current']['temp_c']
+        humidity = data['current']['humidity']
+        city = data['location']['name']
+        forecast = weather
         return {
-            'maize': {'price': 'K180/50kg', 'trend': 'stable'},
-            'cassava': {'price': 'K65/kg', 'trend': 'rising'},
-            'groundnuts': {'price': 'K120/kg', 'trend': 'stable'},
-            'soybeans': {'price': 'K200/kg', 'trend': 'falling'}
+            'location': city,
+            'temperature': f"{temp}°C",
+            'condition': weather,
+            'humidity': f"{humidity}%",
+            'forecast': forecast
         }
 
+    def prefetch_weather(self) -> int:
+        """Refresh cached weather for every region whose entry is close to going stale"""
+        refreshed = 0
+        for region in self.zambian_regions:
+            town = REGION_WEATHER_TOWNS.get(region, region)
+            key = self._normalize_location(town)
+            cached = self.weather_cache.get(key)
+            # Another worker sharing the cache may already have refreshed it
+            if cached and time.time() - cached['fetched_at'] < self.weather_fresh_ttl / 2:
+                continue
+            weather = self.weather_flight.do(key, lambda: self._refresh_weather(key, town))
+            if 'error' in weather:
+                logger.warning("Weather prefetch failed for %s: %s", region, weather['error'])
+                continue
+            refreshed += 1
+        return refreshed
+
+    def start_weather_prefetcher(self, interval: Optional[float] = None) -> bool:
+        """Start a background thread refreshing regional weather every interval seconds.
+
+        Disabled unless an interval is passed or WEATHER_PREFETCH_INTERVAL is set.
+        Threads do not survive fork, so gunicorn starts this in each worker.
+        """
+        if interval is None:
+            interval = float(os.getenv('WEATHER_PREFETCH_INTERVAL', '0'))
+        if interval <= 0 or not self.weather_api_key:
+            return False
+        if self._weather_prefetch_thread and self._weather_prefetch_thread.is_alive():
+            return True
+        
+        def run():
+            while not self._weather_prefetch_stop.is_set():
+                try:
+                    self.prefetch_weather()
+                except Exception as e:
+                    logger.warning("Weather prefetch error: %s", e)
+                self._weather_prefetch_stop.wait(interval)
+        
+        self._weather_prefetch_stop.clear()
+        self._weather_prefetch_thread = threading.Thread(
+            target=run, name='weather-prefetch', daemon=True
+        )
+        self._weather_prefetch_thread.start()
+        return True
+
+    def stop_weather_prefetcher(self) -> None:
+        """Stop the background weather prefetcher if it is running"""
+        self._weather_prefetch_stop.set()
+
+    def get_market_prices(self, crops: Optional[List[str]] = None, market: Optional[str] = None,
+                          province: Optional[str] = None, as_of: Optional[int] = None) -> Dict:
+        """Get current market prices, for all crops or the given ones, optionally in one market or province"""
+        if not self.market_prices.crops():
+            return {crop: dict(price) for crop, price in REFERENCE_PRICES.items() if not crops or crop in crops}
+        return self.market_prices.summaries(crops, market, province, as_of)
+
+    def get_knowledge_snippets(self, message: str) -> List[str]:
+        """Short knowledge base facts relevant to a question, for grounding LLM prompts"""
+        results = self.knowledge_index.search(
+            message, k=self.retrieval_top_k, min_score=self.retrieval_min_score
+        )
+        return [snippet for _, snippet, _ in results]
+
+    def get_weather_location(self, message: str) -> str:
+        """Location named in a weather question, or '' if the message is not about weather"""
+        if not self._is_weather_query(message):
+            return ''
+        return self._extract_location_from_message(message)
+
     def get_crop_information(self, crop_name: str) -> Dict:
         """Get detailed crop information"""
-        return self.knowledge_base['crops'].get(crop_name.lower(), {})
+        return self.knowledge.crop(crop_name)
 
     def identify_pest_disease(self, query: str) -> Dict:
         """Identify pests or diseases based on symptoms"""
-        # This would use more sophisticated NLP/ML in a real implementation
+        # Known pests and diseases named in the query, via the knowledge base index
+        issues = [
+            f"{match['name']} ({kind}; affects {', '.join(match['crops'])})"
+            for kind in ('pest', 'disease')
+            for match in self.knowledge.find_terms(kind, query)
+        ]
         return {
             'query': query,
-            'possible_issues': ['Check for common symptoms'],
+            'possible_issues': issues or ['Check for common symptoms'],
             'recommendations': ['Contact local agricultural extension officer']
         }
 
@@ -0,0 +1,175 @@
+import contextlib
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+from metrics import UPSTREAM_REQUESTS, is_timeout, track_upstream
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+_breakers = {}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+
+class CircuitBreaker:
+    """Per-process circuit breaker with an adaptive timeout for one upstream service.
+
+    After failure_threshold consecutive failures (errors, timeouts, 5xx/429)
+    the circuit opens and calls fail immediately with CircuitOpenError, so
+    callers fall back to cached or rule-based answers instead of waiting on
+    a dead service. After open_seconds one probe call is let through
+    (half-open): success closes the circuit, failure opens it again.
+
+    The timeout is the latency percentile of recent successful calls times
+    timeout_multiplier, clamped to [min_timeout, max_timeout]. Until
+    min_samples calls have succeeded, max_timeout is used. A call that times
+    out doubles the timeout (up to max_timeout) and discards the samples it
+    was based on, so the timeout follows an upstream that got slower; the
+    half-open probe always gets max_timeout. Calls of different kinds (e.g.
+    'stream', timed to the first byte, and whole 'call's) keep separate
+    samples and timeouts but share the circuit state.
+    """
+
+    def __init__(self, name: str, max_timeout: float, min_timeout: float = 1.0,
+                 failure_threshold: int = 5, open_seconds: float = 30.0,
+                 percentile: float = 0.99, timeout_multiplier: float = 2.0,
+                 min_samples: int = 20, window: int = 200):
+        self.name = name
+        self.max_timeout = max_timeout
+        self.min_timeout = min(min_timeout, max_timeout)
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.percentile = percentile
+        self.timeout_multiplier = timeout_multiplier
+        self.min_samples = min_samples
+        self.window = window
+        self._latencies = {}
+        self._lock = threading.Lock()
+        self._timeouts = {}
+        self.state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.opened = 0
+        self.short_circuited = 0
+        _breakers[name] = self
+
+    @classmethod
+    def from_env(cls, name: str, max_timeout: float, min_timeout: float = 1.0) -> 'CircuitBreaker':
+        """Build a breaker configured from <NAME>_TIMEOUT and CIRCUIT_* variables"""
+        return cls(
+            name,
+            max_timeout=float(os.getenv(f'{name.upper()}_TIMEOUT', str(max_timeout))),
+            min_timeout=min_timeout,
+            failure_threshold=int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5')),
+            open_seconds=float(os.getenv('CIRCUIT_OPEN_SECONDS', '30')),
+            percentile=float(os.getenv('CIRCUIT_TIMEOUT_PERCENTILE', '0.99')),
+            timeout_multiplier=float(os.getenv('CIRCUIT_TIMEOUT_MULTIPLIER', '2'))
+        )
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now; in half-open state only one probe at a time"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.short_circuited += 1
+            return False
+
+    def timeout(self, kind: str = 'call') -> float:
+        """Timeout in seconds for the next call of this kind"""
+        return self._timeouts.get(kind, self.max_timeout)
+
+    def record_success(self, latency: float, kind: str = 'call') -> None:
+        with self._lock:
+            latencies = self._latencies.setdefault(kind, deque(maxlen=self.window))
+            latencies.append(latency)
+            self._consecutive_failures = 0
+            self._probe_in_flight = False
+            self.state = CLOSED
+            if len(latencies) >= self.min_samples:
+                ordered = sorted(latencies)
+                index = min(len(ordered) - 1, math.ceil(self.percentile * len(ordered)) - 1)
+                self._timeouts[kind] = min(self.max_timeout,
+                                           max(self.min_timeout, ordered[index] * self.timeout_multiplier))
+
+    def record_failure(self, kind: str = 'call', timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                # The samples no longer describe the upstream; widen until new ones come in
+                self._latencies.pop(kind, None)
+                self._timeouts[kind] = min(self.max_timeout, 2 * self._timeouts.get(kind, self.max_timeout))
+            self._consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.opened += 1
+                    logger.warning("Circuit for %s opened after %d failure(s)", self.name, self._consecutive_failures)
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+
+    def _release(self) -> None:
+        """A call was cancelled before it finished; let another probe through"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    @contextlib.contextmanager
+    def guard(self, kind: str = 'call'):
+        """Run one upstream call of this kind under the breaker, recording it in the metrics.
+
+        Yields the metrics call record with its timeout set; pass call.timeout
+        to the client and call.check(status_code) for responses that did not
+        raise. Raises CircuitOpenError without calling if the circuit is open.
+        """
+        if not self.allow():
+            UPSTREAM_REQUESTS.inc(service=self.name, outcome='short_circuit')
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+        started = time.monotonic()
+        with track_upstream(self.name) as call:
+            call.timeout = self.max_timeout if self.state == HALF_OPEN else self.timeout(kind)
+            try:
+                yield call
+            except Exception as e:
+                self.record_failure(kind, timed_out=is_timeout(e))
+                raise
+            except BaseException:
+                self._release()
+                raise
+            if call.outcome == 'ok':
+                self.record_success(time.monotonic() - started, kind)
+            else:
+                self.record_failure(kind)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            state = self.state
+            if state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                state = HALF_OPEN
+            return {
+                'state': state,
+                'timeouts': {kind: round(timeout, 3) for kind, timeout in self._timeouts.items()},
+                'consecutive_failures': self._consecutive_failures,
+                'opened': self.opened,
+                'short_circuited': self.short_circuited,
+                'samples': {kind: len(latencies) for kind, latencies in self._latencies.items()}
+            }
+
+
+def circuit_breaker_stats() -> Dict:
+    """State of every circuit breaker in this process"""
+    return {name: breaker.stats() for name, breaker in _breakers.items()}
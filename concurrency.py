@@ -0,0 +1,190 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Shared thread pool for upstream fan-out, created per worker process"""
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv('FANOUT_WORKERS', '16')),
+                    thread_name_prefix='fanout'
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _timed(func: Callable[[], Any]) -> Tuple[Any, float]:
+    started = time.monotonic()
+    return func(), time.monotonic() - started
+
+
+def gather(sources: Dict[str, Tuple[Callable[[], Any], float]], deadline: float) -> Tuple[Dict, Dict]:
+    """Run independent sources concurrently and wait at most deadline seconds overall.
+
+    sources maps a name to (callable, per-source timeout). Returns (results,
+    report): results[name] is the callable's return value, or None if it timed
+    out or raised; report[name] records the status and elapsed seconds. A slow
+    source keeps running in the pool but no longer holds up the request.
+    """
+    executor = get_executor()
+    started = time.monotonic()
+    # Each source runs in a copy of the caller's context, so it adds to the same request log record
+    futures = {name: executor.submit(contextvars.copy_context().run, _timed, func)
+               for name, (func, _) in sources.items()}
+    results = {}
+    report = {}
+    for name, future in futures.items():
+        timeout = sources[name][1]
+        remaining = min(started + timeout, started + deadline) - time.monotonic()
+        try:
+            results[name], elapsed = future.result(timeout=max(remaining, 0))
+            status = 'ok'
+        except TimeoutError:
+            results[name], elapsed = None, time.monotonic() - started
+            status = 'timeout'
+        except Exception as e:
+            logger.warning("Fan-out source '%s' failed: %s", name, e)
+            results[name], elapsed = None, time.monotonic() - started
+            status = 'error'
+        report[name] = {'status': status, 'elapsed': round(elapsed, 3)}
+    return results, report
+
+
+_flights = {}
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one upstream request.
+
+    The first caller for a key runs the function; callers arriving while it is
+    in flight wait and share its result (or exception). Nothing is cached once
+    the call completes; that is the job of the caches in front of it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.calls = 0
+        self.deduplicated = 0
+        _flights[name] = self
+
+    def do(self, key, func: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.deduplicated += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+                leader = True
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def coalesce(self, func: Callable) -> Callable:
+        """Decorator coalescing concurrent calls made with identical arguments"""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__name__, args, tuple(sorted(kwargs.items())))
+            return self.do(key, lambda: func(*args, **kwargs))
+        return wrapper
+
+    def stats(self) -> Dict:
+        return {
+            'calls': self.calls,
+            'deduplicated': self.deduplicated,
+            'in_flight': len(self._calls)
+        }
+
+
+class AsyncSingleFlight:
+    """asyncio counterpart of SingleFlight for the ASGI app.
+
+    The shared call runs in its own task and every caller, the first one
+    included, awaits it through asyncio.shield: a caller that is cancelled
+    (e.g. by its own wait_for timeout) stops waiting without cancelling the
+    call the others are waiting on.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}
+        self.calls = 0
+        self.deduplicated = 0
+        _flights[name] = self
+
+    def _finished(self, key, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception retrieved in case every caller stopped waiting
+            task.exception()
+
+    async def do(self, key, func: Callable[[], Awaitable]) -> Any:
+        task = self._calls.get(key)
+        if task is not None:
+            self.deduplicated += 1
+        else:
+            task = self._calls[key] = asyncio.ensure_future(func())
+            task.add_done_callback(functools.partial(self._finished, key))
+            self.calls += 1
+        return await asyncio.shield(task)
+
+    def coalesce(self, func: Callable) -> Callable:
+        """Decorator coalescing concurrent awaits made with identical arguments"""
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = (func.__name__, args, tuple(sorted(kwargs.items())))
+            return await self.do(key, lambda: func(*args, **kwargs))
+        return wrapper
+
+    def stats(self) -> Dict:
+        return {
+            'calls': self.calls,
+            'deduplicated': self.deduplicated,
+            'in_flight': len(self._calls)
+        }
+
+
+def single_flight_stats() -> Dict:
+    """Deduplication counters for every single-flight group in this process"""
+    return {name: flight.stats() for name, flight in _flights.items()}
@@ -0,0 +1,168 @@
+import os
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from cache import create_cache, make_cache_key
+from prompt import count_tokens
+
+
+def _crop_summary(crop: Dict) -> str:
+    details = [crop.get('variety'), crop.get('status')]
+    if crop.get('planting_date'):
+        details.append(f"planted {crop['planting_date']}")
+    if crop.get('expected_harvest_date'):
+        details.append(f"harvest {crop['expected_harvest_date']}")
+    details = [d for d in details if d]
+    name = crop.get('name', 'Unknown')
+    return f"{name} ({', '.join(details)})" if details else name
+
+
+def _field_summary(field: Dict) -> str:
+    crops = field.get('crops') or []
+    summary = f"{field.get('name', 'Unknown Field')} ({field.get('size', 0)} ha, {field.get('soil_type', 'unknown soil')})"
+    if crops:
+        summary += ": " + "; ".join(_crop_summary(crop) for crop in crops)
+    return summary
+
+
+def build_farm_context(user_data: Dict, max_tokens: int = 300) -> str:
+    """Render the farmer's farms, fields and crops as a compact prompt section.
+
+    One line per farm and per field. Once max_tokens is reached the remaining
+    fields are folded into a one-line tally of their crops, so farmers with
+    many fields still get a short, bounded prompt.
+    """
+    farms = user_data.get('farms', [])
+    name = user_data.get('full_name', 'Unknown')
+    if not farms:
+        return f"Farmer: {name}\nNo farm data available yet."
+
+    lines = [
+        f"Farmer: {name}",
+        f"Location: {user_data.get('farmer_profile', {}).get('location', 'Not specified')}",
+        f"Total Farms: {len(farms)}"
+    ]
+    used = sum(count_tokens(line) + 1 for line in lines)
+    omitted_fields = 0
+    omitted_crops = Counter()
+    for i, farm in enumerate(farms, 1):
+        fields = farm.get('fields') or []
+        candidates = [
+            f"Farm {i}: {farm.get('name', 'Unknown Farm')}, {farm.get('size', 0)} ha, "
+            f"{farm.get('location', 'Not specified')}, {len(fields)} field(s)"
+        ] + [f"  - {_field_summary(field)}" for field in fields]
+        for line, field in zip(candidates, [None] + fields):
+            cost = count_tokens(line) + 1
+            if used + cost <= max_tokens:
+                lines.append(line)
+                used += cost
+            elif field is not None:
+                omitted_fields += 1
+                omitted_crops.update(crop.get('name', 'Unknown') for crop in field.get('crops') or [])
+    if omitted_fields:
+        tally = ", ".join(f"{crop} x{count}" for crop, count in omitted_crops.most_common())
+        lines.append(f"... {omitted_fields} more field(s)" + (f" growing {tally}" if tally else ""))
+    return "\n".join(lines)
+
+
+class FarmProfileStore:
+    """Cache of farmer lookups, stored already rendered for the /api/ask prompt.
+
+    Profiles are keyed by the exact (email, phone) pair the lookup was made
+    with, so a request naming only one of them never gets a profile found
+    through the other. Each pair is also listed under its email and its
+    phone (appended atomically, so concurrent workers sharing the sqlite
+    backend never drop each other's keys), so invalidate() can drop every
+    cached lookup that involved either. Profiles are kept for ttl seconds (unknown farmers for
+    negative_ttl), or until invalidate() is called when the farmer's record
+    changes. Only the summary the prompt needs is cached, not the full
+    Supabase record.
+    """
+
+    def __init__(self, ttl: float = 900, negative_ttl: float = 60,
+                 max_entries: int = 5000, max_tokens: int = 300):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_tokens = max_tokens
+        self.cache = create_cache('farm_profiles', max_entries=max_entries, ttl=ttl)
+        # email or phone -> keys of the cached profiles looked up with it
+        self.aliases = create_cache('farm_profile_aliases', max_entries=2 * max_entries, ttl=ttl)
+
+    @classmethod
+    def from_env(cls) -> 'FarmProfileStore':
+        """Build a store configured from FARM_PROFILE_* variables"""
+        return cls(
+            ttl=float(os.getenv('FARM_PROFILE_TTL', '900')),
+            negative_ttl=float(os.getenv('FARM_PROFILE_NEGATIVE_TTL', '60')),
+            max_entries=int(os.getenv('FARM_PROFILE_CACHE_SIZE', '5000')),
+            max_tokens=int(os.getenv('FARM_CONTEXT_MAX_TOKENS', '300'))
+        )
+
+    @staticmethod
+    def _identity(email: Optional[str] = None, phone: Optional[str] = None) -> Tuple[str, str]:
+        return (email.strip().lower() if email else '',
+                ''.join(c for c in phone if c.isdigit() or c == '+') if phone else '')
+
+    def _key(self, email: Optional[str] = None, phone: Optional[str] = None) -> Optional[str]:
+        email, phone = self._identity(email, phone)
+        return make_cache_key('farm_profile', email, phone) if email or phone else None
+
+    def _alias_keys(self, email: Optional[str] = None, phone: Optional[str] = None) -> List[str]:
+        email, phone = self._identity(email, phone)
+        keys = []
+        if email:
+            keys.append(make_cache_key('farm_profile', 'email', email))
+        if phone:
+            keys.append(make_cache_key('farm_profile', 'phone', phone))
+        return keys
+
+    def _profile(self, user_info: Optional[Dict]) -> Dict:
+        if not user_info or not user_info.get('data'):
+            return {'found': False}
+        user_data = user_info['data']
+        return {
+            'found': True,
+            'full_name': user_data.get('full_name', 'farmer'),
+            'farm_count': len(user_data.get('farms', [])),
+            'context': build_farm_context(user_data, self.max_tokens)
+        }
+
+    def _store(self, email: Optional[str], phone: Optional[str], user_info: Optional[Dict]) -> Dict:
+        profile = self._profile(user_info)
+        key = self._key(email, phone)
+        if key is None:
+            return profile
+        self.cache.set(key, profile, ttl=self.ttl if profile['found'] else self.negative_ttl)
+        for alias in self._alias_keys(email, phone):
+            self.aliases.append(alias, key)
+        return profile
+
+    def _cached(self, email: Optional[str], phone: Optional[str]) -> Optional[Dict]:
+        key = self._key(email, phone)
+        return self.cache.get(key) if key else None
+
+    def get(self, fetch: Callable[..., Optional[Dict]], email: Optional[str] = None,
+            phone: Optional[str] = None) -> Dict:
+        """Return the farmer's profile, calling fetch(email=, phone=) on a cache miss"""
+        profile = self._cached(email, phone)
+        if profile is None:
+            profile = self._store(email, phone, fetch(email=email, phone=phone))
+        return profile
+
+    async def get_async(self, fetch: Callable[..., Awaitable[Optional[Dict]]],
+                        email: Optional[str] = None, phone: Optional[str] = None) -> Dict:
+        """Async variant of get for the ASGI app"""
+        profile = self._cached(email, phone)
+        if profile is None:
+            profile = self._store(email, phone, await fetch(email=email, phone=phone))
+        return profile
+
+    def invalidate(self, email: Optional[str] = None, phone: Optional[str] = None) -> int:
+        """Forget every cached profile looked up with this email and/or phone; returns how many were dropped"""
+        keys = {self._key(email, phone)} - {None}
+        for alias in self._alias_keys(email, phone):
+            keys.update(self.aliases.pop(alias) or [])
+        return sum(self.cache.delete(key) for key in keys)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
@@ -46,8 +46,23 @@ graceful_timeout = 30
 # Environment variables
 raw_env = [
     "FLASK_ENV=production",
+    # Share caches between workers so they stay warm across max_requests recycling
+    "CACHE_BACKEND=sqlite",
+    "CACHE_PATH=/tmp/netagrow-cache.db",
+    # Refresh regional weather in the background every 10 minutes
+    "WEATHER_PREFETCH_INTERVAL=600",
+    # Workers write their metrics here so /metrics can sum them
+    "METRICS_DIR=/tmp/netagrow-metrics",
+    # Workers share LLM admission slots; leave two workers free for cheap routes
+    "ADMISSION_DIR=/tmp/netagrow-admission",
+    f"ADMISSION_MAX_IN_FLIGHT={max(1, workers - 2)}",
 ]
 
+def on_starting(server):
+    """Clear metrics left by a previous run"""
+    from metrics import registry
+    registry.reset_directory()
+
 def when_ready(server):
     """Log when server is ready"""
     server.log.info("Server is ready. Spawning workers")
@@ -65,8 +80,23 @@ def post_fork(server, worker):
     server.log.info("Worker spawned (pid: %s)", worker.pid)
 
 def post_worker_init(worker):
-    """Log after worker initialization"""
+    """Log after worker initialization and start per-worker background jobs"""
     worker.log.info("Worker initialized (pid: %s)", worker.pid)
+    from app import chatbot
+    if chatbot.start_weather_prefetcher():
+        worker.log.info("Weather prefetcher started (pid: %s)", worker.pid)
+
+def worker_exit(server, worker):
+    """Write the worker's last metrics and queued log records before it exits"""
+    from log_pipeline import stop_logging
+    from metrics import registry
+    registry.flush()
+    stop_logging()
+
+def child_exit(server, worker):
+    """Keep an exited worker's counters by folding them into the metrics archive"""
+    from metrics import registry
+    registry.mark_process_dead(worker.pid)
 
 def worker_abort(worker):
     """Log when worker aborts"""
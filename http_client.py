@@ -0,0 +1,205 @@
+import os
+import threading
+from typing import Dict
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class HTTPClient:
+    """Shared outbound HTTP client with per-host keep-alive pools and retries.
+
+    One ``requests.Session`` is kept per worker process (it is recreated after
+    a fork so workers never share sockets inherited from the gunicorn master).
+    Every call is counted per host so pool sizes can be checked against load.
+    Only connection errors and 502/503/504 answers are retried: a read
+    timeout is not, so a call never waits much longer than its timeout, and
+    429 is left to the caller rather than sleeping for the upstream's
+    Retry-After.
+    """
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 10,
+                 retries: int = 2, backoff_factor: float = 0.3):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    @classmethod
+    def from_env(cls) -> 'HTTPClient':
+        """Build a client configured from HTTP_POOL_* and HTTP_RETRY* variables"""
+        return cls(
+            pool_connections=int(os.getenv('HTTP_POOL_CONNECTIONS', '10')),
+            pool_maxsize=int(os.getenv('HTTP_POOL_MAXSIZE', '10')),
+            retries=int(os.getenv('HTTP_RETRIES', '2')),
+            backoff_factor=float(os.getenv('HTTP_RETRY_BACKOFF', '0.3'))
+        )
+
+    def session(self) -> requests.Session:
+        """Return this process's pooled session, creating it on first use"""
+        if self._session is not None and self._pid == os.getpid():
+            return self._session
+        with self._lock:
+            if self._session is None or self._pid != os.getpid():
+                retry = Retry(
+                    total=self.retries,
+                    read=0,
+                    backoff_factor=self.backoff_factor,
+                    backoff_max=2,
+                    status_forcelist=(502, 503, 504),
+                    allowed_methods=frozenset(['GET', 'HEAD']),
+                    respect_retry_after_header=False,
+                    raise_on_status=False
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=self.pool_connections,
+                    pool_maxsize=self.pool_maxsize,
+                    max_retries=retry
+                )
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+                self._pid = os.getpid()
+                self._hosts = {}
+        return self._session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request through the pooled session, tracking per-host usage"""
+        session = self.session()
+        host = urlsplit(url).netloc
+        with self._lock:
+            usage = self._hosts.setdefault(
+                host, {'requests': 0, 'errors': 0, 'in_flight': 0, 'peak_in_flight': 0}
+            )
+            usage['requests'] += 1
+            usage['in_flight'] += 1
+            usage['peak_in_flight'] = max(usage['peak_in_flight'], usage['in_flight'])
+        try:
+            return session.request(method, url, **kwargs)
+        except requests.RequestException:
+            with self._lock:
+                usage['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                usage['in_flight'] -= 1
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def stats(self) -> Dict:
+        """Report per-host request counts and connection pool utilization"""
+        hosts = {}
+        with self._lock:
+            for host, usage in self._hosts.items():
+                hosts[host] = dict(usage)
+        if self._session is not None and self._pid == os.getpid():
+            adapter = self._session.get_adapter('https://')
+            for pool_key in list(adapter.poolmanager.pools.keys()):
+                pool = adapter.poolmanager.pools.get(pool_key)
+                if pool is None:
+                    continue
+                host = pool.host if pool.port in (None, 80, 443) else f"{pool.host}:{pool.port}"
+                entry = hosts.setdefault(host, {})
+                entry['connections_opened'] = pool.num_connections
+                idle = pool.pool.queue if pool.pool else []
+                entry['idle_connections'] = sum(1 for conn in idle if conn is not None)
+        return {
+            'pool_connections': self.pool_connections,
+            'pool_maxsize': self.pool_maxsize,
+            'retries': self.retries,
+            'hosts': hosts
+        }
+
+
+class AsyncHTTPClient:
+    """Async counterpart of HTTPClient used by the ASGI app.
+
+    Wraps one ``httpx.AsyncClient`` per process with the same pool size and
+    retry settings. Connection retries only; httpx does not retry on status.
+    """
+
+    def __init__(self, pool_maxsize: int = 100, keepalive: int = 20, retries: int = 2):
+        self.pool_maxsize = pool_maxsize
+        self.keepalive = keepalive
+        self.retries = retries
+        self._client = None
+        self._pid = None
+        self._hosts = {}
+
+    @classmethod
+    def from_env(cls) -> 'AsyncHTTPClient':
+        """Build a client configured from ASYNC_HTTP_POOL_MAXSIZE and HTTP_RETRIES"""
+        return cls(
+            pool_maxsize=int(os.getenv('ASYNC_HTTP_POOL_MAXSIZE', '100')),
+            keepalive=int(os.getenv('ASYNC_HTTP_KEEPALIVE', '20')),
+            retries=int(os.getenv('HTTP_RETRIES', '2'))
+        )
+
+    def client(self) -> httpx.AsyncClient:
+        """Return this process's pooled async client, creating it on first use"""
+        if self._client is None or self._pid != os.getpid():
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.pool_maxsize,
+                    max_keepalive_connections=self.keepalive
+                ),
+                transport=httpx.AsyncHTTPTransport(retries=self.retries)
+            )
+            self._pid = os.getpid()
+            self._hosts = {}
+        return self._client
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request through the pooled client, tracking per-host usage"""
+        client = self.client()
+        host = urlsplit(url).netloc
+        usage = self._hosts.setdefault(
+            host, {'requests': 0, 'errors': 0, 'in_flight': 0, 'peak_in_flight': 0}
+        )
+        usage['requests'] += 1
+        usage['in_flight'] += 1
+        usage['peak_in_flight'] = max(usage['peak_in_flight'], usage['in_flight'])
+        try:
+            return await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            usage['errors'] += 1
+            raise
+        finally:
+            usage['in_flight'] -= 1
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request('POST', url, **kwargs)
+
+    async def aclose(self) -> None:
+        """Close pooled connections (called on ASGI shutdown)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict:
+        """Report per-host request counts for the async pool"""
+        return {
+            'pool_maxsize': self.pool_maxsize,
+            'keepalive': self.keepalive,
+            'retries': self.retries,
+            'hosts': {host: dict(usage) for host, usage in self._hosts.items()}
+        }
+
+
+http_client = HTTPClient.from_env()
+async_http_client = AsyncHTTPClient.from_env()
@@ -0,0 +1,164 @@
+import re
+from typing import Dict, Iterable, List, Optional
+
+# Keyword tables per language. Matching is case-insensitive, on word
+# boundaries, and allows common English inflections (plant -> planting,
+# price -> prices). Local-language entries are starter vocabulary; extend them
+# as extension officers report the words farmers actually use.
+INTENT_KEYWORDS = {
+    'english': {
+        'greeting': ['hello', 'hi', 'hey', 'good morning', 'good afternoon', 'good evening'],
+        'weather': ['weather', 'rain', 'rainfall', 'temperature', 'climate', 'forecast', 'drought'],
+        'crop': ['plant', 'grow', 'harvest', 'fertilizer', 'fertiliser', 'soil', 'seed', 'crop'],
+        'pest_disease': ['pest', 'disease', 'sick', 'damage', 'insect', 'fungus', 'armyworm', 'blight'],
+        'market': ['price', 'market', 'sell', 'buy', 'cost', 'kwacha']
+    },
+    'bemba': {
+        'greeting': ['muli shani', 'mwashibukeni', 'mwabombeni'],
+        'weather': ['imfula', 'akasuba'],
+        'crop': ['ukubyala', 'amataba', 'umushili', 'umufundo'],
+        'pest_disease': ['utushishi', 'amalwele'],
+        'market': ['umutengo', 'ukushitisha', 'ukushita']
+    },
+    'njanja': {
+        'greeting': ['moni', 'muli bwanji', 'mwadzuka bwanji'],
+        'weather': ['mvula', 'dzuwa', 'kuzizira'],
+        'crop': ['kubzala', 'chimanga', 'kukolola', 'feteleza', 'nthaka', 'mbewu'],
+        'pest_disease': ['tizirombo', 'matenda'],
+        'market': ['mtengo', 'msika', 'kugulitsa', 'kugula', 'ndalama']
+    },
+    'tonga': {
+        'greeting': ['mwabuka buti', 'mwapona'],
+        'weather': ['mvwula'],
+        'crop': ['kubyala', 'mapopwe'],
+        'pest_disease': ['malwazi'],
+        'market': ['musika', 'kuuzya', 'kuula']
+    },
+    'lozi': {
+        'greeting': ['lumela', 'muzuhile'],
+        'weather': ['pula'],
+        'crop': ['mbonyi', 'mubu'],
+        'pest_disease': ['matuku', 'lizinyambu'],
+        'market': ['teko', 'kulekisa', 'kuleka']
+    }
+}
+
+# Order used to break score ties, matching the original rule-based priority
+INTENT_PRIORITY = ['weather', 'crop', 'pest_disease', 'market', 'greeting']
+
+# Suffixes accepted after keywords longer than two letters (so "his" is not "hi")
+_INFLECTIONS = ('', 's', 'es', 'd', 'ed', 'ing', 'er', 'ers', 'y')
+
+_WORD_RE = re.compile(r"[a-z]+")
+
+
+class IntentClassifier:
+    """Classify a message into every matching intent in a single pass.
+
+    All keyword tables are compiled at construction into one hash table of
+    surface forms (keyword plus inflections, multi-word phrases included), so
+    classifying is one tokenizing regex plus a dict lookup per word. Matching
+    is on whole words, so "hi" no longer matches inside "this" or "chilli".
+    """
+
+    def __init__(self, keyword_tables: Optional[Dict] = None,
+                 extra_keywords: Optional[Dict[str, Iterable[str]]] = None):
+        keyword_tables = keyword_tables or INTENT_KEYWORDS
+        self._intents_by_keyword = {}
+        for table in keyword_tables.values():
+            for intent, keywords in table.items():
+                self._add(intent, keywords)
+        for intent, keywords in (extra_keywords or {}).items():
+            self._add(intent, keywords)
+        
+        # surface form (tuple of words) -> canonical keyword
+        self._forms = {}
+        self._max_words = 1
+        for keyword in self._intents_by_keyword:
+            words = keyword.split()
+            self._max_words = max(self._max_words, len(words))
+            suffixes = _INFLECTIONS if len(keyword) > 2 else ('',)
+            for suffix in suffixes:
+                form = ' '.join(words[:-1] + [words[-1] + suffix])
+                self._forms.setdefault(form, keyword)
+        # First words of multi-word phrases, so single words skip phrase lookups
+        self._phrase_starts = {k.split()[0] for k in self._intents_by_keyword if ' ' in k}
+
+    def _add(self, intent: str, keywords: Iterable[str]) -> None:
+        for keyword in keywords:
+            keyword = ' '.join(_WORD_RE.findall(keyword.lower()))
+            intents = self._intents_by_keyword.setdefault(keyword, [])
+            if intent not in intents:
+                intents.append(intent)
+
+    def match(self, message: str) -> Dict[str, List[str]]:
+        """Return the keywords found in message, grouped by intent"""
+        words = _WORD_RE.findall(message.lower())
+        if self._phrase_starts.isdisjoint(words):
+            # Fast path: no multi-word phrase can start here, so one lookup per word
+            keywords = filter(None, map(self._forms.get, words))
+        else:
+            keywords = self._scan_phrases(words)
+        found = {}
+        for keyword in keywords:
+            for intent in self._intents_by_keyword[keyword]:
+                found.setdefault(intent, []).append(keyword)
+        return found
+
+    def _scan_phrases(self, words: List[str]) -> Iterable[str]:
+        """Yield keywords, preferring the longest phrase at each word ("good morning" over "good")"""
+        forms = self._forms
+        i = 0
+        while i < len(words):
+            span = 1
+            keyword = None
+            if words[i] in self._phrase_starts:
+                for n in range(min(self._max_words, len(words) - i), 1, -1):
+                    keyword = forms.get(' '.join(words[i:i + n]))
+                    if keyword is not None:
+                        span = n
+                        break
+            if keyword is None:
+                keyword = forms.get(words[i])
+            if keyword is not None:
+                yield keyword
+            i += span
+
+    def unmatched(self, message: str) -> List[str]:
+        """Words of message that are not part of any keyword, in order"""
+        words = _WORD_RE.findall(message.lower())
+        left = []
+        i = 0
+        while i < len(words):
+            span = 0
+            if words[i] in self._phrase_starts:
+                for n in range(min(self._max_words, len(words) - i), 1, -1):
+                    if ' '.join(words[i:i + n]) in self._forms:
+                        span = n
+                        break
+            if not span and words[i] in self._forms:
+                span = 1
+            if span:
+                i += span
+            else:
+                left.append(words[i])
+                i += 1
+        return left
+
+    def classify(self, message: str) -> Dict[str, float]:
+        """Return {intent: score} for every matching intent, highest score first.
+
+        The score is the number of keyword hits for the intent; ties are
+        ordered by INTENT_PRIORITY.
+        """
+        found = self.match(message)
+        if len(found) < 2:
+            return {intent: float(len(hits)) for intent, hits in found.items()}
+        ranked = sorted(
+            found,
+            key=lambda intent: (
+                -len(found[intent]),
+                INTENT_PRIORITY.index(intent) if intent in INTENT_PRIORITY else len(INTENT_PRIORITY)
+            )
+        )
+        return {intent: float(len(found[intent])) for intent in ranked}
@@ -0,0 +1,271 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'knowledge_base.json')
+
+# Bump when the compiled table layout changes so stale files are rebuilt
+SCHEMA_VERSION = '2'
+
+# Crop fields with a lookup index: index kind -> knowledge base field
+INDEXED_FIELDS = {'pest': 'pests', 'disease': 'diseases', 'region': 'regions'}
+
+# Plural endings accepted after a term ("aphids", "armyworms")
+_TERM_SUFFIXES = ('s', 'es')
+
+# Terms looked up per query; longer messages are looked up in chunks
+_LOOKUP_CHUNK = 500
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _words(text: str) -> str:
+    return ' '.join(_WORD_RE.findall(text.lower()))
+
+
+def _source_stamp(source: str) -> str:
+    stat = os.stat(source)
+    return f"{SCHEMA_VERSION}:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def compile_knowledge_base(source: str, path: str) -> None:
+    """Compile the JSON knowledge base into an indexed SQLite file.
+
+    The file is written next to its destination and renamed into place, so
+    readers see either the old file or the new one, never a partial write.
+    """
+    stamp = _source_stamp(source)
+    with open(source, encoding='utf-8') as f:
+        knowledge = json.load(f)
+
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.knowledge-', suffix='.db', dir=directory)
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(tmp_path)
+        with conn:
+            conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID")
+            conn.execute("CREATE TABLE crops (name TEXT PRIMARY KEY, data TEXT NOT NULL) WITHOUT ROWID")
+            conn.execute(
+                "CREATE TABLE sections (section TEXT NOT NULL, name TEXT NOT NULL, value TEXT NOT NULL, "
+                "PRIMARY KEY (section, name)) WITHOUT ROWID"
+            )
+            conn.execute(
+                "CREATE TABLE crop_index (kind TEXT NOT NULL, term TEXT NOT NULL, label TEXT NOT NULL, "
+                "crop TEXT NOT NULL, PRIMARY KEY (kind, term, crop)) WITHOUT ROWID"
+            )
+            term_words = 1
+            for name, info in knowledge.get('crops', {}).items():
+                name = name.lower()
+                conn.execute("INSERT INTO crops VALUES (?, ?)", (name, json.dumps(info)))
+                for kind, field in INDEXED_FIELDS.items():
+                    for label in info.get(field, []):
+                        # Terms are stored as their words, so messages can be looked up phrase by phrase
+                        term = _words(label)
+                        term_words = max(term_words, len(term.split()))
+                        conn.execute(
+                            "INSERT OR IGNORE INTO crop_index VALUES (?, ?, ?, ?)",
+                            (kind, term, label, name)
+                        )
+            for section, entries in knowledge.items():
+                if section == 'crops':
+                    continue
+                for name, value in entries.items():
+                    conn.execute("INSERT INTO sections VALUES (?, ?, ?)", (section, name, json.dumps(value)))
+            conn.execute("INSERT INTO meta VALUES ('source_stamp', ?)", (stamp,))
+            conn.execute("INSERT INTO meta VALUES ('max_term_words', ?)", (str(term_words),))
+        conn.execute("VACUUM")
+        conn.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class KnowledgeBase:
+    """Read-only agricultural knowledge base backed by a compiled SQLite file.
+
+    The JSON source is compiled once into an indexed file that every worker
+    opens read-only and memory-maps, so forked gunicorn workers share the same
+    page-cache pages instead of each holding a copy. At most every
+    reload_interval seconds the source is checked for changes; a changed file
+    is recompiled and swapped in by rename, and each thread moves to the new
+    file on its next lookup. Requests already reading keep the old snapshot.
+    """
+
+    def __init__(self, source: str = DEFAULT_SOURCE, path: str = '/tmp/netagrow-knowledge.db',
+                 reload_interval: float = 5.0, mmap_size: int = 64 * 1024 * 1024):
+        self.source = source
+        self.path = path
+        self.reload_interval = reload_interval
+        self.mmap_size = mmap_size
+        self.generation = 0
+        self.reloads = 0
+        self._file_id = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._snapshot = None
+        self._term_words = None
+        self.reload_if_changed(force=True)
+
+    @classmethod
+    def from_env(cls) -> 'KnowledgeBase':
+        """Build a knowledge base configured from KNOWLEDGE_BASE_* variables"""
+        return cls(
+            source=os.getenv('KNOWLEDGE_BASE_PATH', DEFAULT_SOURCE),
+            path=os.getenv('KNOWLEDGE_BASE_DB', '/tmp/netagrow-knowledge.db'),
+            reload_interval=float(os.getenv('KNOWLEDGE_BASE_RELOAD_INTERVAL', '5'))
+        )
+
+    def _compiled_stamp(self) -> Optional[str]:
+        try:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            try:
+                row = conn.execute("SELECT value FROM meta WHERE key = 'source_stamp'").fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return None
+        return row[0] if row else None
+
+    def reload_if_changed(self, force: bool = False) -> None:
+        """Recompile a changed source and start a new generation if the compiled file was replaced"""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.reload_interval:
+            return
+        with self._lock:
+            if not force and now - self._checked_at < self.reload_interval:
+                return
+            self._checked_at = now
+            try:
+                if os.path.exists(self.source) and self._compiled_stamp() != _source_stamp(self.source):
+                    compile_knowledge_base(self.source, self.path)
+                stat = os.stat(self.path)
+            except (OSError, ValueError, sqlite3.Error) as e:
+                # Keep serving the current file; a broken edit must not take the bot down
+                logger.warning("Knowledge base reload failed: %s", e)
+                if self._file_id is None:
+                    raise
+                return
+            file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if file_id != self._file_id:
+                if self._file_id is not None:
+                    self.reloads += 1
+                self._file_id = file_id
+                self._snapshot = None
+                self.generation += 1
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection to the current generation, reopening after a fork or reload"""
+        self.reload_if_changed()
+        local = self._local
+        conn = getattr(local, 'conn', None)
+        if conn is not None and local.pid == os.getpid() and local.generation == self.generation:
+            return conn
+        if conn is not None:
+            conn.close()
+        # immutable: the file is only ever replaced, never modified, so no locking is needed
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        local.conn = conn
+        local.pid = os.getpid()
+        local.generation = self.generation
+        return conn
+
+    def crop(self, name: str) -> Dict:
+        """Everything known about a crop, or {} if it is not in the knowledge base"""
+        row = self._connection().execute(
+            "SELECT data FROM crops WHERE name = ?", (name.lower(),)
+        ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def crop_names(self) -> List[str]:
+        return [row[0] for row in self._connection().execute("SELECT name FROM crops ORDER BY name")]
+
+    def section(self, section: str) -> Dict:
+        """A non-crop section of the knowledge base, e.g. 'weather_patterns' or 'regions'"""
+        return {
+            name: json.loads(value) for name, value in self._connection().execute(
+                "SELECT name, value FROM sections WHERE section = ?", (section,)
+            )
+        }
+
+    def crops_by(self, kind: str, term: str) -> List[str]:
+        """Crops indexed under a pest, disease or region ('pest' / 'disease' / 'region')"""
+        return [row[0] for row in self._connection().execute(
+            "SELECT crop FROM crop_index WHERE kind = ? AND term = ? ORDER BY crop", (kind, _words(term))
+        )]
+
+    def _max_term_words(self, conn: sqlite3.Connection) -> int:
+        """Words in the longest indexed term, read once per generation"""
+        cached = self._term_words
+        if cached is not None and cached[0] == self.generation:
+            return cached[1]
+        generation = self.generation
+        row = conn.execute("SELECT value FROM meta WHERE key = 'max_term_words'").fetchone()
+        self._term_words = (generation, int(row[0]) if row else 1)
+        return self._term_words[1]
+
+    def find_terms(self, kind: str, text: str) -> List[Dict]:
+        """Indexed pests, diseases or regions named in text, with the crops they affect.
+
+        Names match on whole words ("rust" is not found in "trust" or "rusty"),
+        optionally in the plural: every phrase of the message up to the
+        longest term's length (and its singular) is looked up in the
+        (kind, term) index at once.
+        """
+        conn = self._connection()
+        words = _WORD_RE.findall(text.lower())
+        longest = self._max_term_words(conn)
+        phrases = set()
+        for start in range(len(words)):
+            for end in range(start + 1, min(start + longest, len(words)) + 1):
+                phrase = ' '.join(words[start:end])
+                phrases.add(phrase)
+                phrases.update(phrase[:-len(suffix)] for suffix in _TERM_SUFFIXES if phrase.endswith(suffix))
+        phrases = sorted(phrases)
+        rows = []
+        for i in range(0, len(phrases), _LOOKUP_CHUNK):
+            chunk = phrases[i:i + _LOOKUP_CHUNK]
+            rows.extend(conn.execute(
+                f"SELECT term, label, crop FROM crop_index WHERE kind = ? AND term IN ({','.join('?' * len(chunk))})",
+                [kind] + chunk
+            ))
+        found = {}
+        for term, label, crop in sorted(rows):
+            found.setdefault(term, {'name': label, 'crops': []})['crops'].append(crop)
+        return list(found.values())
+
+    def snapshot(self) -> Dict:
+        """The whole knowledge base as a dict, rebuilt once per generation"""
+        self.reload_if_changed()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot[0] == self.generation:
+            return snapshot[1]
+        generation = self.generation
+        conn = self._connection()
+        knowledge = {'crops': {name: json.loads(data) for name, data in conn.execute("SELECT name, data FROM crops")}}
+        for section, name, value in conn.execute("SELECT section, name, value FROM sections"):
+            knowledge.setdefault(section, {})[name] = json.loads(value)
+        self._snapshot = (generation, knowledge)
+        return knowledge
+
+    def stats(self) -> Dict:
+        return {
+            'source': self.source,
+            'path': self.path,
+            'generation': self.generation,
+            'reloads': self.reloads,
+            'crops': len(self.crop_names())
+        }
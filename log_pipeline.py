@@ -0,0 +1,413 @@
+import atexit
+import contextvars
+import datetime
+import fcntl
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+# Structured fields collected while handling the current request
+_request_fields = contextvars.ContextVar('log_request_fields', default=None)
+
+request_logger = logging.getLogger('netagrow.requests')
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, pid and the record's structured fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc)
+                          .isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'pid': record.process
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RepeatFilter(logging.Filter):
+    """Let through at most limit records per message template and logger every window seconds.
+
+    During an upstream outage the same warning is logged for every request;
+    the rest are counted and the next record let through reports how many
+    were suppressed. Request records are sampled separately (log_request).
+    """
+
+    def __init__(self, limit: int = 20, window: float = 60.0):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self._lock = threading.Lock()
+        self._seen = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.limit <= 0 or record.name == request_logger.name:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            started, count, suppressed = self._seen.get(key, (now, 0, 0))
+            if now - started >= self.window:
+                started, count = now, 0
+            if count >= self.limit:
+                self._seen[key] = (started, count, suppressed + 1)
+                return False
+            self._seen[key] = (started, count + 1, 0)
+        if suppressed:
+            record.fields = dict(getattr(record, 'fields', None) or {}, suppressed=suppressed)
+        return True
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._seen = {}
+
+
+class _EnqueueHandler(logging.Handler):
+    """Puts records on the pipeline's queue; never blocks or touches the disk"""
+
+    def __init__(self, pipeline: 'LogPipeline'):
+        super().__init__()
+        self.pipeline = pipeline
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # Resolve the message and traceback now, while the arguments still hold their values
+        try:
+            record.msg = record.getMessage()
+            record.args = None
+            if record.exc_info:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+                record.exc_info = None
+            self.pipeline.put(record)
+        except Exception:
+            self.handleError(record)
+
+
+class BatchFileWriter:
+    """Appends batches of JSON lines to a file shared by every worker, rotating it by size.
+
+    Each batch is one write and one flush. A worker that finds the file over
+    max_bytes rotates it under a lock file; the others notice the new inode
+    and reopen before their next batch.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 10,
+                 level: int = logging.NOTSET):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.level = level
+        self.formatter = JsonFormatter()
+        self.stream = None
+
+    def _open(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.stream = open(self.path, 'a', encoding='utf-8')
+
+    def _reopen_if_rotated(self) -> None:
+        try:
+            current = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            current = None
+        if self.stream is None or current != os.fstat(self.stream.fileno()).st_ino:
+            self.close()
+            self._open()
+
+    def _rollover(self) -> None:
+        with open(f"{self.path}.lock", 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # Another worker may have rotated while we waited for the lock
+                stat = os.stat(self.path)
+                if stat.st_ino == os.fstat(self.stream.fileno()).st_ino and stat.st_size >= self.max_bytes:
+                    for i in range(self.backup_count - 1, 0, -1):
+                        if os.path.exists(f"{self.path}.{i}"):
+                            os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+                    if self.backup_count > 0:
+                        os.replace(self.path, f"{self.path}.1")
+                    else:
+                        os.truncate(self.path, 0)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        self._reopen_if_rotated()
+
+    def write(self, records: List[logging.LogRecord]) -> None:
+        lines = ''.join(self.formatter.format(record) + '\n' for record in records if record.levelno >= self.level)
+        if not lines:
+            return
+        self._reopen_if_rotated()
+        if self.max_bytes and os.fstat(self.stream.fileno()).st_size + len(lines) > self.max_bytes:
+            self._rollover()
+        self.stream.write(lines)
+        self.stream.flush()
+
+    def close(self) -> None:
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+
+class StreamWriter:
+    """Writes records at or above level to a stream (stderr) as plain text"""
+
+    def __init__(self, stream=None, level: int = logging.WARNING):
+        self.stream = stream or sys.stderr
+        self.level = level
+        self.formatter = logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def write(self, records: List[logging.LogRecord]) -> None:
+        # The formatter appends record.exc_text (resolved when the record was queued)
+        lines = [self.formatter.format(record) + '\n' for record in records if record.levelno >= self.level]
+        if lines:
+            self.stream.write(''.join(lines))
+            self.stream.flush()
+
+    def close(self) -> None:
+        pass
+
+
+class LogPipeline:
+    """Queue-based logging: callers enqueue, a background thread writes in batches.
+
+    Logging from a request costs a queue put. The listener thread drains up
+    to batch_size records at a time and hands each batch to its writers, so
+    disk writes happen off the request path and once per batch. If the
+    queue is full records are dropped (and counted) rather than blocking.
+    Threads do not survive fork, so each gunicorn worker restarts the
+    listener after forking.
+    """
+
+    def __init__(self, writers: List, batch_size: int = 256, flush_interval: float = 0.5,
+                 max_queue: int = 10000):
+        self.writers = writers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.handler = _EnqueueHandler(self)
+        self.dropped = 0
+        self.written = 0
+        self._start()
+
+    def _start(self) -> None:
+        self._queue = queue.Queue(self.max_queue)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='log-pipeline', daemon=True)
+        self._thread.start()
+
+    def _after_fork(self) -> None:
+        for writer in self.writers:
+            if isinstance(writer, BatchFileWriter):
+                writer.stream = None
+        for log_filter in self.handler.filters:
+            if isinstance(log_filter, RepeatFilter):
+                log_filter._reset()
+        self.dropped = self.written = 0
+        self._start()
+
+    def put(self, record: logging.LogRecord) -> None:
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _drain(self, block: bool) -> List[logging.LogRecord]:
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=self.flush_interval) if block else self._queue.get_nowait())
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _write(self, batch: List[logging.LogRecord]) -> None:
+        for writer in self.writers:
+            try:
+                writer.write(batch)
+            except Exception as e:
+                sys.stderr.write(f"Log write failed: {e}\n")
+        self.written += len(batch)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            batch = self._drain(block=True)
+            if batch:
+                self._write(batch)
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """Stop the listener and write whatever is still queued"""
+        self._stop.set()
+        self._thread.join(timeout)
+        batch = self._drain(block=False)
+        while batch:
+            self._write(batch)
+            batch = self._drain(block=False)
+        for writer in self.writers:
+            writer.close()
+
+    def stats(self) -> Dict:
+        return {
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped
+        }
+
+
+_pipeline: Optional[LogPipeline] = None
+
+
+def configure_logging(log_file: Optional[str] = None) -> LogPipeline:
+    """Route every logger through the pipeline, configured from LOG_* variables (once per process)"""
+    global _pipeline
+    if _pipeline is not None:
+        return _pipeline
+    level = getattr(logging, os.getenv('LOG_LEVEL', 'INFO').upper(), logging.INFO)
+    path = os.getenv('LOG_FILE', log_file or 'logs/netagrow-chatbot.log')
+    writers = [StreamWriter(level=getattr(logging, os.getenv('LOG_CONSOLE_LEVEL', 'WARNING').upper(),
+                                          logging.WARNING))]
+    if path:
+        writers.append(BatchFileWriter(
+            path,
+            max_bytes=int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024))),
+            backup_count=int(os.getenv('LOG_BACKUP_COUNT', '10'))
+        ))
+    _pipeline = LogPipeline(
+        writers,
+        batch_size=int(os.getenv('LOG_BATCH_SIZE', '256')),
+        flush_interval=float(os.getenv('LOG_FLUSH_INTERVAL', '0.5')),
+        max_queue=int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+    )
+    _pipeline.handler.addFilter(RepeatFilter(limit=int(os.getenv('LOG_REPEAT_LIMIT', '20'))))
+    root = logging.getLogger()
+    root.handlers = [_pipeline.handler]
+    root.setLevel(level)
+    os.register_at_fork(after_in_child=_pipeline._after_fork)
+    atexit.register(_pipeline.stop)
+    return _pipeline
+
+
+def stop_logging() -> None:
+    """Write out queued records; call before a worker exits"""
+    if _pipeline is not None:
+        _pipeline.stop()
+
+
+def logging_stats() -> Dict:
+    return _pipeline.stats() if _pipeline is not None else {}
+
+
+# Per-request fields
+
+def begin_request(**fields) -> contextvars.Token:
+    """Start collecting fields for the current request's log record"""
+    return _request_fields.set(dict(fields))
+
+
+def end_request(token: contextvars.Token) -> Dict:
+    """Stop collecting and return the request's fields"""
+    fields = _request_fields.get() or {}
+    _request_fields.reset(token)
+    return fields
+
+
+class StreamWithFields:
+    """A streamed response body iterated with fields as the current request's log record.
+
+    For WSGI streams, which are generated after the request handler (and
+    end_request) returned: annotations made while producing each chunk land
+    in fields. on_close() is called exactly once from close(), which the
+    WSGI server calls even when the client went away before the first
+    chunk was produced.
+    """
+
+    def __init__(self, chunks: Iterable, fields: Dict, on_close: Callable[[], None]):
+        self.chunks = chunks
+        self.fields = fields
+        self.on_close = on_close
+        self._iterator = None
+        self._closed = False
+
+    def __iter__(self) -> Iterator:
+        return self
+
+    def __next__(self):
+        if self._iterator is None:
+            self._iterator = iter(self.chunks)
+        token = _request_fields.set(self.fields)
+        try:
+            return next(self._iterator)
+        finally:
+            _request_fields.reset(token)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            close = getattr(self._iterator if self._iterator is not None else self.chunks, 'close', None)
+            if close is not None:
+                close()
+        finally:
+            self.on_close()
+
+
+def annotate(**fields) -> None:
+    """Add fields to the current request's log record (no-op outside a request)"""
+    current = _request_fields.get()
+    if current is not None:
+        current.update(fields)
+
+
+def annotate_timing(group: str, name: str, seconds: float, outcome: Optional[str] = None) -> None:
+    """Add a timing in milliseconds under group (e.g. stages, upstream); repeated names accumulate"""
+    current = _request_fields.get()
+    if current is None:
+        return
+    timings = current.setdefault(group, {})
+    if outcome is None:
+        timings[name] = round(timings.get(name, 0) + seconds * 1000, 1)
+    else:
+        previous = timings.get(name) or {'ms': 0, 'calls': 0}
+        timings[name] = {
+            'ms': round(previous['ms'] + seconds * 1000, 1),
+            'calls': previous['calls'] + 1,
+            'outcome': outcome if outcome != 'ok' else previous.get('outcome', 'ok')
+        }
+
+
+def annotate_result(group: str, name: str, result: str) -> None:
+    """Record a result under group (e.g. cache hit or miss); the last one per name wins"""
+    current = _request_fields.get()
+    if current is not None:
+        current.setdefault(group, {})[name] = result
+
+
+REQUEST_SAMPLE_RATE = float(os.getenv('LOG_REQUEST_SAMPLE_RATE', '0.1'))
+SLOW_REQUEST_SECONDS = float(os.getenv('LOG_SLOW_REQUEST_SECONDS', '2'))
+
+
+def log_request(fields: Dict) -> None:
+    """Log one request record; errors, 429s and slow requests are always kept, the rest sampled"""
+    status = fields.get('status', 0)
+    if status >= 500 or status == 429 or fields.get('latency_ms', 0) >= SLOW_REQUEST_SECONDS * 1000:
+        rate = 1.0
+    elif random.random() < REQUEST_SAMPLE_RATE:
+        rate = REQUEST_SAMPLE_RATE
+    else:
+        return
+    fields['sample_rate'] = rate
+    request_logger.info('request', extra={'fields': fields})
@@ -0,0 +1,533 @@
+import csv
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import pandas as pd
+except ImportError:  # optional; only needed to ingest Parquet drops
+    pd = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'market_prices')
+
+# Bump when the cached column layout changes so stale files are re-read
+SCHEMA_VERSION = '2'
+
+# A moving average that changed by more than this fraction is 'rising' or 'falling'
+TREND_THRESHOLD = 0.03
+
+DROP_EXTENSIONS = ('.csv', '.parquet')
+
+# Day number of a Monday (1970-01-05), so weekly history periods start on Mondays
+PERIOD_ORIGIN = 4
+
+
+def parse_day(value: str) -> int:
+    """Day number (days since 1970-01-01) of an ISO date; raises ValueError if it is not one"""
+    return int(np.datetime64(value.strip()[:10], 'D').astype(np.int64))
+
+
+def format_day(day: int) -> str:
+    return str(np.datetime64(int(day), 'D'))
+
+
+def _drop_stamp(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _first_provinces(market_codes: np.ndarray, provinces: np.ndarray, markets: int) -> np.ndarray:
+    """Province of each market: the first non-empty one given on its rows"""
+    known = provinces != ''
+    located, first = np.unique(market_codes[known], return_index=True)
+    result = np.full(markets, '', dtype=object)
+    result[located] = provinces[known][first]
+    return result.astype(str)
+
+
+def _read_csv(path: str) -> Dict[str, np.ndarray]:
+    """Columns of a CSV drop; rows without a valid date, market, crop or price are skipped"""
+    markets, crops, units = {}, {}, {'': 0}
+    days_by_date = {}
+    day, price, market, crop, unit, province = [], [], [], [], [], []
+    skipped = 0
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = [name.strip().lower() for name in next(reader, [])]
+        missing = [name for name in ('date', 'market', 'crop', 'price') if name not in header]
+        if missing:
+            raise ValueError(f"missing column(s) {', '.join(missing)}")
+        i_date, i_market, i_crop, i_price = (header.index(name) for name in ('date', 'market', 'crop', 'price'))
+        i_province = header.index('province') if 'province' in header else None
+        i_unit = header.index('unit') if 'unit' in header else None
+        for row in reader:
+            try:
+                date = row[i_date].strip()
+                if date not in days_by_date:
+                    days_by_date[date] = parse_day(date)
+                value = float(row[i_price])
+                market_name, crop_name = row[i_market].strip(), row[i_crop].strip().lower()
+            except (IndexError, ValueError):
+                skipped += 1
+                continue
+            if not market_name or not crop_name or not value > 0:
+                skipped += 1
+                continue
+            day.append(days_by_date[date])
+            price.append(value)
+            market.append(markets.setdefault(market_name, len(markets)))
+            crop.append(crops.setdefault(crop_name, len(crops)))
+            unit_name = row[i_unit].strip() if i_unit is not None and i_unit < len(row) else ''
+            unit.append(units.setdefault(unit_name, len(units)))
+            province.append(row[i_province].strip() if i_province is not None and i_province < len(row) else '')
+    if skipped:
+        logger.warning("Skipped %d malformed rows in %s", skipped, path)
+    market = np.array(market, dtype=np.int32)
+    return {
+        'day': np.array(day, dtype=np.int32),
+        'price': np.array(price, dtype=np.float64),
+        'market': market,
+        'crop': np.array(crop, dtype=np.int32),
+        'unit': np.array(unit, dtype=np.int32),
+        'markets': np.array(list(markets), dtype=str),
+        'market_provinces': _first_provinces(market, np.array(province, dtype=str), len(markets)),
+        'crops': np.array(list(crops), dtype=str),
+        'units': np.array(list(units), dtype=str)
+    }
+
+
+def _read_parquet(path: str) -> Dict[str, np.ndarray]:
+    frame = pd.read_parquet(path)
+    frame.columns = [str(column).strip().lower() for column in frame.columns]
+    frame = frame.dropna(subset=['date', 'market', 'crop', 'price'])
+    frame = frame[frame['price'] > 0]
+
+    def text(column):
+        if column not in frame:
+            return pd.Series([''] * len(frame), index=frame.index)
+        return frame[column].fillna('').astype(str).str.strip()
+
+    market, markets = pd.factorize(text('market'))
+    crop, crops = pd.factorize(text('crop').str.lower())
+    unit, units = pd.factorize(text('unit'))
+    return {
+        'day': frame['date'].to_numpy().astype('datetime64[D]').astype(np.int32),
+        'price': frame['price'].to_numpy(dtype=np.float64),
+        'market': market.astype(np.int32),
+        'crop': crop.astype(np.int32),
+        'unit': unit.astype(np.int32),
+        'markets': np.asarray(markets, dtype=str),
+        'market_provinces': _first_provinces(market, text('province').to_numpy(dtype=str), len(markets)),
+        'crops': np.asarray(crops, dtype=str),
+        'units': np.asarray(units, dtype=str)
+    }
+
+
+def read_drop(path: str, cache_dir: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """Columns of one price drop, from cache_dir if it was read before.
+
+    Markets, crops and units are integer codes into the drop's own label
+    arrays (markets, crops, units; market_provinces gives each market's
+    province). A parsed drop is saved in cache_dir as .npz, keyed by path,
+    size and mtime, so workers and restarts load the columns instead of
+    parsing the CSV again.
+    """
+    mtime_ns, size = _drop_stamp(path)
+    cached = None
+    if cache_dir:
+        key = hashlib.sha256(f"{SCHEMA_VERSION}:{os.path.abspath(path)}:{mtime_ns}:{size}".encode()).hexdigest()
+        cached = os.path.join(cache_dir, f"{key[:32]}.npz")
+        try:
+            with np.load(cached) as columns:
+                return {name: columns[name] for name in columns.files}
+        except (OSError, ValueError):
+            pass
+    if path.endswith('.parquet'):
+        if pd is None:
+            raise ValueError('pandas and pyarrow are needed to read Parquet drops')
+        columns = _read_parquet(path)
+    else:
+        columns = _read_csv(path)
+    if cached:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix='.prices-', suffix='.npz', dir=cache_dir)
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **columns)
+            os.replace(tmp_path, cached)
+        except OSError as e:
+            logger.warning("Could not cache parsed price drop %s: %s", path, e)
+    return columns
+
+
+class _Series:
+    """All observations of one crop, sorted by day (then market), with each market's latest day"""
+    __slots__ = ('market', 'day', 'price', 'last_day')
+
+    def __init__(self, market: np.ndarray, day: np.ndarray, price: np.ndarray):
+        order = np.lexsort((market, day))
+        self.market = market[order]
+        self.day = day[order]
+        self.price = price[order]
+        self.last_day = np.full(int(self.market.max()) + 1 if len(self.market) else 0, -1, dtype=np.int64)
+        reversed_markets, last = np.unique(self.market[::-1], return_index=True)
+        self.last_day[reversed_markets] = self.day[::-1][last]
+
+    def merged(self, market: np.ndarray, day: np.ndarray, price: np.ndarray) -> '_Series':
+        return _Series(np.concatenate([self.market, market]), np.concatenate([self.day, day]),
+                       np.concatenate([self.price, price]))
+
+    def between(self, since: Optional[int], until: Optional[int]) -> slice:
+        """Rows with since <= day <= until"""
+        start = 0 if since is None else int(np.searchsorted(self.day, since, 'left'))
+        stop = len(self.day) if until is None else int(np.searchsorted(self.day, until, 'right'))
+        return slice(start, stop)
+
+
+class _Prices:
+    """One version of the store's contents. Ingesting builds the next version
+    from a shallow copy, sharing the series of crops it does not touch."""
+
+    def __init__(self, previous: Optional['_Prices'] = None):
+        self.files = dict(previous.files) if previous else {}
+        self.series = dict(previous.series) if previous else {}
+        self.units = dict(previous.units) if previous else {}
+        self.summaries = dict(previous.summaries) if previous else {}
+        self.markets = list(previous.markets) if previous else []
+        self.market_codes = dict(previous.market_codes) if previous else {}
+        self.provinces = list(previous.provinces) if previous else []
+        self.province_codes = dict(previous.province_codes) if previous else {}
+        # Province code of each market code (-1 if unknown)
+        self.market_province = previous.market_province if previous else np.zeros(0, dtype=np.int16)
+
+    @staticmethod
+    def _code(names: List[str], codes: Dict[str, int], name: str) -> int:
+        key = name.lower()
+        if key not in codes:
+            codes[key] = len(names)
+            names.append(name)
+        return codes[key]
+
+    def encode_markets(self, names: np.ndarray, provinces: np.ndarray) -> np.ndarray:
+        """Store codes of a drop's markets, registering new markets and their provinces"""
+        codes = np.array([self._code(self.markets, self.market_codes, str(name)) for name in names],
+                         dtype=np.int16)
+        market_province = np.full(len(self.markets), -1, dtype=np.int16)
+        market_province[:len(self.market_province)] = self.market_province
+        for code, province in zip(codes, provinces):
+            if province and market_province[code] < 0:
+                market_province[code] = self._code(self.provinces, self.province_codes, str(province).title())
+        self.market_province = market_province
+        return codes
+
+    def market_filter(self, market: Optional[str], province: Optional[str]) -> Optional[np.ndarray]:
+        """Codes of the markets matching market and/or province, or None if neither is given"""
+        if not market and not province:
+            return None
+        codes = np.arange(len(self.markets))
+        if market:
+            codes = codes[codes == self.market_codes.get(market.lower(), -1)]
+        if province:
+            codes = codes[self.market_province[codes] == self.province_codes.get(province.lower(), -1)]
+        return codes
+
+
+class PriceStore:
+    """Crop price observations in columnar NumPy arrays, indexed by crop and market.
+
+    Price drops (CSV, or Parquet with pandas installed; columns date,
+    market, crop, price and optionally province, unit) are read from a
+    directory, checked for new files at most every reload_interval seconds.
+    New drops are appended to the series of the crops they contain; a drop
+    that changed or disappeared triggers a full rebuild. Each crop's series
+    is sorted by day with markets and provinces as integer codes, so a
+    date range is a binary search and trends, moving averages and regional
+    comparisons are a few masked array reductions over it. The unfiltered
+    summary of each crop is cached until a drop for that crop is ingested.
+    Every ingest publishes a new version of the store, so queries never see
+    a drop half applied. Built before gunicorn forks, the arrays are shared
+    copy-on-write by the workers.
+    """
+
+    def __init__(self, directory: str = DEFAULT_DIR, cache_dir: Optional[str] = None,
+                 window: int = 28, reload_interval: float = 60):
+        self.directory = directory
+        self.cache_dir = cache_dir
+        self.window = max(1, window)
+        self.reload_interval = reload_interval
+        self.generation = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._prices = _Prices()
+        self.reload_if_changed(force=True)
+
+    @classmethod
+    def from_env(cls) -> 'PriceStore':
+        """Build a store configured from MARKET_PRICES_* variables"""
+        return cls(
+            directory=os.getenv('MARKET_PRICES_DIR', DEFAULT_DIR),
+            cache_dir=os.getenv('MARKET_PRICES_CACHE_DIR', '/tmp/netagrow-market-prices') or None,
+            window=int(os.getenv('MARKET_PRICES_WINDOW', '28')),
+            reload_interval=float(os.getenv('MARKET_PRICES_RELOAD_INTERVAL', '60'))
+        )
+
+    # Ingest
+
+    def _ingest(self, prices: _Prices, drops: List[Dict[str, np.ndarray]]) -> _Prices:
+        """The version after adding the observations of drops (columns as returned by read_drop) to prices.
+
+        Each crop's series is merged and sorted once per call, however many
+        drops it gets rows from.
+        """
+        prices = _Prices(prices)
+        pieces = {}
+        for columns in drops:
+            markets = prices.encode_markets(columns['markets'], columns['market_provinces'])[columns['market']]
+            labels = columns['units']
+            for code, crop in enumerate(columns['crops']):
+                crop = str(crop)
+                rows = columns['crop'] == code
+                drop_units = np.unique(columns['unit'][rows])
+                unit = prices.units.get(crop) or next((str(labels[u]) for u in drop_units if labels[u]), '')
+                prices.units[crop] = unit
+                if unit:
+                    # Prices in another unit cannot be compared with the rest of the series
+                    other = [u for u in drop_units if labels[u] not in ('', unit)]
+                    if other:
+                        accepted = rows & ~np.isin(columns['unit'], other)
+                        mismatched = int(rows.sum() - accepted.sum())
+                        self.rejected += mismatched
+                        logger.warning("Skipped %d %s prices not per %s", mismatched, crop, unit)
+                        rows = accepted
+                pieces.setdefault(crop, []).append((markets[rows], columns['day'][rows], columns['price'][rows]))
+        for crop, new in pieces.items():
+            new = [np.concatenate(column) for column in zip(*new)]
+            series = prices.series.get(crop)
+            prices.series[crop] = _Series(*new) if series is None else series.merged(*new)
+            prices.summaries.pop(crop, None)
+        return prices
+
+    def ingest(self, columns: Dict[str, np.ndarray]) -> None:
+        """Add a drop's observations (columns as returned by read_drop)"""
+        with self._lock:
+            self._prices = self._ingest(self._prices, [columns])
+            self.generation += 1
+
+    def _drops(self) -> Dict[str, Tuple[int, int]]:
+        if not os.path.isdir(self.directory):
+            return {}
+        drops = {}
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if name.endswith(DROP_EXTENSIONS) and os.path.isfile(path):
+                drops[path] = _drop_stamp(path)
+        return drops
+
+    def reload_if_changed(self, force: bool = False) -> None:
+        """Ingest new drops; rebuild from scratch if a drop already ingested changed or was removed"""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.reload_interval:
+            return
+        with self._lock:
+            if not force and now - self._checked_at < self.reload_interval:
+                return
+            self._checked_at = now
+            try:
+                drops = self._drops()
+            except OSError as e:
+                logger.warning("Market price directory scan failed: %s", e)
+                return
+            prices = self._prices
+            if any(drops.get(path) != stamp for path, stamp in prices.files.items()):
+                prices = _Prices()
+            new = [path for path in drops if path not in prices.files]
+            if new:
+                columns = []
+                for path in new:
+                    try:
+                        columns.append(read_drop(path, self.cache_dir))
+                    except (OSError, ValueError, KeyError) as e:
+                        # Keep serving the other drops; a bad drop must not take the endpoint down
+                        logger.warning("Market price drop %s not ingested: %s", path, e)
+                prices = self._ingest(prices, columns)
+                prices.files.update((path, drops[path]) for path in new)
+            if prices is not self._prices:
+                self._prices = prices
+                self.generation += 1
+
+    # Queries
+
+    def crops(self) -> List[str]:
+        self.reload_if_changed()
+        return sorted(self._prices.series)
+
+    def unit(self, crop: str) -> str:
+        """Unit prices of crop are quoted per, e.g. '50kg'"""
+        return self._prices.units.get(crop.lower(), '')
+
+    @staticmethod
+    def _rows(series: _Series, codes: Optional[np.ndarray], since: Optional[int] = None,
+              until: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(market codes, days, prices) of the series between since and until, in the given markets"""
+        span = series.between(since, until)
+        markets, days, values = series.market[span], series.day[span], series.price[span]
+        if codes is None:
+            return markets, days, values
+        mask = np.isin(markets, codes)
+        return markets[mask], days[mask], values[mask]
+
+    @staticmethod
+    def _latest_day(series: _Series, codes: Optional[np.ndarray], as_of: Optional[int]) -> Optional[int]:
+        """Most recent day (up to as_of) with an observation in the given markets"""
+        if as_of is None:
+            last = series.last_day if codes is None else series.last_day[codes[codes < len(series.last_day)]]
+            last = last[last >= 0]
+            return int(last.max()) if len(last) else None
+        days = PriceStore._rows(series, codes, until=as_of)[1]
+        return int(days[-1]) if len(days) else None
+
+    def summary(self, crop: str, market: Optional[str] = None, province: Optional[str] = None,
+                as_of: Optional[int] = None) -> Optional[Dict]:
+        """Average price over the last window days of data up to as_of, and its trend.
+
+        The trend compares that average with the window before it. Returns
+        None if there is no matching observation.
+        """
+        self.reload_if_changed()
+        prices = self._prices
+        crop = crop.lower()
+        cacheable = not market and not province and as_of is None
+        if cacheable and crop in prices.summaries:
+            return prices.summaries[crop]
+        series = prices.series.get(crop)
+        if series is None:
+            return None
+        codes = prices.market_filter(market, province)
+        latest = self._latest_day(series, codes, as_of)
+        if latest is None:
+            return None
+        markets, days, values = self._rows(series, codes, latest - 2 * self.window + 1, latest)
+        current = days > latest - self.window
+        average = float(values[current].mean())
+        change = float(average / values[~current].mean() - 1) if not current.all() else None
+        if change is None or abs(change) <= TREND_THRESHOLD:
+            trend = 'stable'
+        else:
+            trend = 'rising' if change > 0 else 'falling'
+        unit = prices.units.get(crop, '')
+        result = {
+            'price': f"K{average:.0f}/{unit}" if unit else f"K{average:.0f}",
+            'trend': trend,
+            'average': round(average, 2),
+            'low': round(float(values[current].min()), 2),
+            'high': round(float(values[current].max()), 2),
+            'change': round(change, 4) if change is not None else None,
+            'unit': unit,
+            'markets': int(len(np.unique(markets[current]))),
+            'observations': int(current.sum()),
+            'as_of': format_day(latest)
+        }
+        if cacheable:
+            prices.summaries[crop] = result
+        return result
+
+    def summaries(self, crops: Optional[List[str]] = None, market: Optional[str] = None,
+                  province: Optional[str] = None, as_of: Optional[int] = None) -> Dict[str, Dict]:
+        """summary() of every crop (or the given ones) that has matching observations"""
+        results = {}
+        for crop in crops or self.crops():
+            result = self.summary(crop, market, province, as_of)
+            if result is not None:
+                results[crop.lower()] = result
+        return results
+
+    def history(self, crop: str, market: Optional[str] = None, province: Optional[str] = None,
+                since: Optional[int] = None, until: Optional[int] = None,
+                interval: int = 7) -> Optional[List[Dict]]:
+        """Average price per period of interval days, with a moving average over the last window days.
+
+        Weekly periods start on Mondays; periods without observations are
+        left out. Returns None if the crop has no matching observations.
+        """
+        self.reload_if_changed()
+        prices = self._prices
+        series = prices.series.get(crop.lower())
+        if series is None:
+            return None
+        interval = max(1, interval)
+        # Start a window early, so the first moving averages cover a full window
+        lead = None if since is None else since - self.window
+        _, days, values = self._rows(series, prices.market_filter(market, province), lead, until)
+        if not len(days):
+            return None
+        buckets = (days - PERIOD_ORIGIN) // interval
+        first = int(buckets[0])
+        buckets = buckets - first
+        sums = np.bincount(buckets, weights=values)
+        counts = np.bincount(buckets)
+        # Moving average over the last k periods (fewer at the start), weighted by observations
+        k = -(-self.window // interval)
+        sum_totals = np.concatenate([[0.0], np.cumsum(sums)])
+        count_totals = np.concatenate([[0], np.cumsum(counts)])
+        begin = np.maximum(np.arange(1, len(sums) + 1) - k, 0)
+        moving = (sum_totals[1:] - sum_totals[begin]) / np.maximum(count_totals[1:] - count_totals[begin], 1)
+        starts = (np.arange(len(sums)) + first) * interval + PERIOD_ORIGIN
+        keep = counts > 0
+        if since is not None:
+            keep &= starts + interval > since
+        dates = np.datetime_as_string(starts[keep].astype('datetime64[D]')).tolist()
+        return [
+            {'date': date, 'average': round(total / count, 2), 'moving_average': round(average, 2),
+             'observations': count}
+            for date, total, count, average in zip(dates, sums[keep].tolist(), counts[keep].tolist(),
+                                                   moving[keep].tolist())
+        ]
+
+    def regions(self, crop: str, as_of: Optional[int] = None) -> Optional[Dict]:
+        """Average price per province over the last window days, relative to the national average"""
+        self.reload_if_changed()
+        prices = self._prices
+        series = prices.series.get(crop.lower())
+        latest = self._latest_day(series, None, as_of) if series is not None else None
+        if latest is None:
+            return None
+        markets, _, values = self._rows(series, None, latest - self.window + 1, latest)
+        provinces = prices.market_province[markets].astype(np.int64)
+        national = float(values.mean())
+        known = provinces >= 0
+        sums = np.bincount(provinces[known], weights=values[known], minlength=len(prices.provinces))
+        counts = np.bincount(provinces[known], minlength=len(prices.provinces))
+        return {
+            'as_of': format_day(latest),
+            'unit': prices.units.get(crop.lower(), ''),
+            'national': round(national, 2),
+            'provinces': {
+                prices.provinces[code]: {
+                    'average': round(float(sums[code] / counts[code]), 2),
+                    'vs_national': round(float(sums[code] / counts[code] / national - 1), 4),
+                    'observations': int(counts[code])
+                }
+                for code in np.flatnonzero(counts)
+            }
+        }
+
+    def stats(self) -> Dict:
+        prices = self._prices
+        return {
+            'directory': self.directory,
+            'drops': len(prices.files),
+            'crops': len(prices.series),
+            'markets': len(prices.markets),
+            'observations': sum(len(series.day) for series in prices.series.values()),
+            'rejected': self.rejected,
+            'generation': self.generation
+        }
@@ -0,0 +1,368 @@
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from log_pipeline import annotate_result, annotate_timing
+
+logger = logging.getLogger(__name__)
+
+# Request and upstream latency buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+ARCHIVE_FILE = 'archive.json'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    labels = list(labels)
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    """A named counter or histogram with a fixed set of label names"""
+
+    def __init__(self, registry: 'Registry', kind: str, name: str, help: str,
+                 labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.registry = registry
+        self.kind = kind
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Add amount to a counter"""
+        self.registry._add(self, self._key(labels), amount)
+
+    def observe(self, value: float, **labels) -> None:
+        """Record one histogram observation"""
+        self.registry._add(self, self._key(labels), value)
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block in seconds, also when it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+
+class Registry:
+    """Process-local metric values, aggregated across gunicorn workers through files.
+
+    With a directory (METRICS_DIR) each worker writes its values to
+    worker-<pid>.json at most every flush_interval seconds after a change,
+    and /metrics in any worker sums every worker's file. Files of exited
+    workers are folded into archive.json (see mark_process_dead) so
+    counters never go backwards when workers are recycled. Without a
+    directory only this process's values are reported.
+    """
+
+    def __init__(self, directory: Optional[str] = None, flush_interval: float = 1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._metrics = {}
+        self._values = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._flush_timer = None
+
+    @classmethod
+    def from_env(cls) -> 'Registry':
+        """Build a registry configured from METRICS_* variables"""
+        return cls(
+            directory=os.getenv('METRICS_DIR') or None,
+            flush_interval=float(os.getenv('METRICS_FLUSH_INTERVAL', '1'))
+        )
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Metric:
+        return self._register(Metric(self, 'counter', name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Metric:
+        return self._register(Metric(self, 'histogram', name, help, labelnames, buckets))
+
+    def _register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def _add(self, metric: Metric, key: Tuple[str, ...], value: float) -> None:
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked worker: values counted by the parent are not ours to report
+                self._values.clear()
+                self._pid = os.getpid()
+                self._flush_timer = None
+            values = self._values.setdefault(metric.name, {})
+            if metric.kind == 'counter':
+                values[key] = values.get(key, 0) + value
+            else:
+                state = values.get(key)
+                if state is None:
+                    # Per-bucket counts (the last one +Inf), then sum and count
+                    state = values[key] = [0] * (len(metric.buckets) + 3)
+                for i, bound in enumerate(metric.buckets):
+                    if value <= bound:
+                        state[i] += 1
+                        break
+                else:
+                    state[len(metric.buckets)] += 1
+                state[-2] += value
+                state[-1] += 1
+            if self.directory and self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def _snapshot(self) -> Dict:
+        with self._lock:
+            self._flush_timer = None
+            if self._pid != os.getpid():
+                return {}
+            return {name: [[list(key), value if isinstance(value, (int, float)) else list(value)]
+                           for key, value in values.items()]
+                    for name, values in self._values.items()}
+
+    def _path(self, pid: int) -> str:
+        return os.path.join(self.directory, f"worker-{pid}.json")
+
+    def flush(self) -> None:
+        """Write this process's values to its worker file"""
+        if not self.directory:
+            return
+        snapshot = self._snapshot()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(os.getpid())
+            # The flush timer and a /metrics request may flush at the same time
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Metrics flush failed: %s", e)
+
+    @contextlib.contextmanager
+    def _archive_lock(self):
+        with open(os.path.join(self.directory, '.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def mark_process_dead(self, pid: int) -> None:
+        """Fold an exited worker's file into the archive (call from gunicorn's child_exit)"""
+        if not self.directory:
+            return
+        path = self._path(pid)
+        archive_path = os.path.join(self.directory, ARCHIVE_FILE)
+        try:
+            with self._archive_lock():
+                if not os.path.exists(path):
+                    return
+                merged = self._merge([self._read(archive_path), self._read(path)])
+                with open(archive_path + '.tmp', 'w') as f:
+                    json.dump(self._serialize(merged), f)
+                os.replace(archive_path + '.tmp', archive_path)
+                os.remove(path)
+        except OSError as e:
+            logger.warning("Metrics archive failed for worker %s: %s", pid, e)
+
+    def reset_directory(self) -> None:
+        """Remove files left by a previous server run (call from gunicorn's on_starting)"""
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith('.json') or name.endswith('.tmp'):
+                os.remove(os.path.join(self.directory, name))
+
+    @staticmethod
+    def _read(path: str) -> Dict:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _merge(self, snapshots: Iterable[Dict]) -> Dict[str, Dict[Tuple[str, ...], object]]:
+        merged = {}
+        for snapshot in snapshots:
+            for name, entries in snapshot.items():
+                values = merged.setdefault(name, {})
+                for key, value in entries:
+                    key = tuple(key)
+                    if isinstance(value, list):
+                        current = values.get(key)
+                        values[key] = value if current is None else [a + b for a, b in zip(current, value)]
+                    else:
+                        values[key] = values.get(key, 0) + value
+        return merged
+
+    @staticmethod
+    def _serialize(merged: Dict) -> Dict:
+        return {name: [[list(key), value] for key, value in values.items()] for name, values in merged.items()}
+
+    def collect(self) -> Dict[str, Dict[Tuple[str, ...], object]]:
+        """All values, summed over every worker when a directory is configured"""
+        if not self.directory:
+            return self._merge([self._snapshot()])
+        self.flush()
+        snapshots = []
+        try:
+            # Locked so a worker being archived is counted exactly once
+            with self._archive_lock():
+                for name in os.listdir(self.directory):
+                    if name == ARCHIVE_FILE or (name.startswith('worker-') and name.endswith('.json')):
+                        snapshots.append(self._read(os.path.join(self.directory, name)))
+        except OSError as e:
+            logger.warning("Metrics collection failed: %s", e)
+        return self._merge(snapshots)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        collected = self.collect()
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for key, value in sorted(collected.get(name, {}).items()):
+                labels = list(zip(metric.labelnames, key))
+                if metric.kind == 'counter':
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float('inf'),), value[:-2]):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f"{name}_bucket{_format_labels(labels + [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[-2])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {value[-1]}")
+        lines.extend(self._cache_ratios(collected))
+        return '\n'.join(lines) + '\n'
+
+    def _cache_ratios(self, collected: Dict) -> Iterable[str]:
+        """Hit ratio per cache, computed from the aggregated lookup counters"""
+        lookups = {}
+        for (cache, result), count in collected.get('cache_lookups_total', {}).items():
+            lookups.setdefault(cache, {}).setdefault(result, 0)
+            lookups[cache][result] += count
+        if not lookups:
+            return []
+        lines = ["# HELP cache_hit_ratio Share of cache lookups that were hits, over all workers",
+                 "# TYPE cache_hit_ratio gauge"]
+        for cache, results in sorted(lookups.items()):
+            total = sum(results.values())
+            lines.append(f"cache_hit_ratio{_format_labels([('cache', cache)])} "
+                         f"{round(results.get('hit', 0) / total, 4) if total else 0}")
+        return lines
+
+
+registry = Registry.from_env()
+
+HTTP_REQUESTS = registry.counter(
+    'http_requests_total', 'HTTP requests by route, method and status', ('route', 'method', 'status'))
+HTTP_LATENCY = registry.histogram(
+    'http_request_duration_seconds', 'Time to produce the response (streams: until headers)', ('route',))
+STAGE_LATENCY = registry.histogram(
+    'stage_duration_seconds', 'Time spent in each stage of answering a question', ('flow', 'stage'))
+UPSTREAM_REQUESTS = registry.counter(
+    'upstream_requests_total', 'Calls to OpenAI, WeatherAPI and Supabase by outcome', ('service', 'outcome'))
+UPSTREAM_LATENCY = registry.histogram(
+    'upstream_request_duration_seconds', 'Latency of calls to upstream services', ('service',))
+LLM_TOKENS = registry.counter(
+    'llm_tokens_total', 'OpenAI tokens used (streamed answers are estimated)', ('kind',))
+LLM_ADMISSION = registry.counter(
+    'llm_admission_total', 'LLM calls admitted at once, admitted after queueing, shed or timed out', ('outcome',))
+RATE_LIMITS = registry.counter(
+    'rate_limit_decisions_total', 'Per-user and per-IP rate limit and token budget checks', ('limit', 'outcome'))
+CACHE_LOOKUPS = registry.counter(
+    'cache_lookups_total', 'Cache lookups by cache and result', ('cache', 'result'))
+
+
+class UpstreamCall:
+    """Outcome of one upstream call; set outcome to 'error' for a failed response that did not raise"""
+
+    __slots__ = ('outcome', 'timeout')
+
+    def __init__(self):
+        self.outcome = 'ok'
+        self.timeout = None
+
+    def check(self, status_code: int) -> None:
+        """Count server errors and rate limiting as failures"""
+        if status_code >= 500 or status_code == 429:
+            self.outcome = 'error'
+
+
+def is_timeout(error: BaseException) -> bool:
+    """Whether error is a timeout from any of the HTTP or OpenAI clients"""
+    return isinstance(error, TimeoutError) or 'Timeout' in type(error).__name__
+
+
+def _outcome(error: BaseException) -> str:
+    return 'timeout' if is_timeout(error) else 'error'
+
+
+@contextlib.contextmanager
+def track_upstream(service: str):
+    """Count and time a call to an upstream service; exceptions are recorded and re-raised"""
+    call = UpstreamCall()
+    started = time.perf_counter()
+    try:
+        yield call
+    except BaseException as e:
+        call.outcome = _outcome(e)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        UPSTREAM_LATENCY.observe(elapsed, service=service)
+        UPSTREAM_REQUESTS.inc(service=service, outcome=call.outcome)
+        annotate_timing('upstream', service, elapsed, call.outcome)
+
+
+@contextlib.contextmanager
+def stage(flow: str, name: str):
+    """Time one stage of a flow ('chat' or 'ask'), e.g. with stage('chat', 'llm'): ...
+
+    The time is also added to the request's log record.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_LATENCY.observe(elapsed, flow=flow, stage=name)
+        annotate_timing('stages', name, elapsed)
+
+
+def record_tokens(prompt_tokens: int, completion_tokens: int) -> None:
+    LLM_TOKENS.inc(prompt_tokens, kind='prompt')
+    LLM_TOKENS.inc(completion_tokens, kind='completion')
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    result = 'hit' if hit else 'miss'
+    CACHE_LOOKUPS.inc(cache=cache, result=result)
+    annotate_result('cache', cache, result)
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
@@ -0,0 +1,196 @@
+import logging
+import math
+import os
+import re
+import threading
+from typing import Dict, List, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # optional; a conservative estimate is used without it
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+_encoding = None
+
+
+def _get_encoding():
+    """cl100k_base (the gpt-3.5/gpt-4 encoding), loaded on first use"""
+    global _encoding
+    if _encoding is None and tiktoken is not None:
+        try:
+            _encoding = tiktoken.get_encoding('cl100k_base')
+        except Exception as e:
+            # e.g. the encoding file cannot be downloaded; don't retry on every call
+            logger.warning("tiktoken unavailable, estimating tokens: %s", e)
+            _encoding = False
+    return _encoding or None
+
+
+def token_counter() -> str:
+    """Name of the token counter in use ('tiktoken' or 'estimate')"""
+    return 'tiktoken' if _get_encoding() is not None else 'estimate'
+
+
+def count_tokens(text: str) -> int:
+    """Count the tokens text will use, with tiktoken if installed.
+
+    Without tiktoken every punctuation mark counts as one token and every
+    word as one token per started 6 characters, which slightly overestimates
+    English and local-language text, so budgets stay on the safe side.
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return sum(math.ceil(len(piece) / 6) for piece in _PIECE_RE.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, keep_tail: bool = False) -> str:
+    """Cut text to at most max_tokens, dropping whole trailing lines first.
+
+    With keep_tail the leading lines are dropped instead (e.g. the oldest
+    turns of a conversation); a single remaining line is always cut at its end.
+    """
+    if max_tokens <= 0:
+        return ''
+    if count_tokens(text) <= max_tokens:
+        return text
+    lines = text.split('\n')
+    while len(lines) > 1 and count_tokens('\n'.join(lines)) > max_tokens:
+        lines.pop(0 if keep_tail else -1)
+    text = '\n'.join(lines)
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = _get_encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text)[:max(max_tokens - 1, 0)]) + '…'
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:middle]) < max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low].rstrip() + '…'
+
+
+class PromptSection:
+    """One named part of a prompt with its own token budget.
+
+    Sections with a lower priority are cut first when the whole prompt is
+    over budget; required sections are truncated but never dropped.
+    """
+
+    __slots__ = ('name', 'text', 'max_tokens', 'priority', 'required', 'keep_tail')
+
+    def __init__(self, name: str, text: str, max_tokens: int, priority: int = 0,
+                 required: bool = False, keep_tail: bool = False):
+        self.name = name
+        self.text = text or ''
+        self.max_tokens = max_tokens
+        self.priority = priority
+        self.required = required
+        self.keep_tail = keep_tail
+
+
+def assemble(sections: List[PromptSection], max_tokens: int, kind: str = 'chat') -> Tuple[Dict[str, str], Dict]:
+    """Fit sections into their own budgets and then into max_tokens overall.
+
+    Returns (texts, report): texts maps section name to the text to use (''
+    if dropped); report records per-section token counts, the total and which
+    sections were truncated or dropped.
+    """
+    texts = {}
+    tokens = {}
+    truncated = []
+    dropped = []
+    for section in sections:
+        text = truncate_to_tokens(section.text, section.max_tokens, section.keep_tail)
+        if text != section.text:
+            truncated.append(section.name)
+        texts[section.name] = text
+        tokens[section.name] = count_tokens(text)
+
+    overflow = sum(tokens.values()) - max_tokens
+    for section in sorted(sections, key=lambda s: s.priority):
+        if overflow <= 0:
+            break
+        if not texts[section.name]:
+            continue
+        if section.required:
+            keep = max(tokens[section.name] - overflow, 1)
+            text = truncate_to_tokens(texts[section.name], keep, section.keep_tail)
+        else:
+            keep = tokens[section.name] - overflow
+            # A sliver of an optional section is worth less than its tokens
+            text = truncate_to_tokens(texts[section.name], keep, section.keep_tail) if keep >= 20 else ''
+        overflow -= tokens[section.name] - count_tokens(text)
+        if text:
+            if section.name not in truncated:
+                truncated.append(section.name)
+        else:
+            dropped.append(section.name)
+        texts[section.name] = text
+        tokens[section.name] = count_tokens(text)
+
+    report = {
+        'sections': tokens,
+        'total': sum(tokens.values()),
+        'budget': max_tokens,
+        'truncated': [name for name in truncated if name not in dropped],
+        'dropped': dropped
+    }
+    prompt_stats.record(kind, report)
+    logger.debug("prompt %s: %s", kind, report)
+    return texts, report
+
+
+class PromptStats:
+    """Per-process prompt size counters by prompt kind, reported by /health"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._kinds = {}
+
+    def record(self, kind: str, report: Dict) -> None:
+        with self._lock:
+            entry = self._kinds.setdefault(kind, {
+                'prompts': 0, 'total_tokens': 0, 'max_tokens': 0,
+                'truncated': 0, 'dropped': 0, 'section_tokens': {}
+            })
+            entry['prompts'] += 1
+            entry['total_tokens'] += report['total']
+            entry['max_tokens'] = max(entry['max_tokens'], report['total'])
+            entry['truncated'] += bool(report['truncated'])
+            entry['dropped'] += bool(report['dropped'])
+            for name, count in report['sections'].items():
+                entry['section_tokens'][name] = entry['section_tokens'].get(name, 0) + count
+
+    def stats(self) -> Dict:
+        with self._lock:
+            kinds = {}
+            for kind, entry in self._kinds.items():
+                prompts = entry['prompts']
+                kinds[kind] = {
+                    'prompts': prompts,
+                    'avg_tokens': round(entry['total_tokens'] / prompts, 1),
+                    'max_tokens': entry['max_tokens'],
+                    'truncated': entry['truncated'],
+                    'dropped': entry['dropped'],
+                    'avg_section_tokens': {
+                        name: round(count / prompts, 1) for name, count in entry['section_tokens'].items()
+                    }
+                }
+            return {'counter': token_counter(), 'kinds': kinds}
+
+
+prompt_stats = PromptStats()
+
+
+def budget(name: str, default: int) -> int:
+    """Token budget for a prompt section from PROMPT_<NAME>_TOKENS"""
+    return int(os.getenv(f'PROMPT_{name.upper()}_TOKENS', str(default)))
@@ -0,0 +1,261 @@
+import contextlib
+import contextvars
+import datetime
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from metrics import RATE_LIMITS
+
+logger = logging.getLogger(__name__)
+
+# Expired counters are purged once every this many writes
+PURGE_INTERVAL = 256
+
+# (limiter, identity) charged for LLM tokens used in the current request
+_charging = contextvars.ContextVar('rate_limit_charging', default=None)
+
+
+class MemoryCounterStore:
+    """Per-process token buckets and counters (CACHE_BACKEND=memory)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._writes = 0
+
+    def take(self, key: str, rate: float, capacity: float) -> float:
+        """Take one token from the bucket at key; returns 0 if allowed, else seconds until one refills"""
+        now = time.time()
+        with self._lock:
+            tokens, updated, _ = self._rows.get(key, (capacity, now, 0))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            self._rows[key] = (tokens, now, now + (capacity - tokens) / rate)
+            self._count_write(now)
+        return wait
+
+    def add(self, key: str, amount: float, expires_at: float) -> float:
+        """Add amount to the counter at key and return its new value"""
+        now = time.time()
+        with self._lock:
+            value, _, expiry = self._rows.get(key, (0, now, expires_at))
+            if expiry <= now:
+                value = 0
+            value += amount
+            self._rows[key] = (value, now, expires_at)
+            self._count_write(now)
+        return value
+
+    def get(self, key: str) -> float:
+        with self._lock:
+            row = self._rows.get(key)
+        return row[0] if row and row[2] > time.time() else 0
+
+    def _count_write(self, now: float) -> None:
+        self._writes += 1
+        if self._writes % PURGE_INTERVAL == 0:
+            self._rows = {key: row for key, row in self._rows.items() if row[2] > now}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+
+class SharedCounterStore:
+    """Token buckets and counters in SQLite, shared by every worker on the host (CACHE_BACKEND=sqlite).
+
+    Every check reads and writes one row by primary key inside a single
+    write transaction, so workers never lose each other's updates. Like
+    SharedCache, connections are opened per thread after the fork.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, reopening it after a fork"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_counters ("
+            "key TEXT PRIMARY KEY, value REAL NOT NULL, updated_at REAL NOT NULL, "
+            "expires_at REAL NOT NULL)"
+        )
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def take(self, key: str, rate: float, capacity: float) -> float:
+        """Take one token from the bucket at key; returns 0 if allowed, else seconds until one refills"""
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT value, updated_at FROM rate_counters WHERE key = ?", (key,)
+            ).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_counters (key, value, updated_at, expires_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, tokens, now, now + (capacity - tokens) / rate)
+            )
+        self._count_write(now)
+        return wait
+
+    def add(self, key: str, amount: float, expires_at: float) -> float:
+        """Add amount to the counter at key and return its new value"""
+        now = time.time()
+        value = self._connection().execute(
+            "INSERT INTO rate_counters (key, value, updated_at, expires_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET "
+            "value = CASE WHEN expires_at <= excluded.updated_at THEN 0 ELSE value END + excluded.value, "
+            "updated_at = excluded.updated_at, expires_at = excluded.expires_at "
+            "RETURNING value",
+            (key, amount, now, expires_at)
+        ).fetchone()[0]
+        self._count_write(now)
+        return value
+
+    def get(self, key: str) -> float:
+        row = self._connection().execute(
+            "SELECT value FROM rate_counters WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _count_write(self, now: float) -> None:
+        self._writes += 1
+        if self._writes % PURGE_INTERVAL == 0:
+            self._connection().execute("DELETE FROM rate_counters WHERE expires_at <= ?", (now,))
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM rate_counters").fetchone()[0]
+
+
+def create_counter_store():
+    """Build the counter store for the backend selected by CACHE_BACKEND ('memory' or 'sqlite')"""
+    if os.getenv('CACHE_BACKEND', 'memory').lower() == 'sqlite':
+        return SharedCounterStore(os.getenv('CACHE_PATH', '/tmp/netagrow-cache.db'))
+    return MemoryCounterStore()
+
+
+class RateLimiter:
+    """Per-identity request rate limits and daily LLM token budgets.
+
+    Requests are limited by token buckets, one per farmer (email or phone)
+    and one per client IP, each refilling at its per-minute rate up to one
+    minute's worth of burst. LLM tokens used are charged to the farmer (or
+    the IP when anonymous) against a budget that resets at midnight UTC.
+    A rate of 0 or a budget of 0 disables that limit.
+    """
+
+    def __init__(self, store, user_per_minute: float = 10, ip_per_minute: float = 30,
+                 daily_tokens: int = 50000):
+        self.store = store
+        self.user_per_minute = user_per_minute
+        self.ip_per_minute = ip_per_minute
+        self.daily_tokens = daily_tokens
+
+    @classmethod
+    def from_env(cls) -> 'RateLimiter':
+        """Build a limiter configured from RATE_LIMIT_* and DAILY_TOKEN_BUDGET variables"""
+        return cls(
+            create_counter_store(),
+            user_per_minute=float(os.getenv('RATE_LIMIT_USER_PER_MINUTE', '10')),
+            ip_per_minute=float(os.getenv('RATE_LIMIT_IP_PER_MINUTE', '30')),
+            daily_tokens=int(os.getenv('DAILY_TOKEN_BUDGET', '50000'))
+        )
+
+    def _take(self, limit: str, identity: str, per_minute: float) -> float:
+        if per_minute <= 0 or not identity:
+            return 0.0
+        try:
+            wait = self.store.take(f"{limit}:{identity}", per_minute / 60, max(per_minute, 1))
+        except sqlite3.Error as e:
+            logger.warning("Rate limit check failed: %s", e)
+            return 0.0
+        RATE_LIMITS.inc(limit=limit, outcome='limited' if wait else 'allowed')
+        return wait
+
+    def check(self, user: Optional[str], ip: Optional[str]) -> float:
+        """Count one request; returns 0 if allowed, else seconds to wait before retrying"""
+        return self._take('ip', ip, self.ip_per_minute) or self._take('user', user, self.user_per_minute)
+
+    @staticmethod
+    def _budget_key(identity: str) -> Tuple[str, float]:
+        """Today's budget counter key and the time it expires (next midnight UTC)"""
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        midnight = datetime.datetime.combine(today + datetime.timedelta(days=1), datetime.time(),
+                                             tzinfo=datetime.timezone.utc)
+        return f"tokens:{identity}:{today.isoformat()}", midnight.timestamp()
+
+    def tokens_used(self, identity: str) -> int:
+        try:
+            return int(self.store.get(self._budget_key(identity)[0]))
+        except sqlite3.Error as e:
+            logger.warning("Token budget read failed: %s", e)
+            return 0
+
+    def over_budget(self, identity: Optional[str]) -> bool:
+        """Whether identity has used up today's LLM token budget"""
+        if self.daily_tokens <= 0 or not identity:
+            return False
+        exhausted = self.tokens_used(identity) >= self.daily_tokens
+        RATE_LIMITS.inc(limit='budget', outcome='limited' if exhausted else 'allowed')
+        return exhausted
+
+    def charge(self, identity: str, tokens: int) -> None:
+        if self.daily_tokens <= 0 or not identity or tokens <= 0:
+            return
+        key, expires_at = self._budget_key(identity)
+        try:
+            self.store.add(key, tokens, expires_at)
+        except sqlite3.Error as e:
+            logger.warning("Token budget update failed: %s", e)
+
+    @contextlib.contextmanager
+    def charging(self, identity: Optional[str]):
+        """Charge LLM tokens used inside the block (see charge_tokens) to identity"""
+        token = _charging.set((self, identity) if identity else None)
+        try:
+            yield
+        finally:
+            _charging.reset(token)
+
+    def stats(self) -> Dict:
+        try:
+            entries = len(self.store)
+        except sqlite3.Error:
+            entries = None
+        return {
+            'backend': 'sqlite' if isinstance(self.store, SharedCounterStore) else 'memory',
+            'user_per_minute': self.user_per_minute,
+            'ip_per_minute': self.ip_per_minute,
+            'daily_tokens': self.daily_tokens,
+            'counters': entries
+        }
+
+
+def charge_tokens(tokens: int) -> None:
+    """Charge tokens to the identity set by RateLimiter.charging, if any"""
+    charging = _charging.get()
+    if charging is not None:
+        limiter, identity = charging
+        limiter.charge(identity, tokens)
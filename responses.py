@@ -0,0 +1,75 @@
+import json
+import logging
+import os
+import sys
+from string import Template
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'responses.json')
+
+# Templates missing from a language, or that fail validation, are answered in English
+FALLBACK_LANGUAGE = 'english'
+
+
+class ResponseCatalogue:
+    """Rule-based answers in every supported language, compiled once from data/responses.json.
+
+    Each template is parsed into a string.Template when the catalogue is
+    loaded (text without placeholders is kept as the string itself) and
+    indexed by interned (language, key), so rendering an answer is one dict
+    lookup and a substitution. A translation that uses a placeholder the
+    English template does not have is logged and skipped at load, so
+    rendering never fails on it. Each language may also list local crop
+    names, mapped onto knowledge base crops, and the direct_words that may
+    accompany a topic in a question answered straight from the catalogue
+    ("tell me about ...").
+    """
+
+    def __init__(self, source: str = DEFAULT_SOURCE):
+        self.source = source
+        with open(source, encoding='utf-8') as f:
+            catalogue = json.load(f)
+        fallback = {
+            key: set(Template(text).get_identifiers())
+            for key, text in catalogue[FALLBACK_LANGUAGE]['templates'].items()
+        }
+        self._templates = {}
+        # local crop name -> knowledge base crop, and (language, crop) -> name shown to the farmer
+        self.crop_aliases = {}
+        self._crop_names = {}
+        self._direct_words = {}
+        for language, entry in catalogue.items():
+            language = sys.intern(language)
+            for key, text in entry.get('templates', {}).items():
+                fields = set(Template(text).get_identifiers())
+                if key not in fallback or not fields <= fallback[key]:
+                    logger.warning("Skipping %s response template '%s': placeholders differ from %s",
+                                   language, key, FALLBACK_LANGUAGE)
+                    continue
+                self._templates[(language, sys.intern(key))] = Template(text) if fields else text
+            for name, crop in entry.get('crops', {}).items():
+                self.crop_aliases[name.lower()] = crop
+                self._crop_names.setdefault((language, crop), name)
+            self._direct_words[language] = frozenset(word.lower() for word in entry.get('direct_words', []))
+        # Farmers mix English into local-language questions
+        fallback_words = self._direct_words.get(FALLBACK_LANGUAGE, frozenset())
+        self._direct_words = {language: words | fallback_words for language, words in self._direct_words.items()}
+
+    @classmethod
+    def from_env(cls) -> 'ResponseCatalogue':
+        """Load the catalogue named by RESPONSE_CATALOGUE (default data/responses.json)"""
+        return cls(os.getenv('RESPONSE_CATALOGUE', DEFAULT_SOURCE))
+
+    def render(self, language: str, key: str, **params) -> str:
+        """The answer for key in language (English if it has no translation), with params substituted"""
+        template = self._templates.get((language, key)) or self._templates[(FALLBACK_LANGUAGE, key)]
+        return template if isinstance(template, str) else template.substitute(params)
+
+    def direct_words(self, language: str) -> frozenset:
+        """Words besides the topic itself that a directly answered question may contain"""
+        return self._direct_words.get(language) or self._direct_words.get(FALLBACK_LANGUAGE, frozenset())
+
+    def crop_name(self, language: str, crop: str) -> str:
+        """The local name of a knowledge base crop, or the crop itself if the catalogue has none"""
+        return self._crop_names.get((language, crop), crop)
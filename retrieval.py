@@ -0,0 +1,186 @@
+import re
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset(
+    'a an and are as at be by can do does for from how i in is it my of on or should '
+    'the to what when where which who why will with you your me we our this that '
+    'about tell please know give show explain info information some any would could like want there'.split()
+)
+
+
+def _stem(word: str) -> str:
+    """Very light suffix stripping so 'planting'/'plants' match 'plant' and 'spacing' matches 'space'"""
+    for suffix in ('ing', 'ed', 'es', 's'):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    if word.endswith('e') and len(word) > 3:
+        word = word[:-1]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased, stemmed content words of text"""
+    return [_stem(w) for w in _WORD_RE.findall(text.lower()) if w not in STOPWORDS]
+
+
+class HashingVectorizer:
+    """Map text to a fixed-size vector of hashed word unigrams and bigrams.
+
+    crc32 is used instead of hash() so vectors are identical in every worker
+    process regardless of PYTHONHASHSEED.
+    """
+
+    def __init__(self, n_features: int = 1 << 18):
+        self.n_features = n_features
+
+    def features(self, text: str) -> List[int]:
+        words = tokenize(text)
+        grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        return [zlib.crc32(g.encode('utf-8')) % self.n_features for g in grams]
+
+    def counts(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (feature indices, counts) for the non-zero features of text"""
+        indices, counts = np.unique(np.array(self.features(text), dtype=np.int64), return_counts=True)
+        return indices, counts.astype(np.float32)
+
+
+class RetrievalIndex:
+    """TF-IDF index over short text snippets, queried with one sparse matrix-vector product.
+
+    Document vectors are L2-normalized and stored column-wise (CSC layout: one
+    run of (document, weight) pairs per hashed feature), so memory grows with
+    the number of distinct words per snippet rather than the feature space,
+    and scoring a query only touches the columns of its few non-zero features.
+
+    A snippet whose metadata has 'terms' (its crop, pest, disease or topic
+    words) only matches a query sharing one of them, so a fact is never
+    returned just because its free text happens to contain a query word.
+    """
+
+    def __init__(self, snippets: List[str], metadata: Optional[List[Dict]] = None,
+                 n_features: int = 1 << 18):
+        self.vectorizer = HashingVectorizer(n_features)
+        self.snippets = list(snippets)
+        self.metadata = metadata or [{} for _ in self.snippets]
+
+        # content term -> snippets listing it; snippets without terms match on any word
+        term_docs = {}
+        free = []
+        for row, meta in enumerate(self.metadata):
+            if 'terms' not in meta:
+                free.append(row)
+            for term in set(tokenize(meta.get('terms', ''))):
+                term_docs.setdefault(term, []).append(row)
+        self._term_docs = {term: np.array(rows, dtype=np.int64) for term, rows in term_docs.items()}
+        self._free_docs = np.array(free, dtype=np.int64)
+
+        rows, cols, values = [], [], []
+        for row, snippet in enumerate(self.snippets):
+            indices, counts = self.vectorizer.counts(snippet)
+            rows.append(np.full(len(indices), row, dtype=np.int32))
+            cols.append(indices)
+            values.append(1.0 + np.log(counts))
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int32)
+        cols = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+        values = np.concatenate(values).astype(np.float32) if values else np.zeros(0, dtype=np.float32)
+
+        document_frequency = np.bincount(cols, minlength=n_features)
+        self.idf = (np.log((1.0 + len(self.snippets)) / (1.0 + document_frequency)) + 1.0).astype(np.float32)
+        values *= self.idf[cols]
+        norms = np.sqrt(np.bincount(rows, weights=values ** 2, minlength=len(self.snippets)))
+        norms[norms == 0] = 1.0
+        values /= norms[rows].astype(np.float32)
+
+        order = np.argsort(cols, kind='stable')
+        self._rows = rows[order]
+        self._values = values[order]
+        self._indptr = np.concatenate(([0], np.cumsum(document_frequency))).astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self.snippets)
+
+    def search(self, query: str, k: int = 3, min_score: float = 0.1) -> List[Tuple[float, str, Dict]]:
+        """Return up to k (score, snippet, metadata) tuples by cosine similarity"""
+        if not self.snippets:
+            return []
+        indices, counts = self.vectorizer.counts(query)
+        if len(indices) == 0:
+            return []
+        weights = (1.0 + np.log(counts)) * self.idf[indices]
+        weights /= np.linalg.norm(weights)
+        starts = self._indptr[indices]
+        lengths = self._indptr[indices + 1] - starts
+        if not lengths.any():
+            return []
+        postings = np.concatenate([np.arange(s, s + n) for s, n in zip(starts, lengths)])
+        scores = np.bincount(
+            self._rows[postings],
+            weights=self._values[postings] * np.repeat(weights, lengths),
+            minlength=len(self.snippets)
+        )
+        allowed = np.zeros(len(self.snippets), dtype=bool)
+        allowed[self._free_docs] = True
+        for term in set(tokenize(query)):
+            if term in self._term_docs:
+                allowed[self._term_docs[term]] = True
+        scores[~allowed] = 0.0
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (float(scores[i]), self.snippets[i], self.metadata[i])
+            for i in top if scores[i] >= min_score
+        ]
+
+
+def knowledge_base_snippets(knowledge_base: Dict) -> Tuple[List[str], List[Dict]]:
+    """Flatten the chatbot knowledge base into one-fact snippets with metadata.
+
+    Each snippet's 'terms' are its subject (crop, pest, disease, soil, region
+    or weather topic and field label), not its free-text value.
+    """
+    snippets = []
+    metadata = []
+    labels = {
+        'planting_season': 'planting season (when to plant)',
+        'harvest_time': 'harvest time (when to harvest)',
+        'water_needs': 'water needs',
+        'soil_type': 'best soil type',
+        'spacing': 'plant spacing (how far apart)',
+        'fertilizer': 'fertilizer'
+    }
+    for crop, info in knowledge_base.get('crops', {}).items():
+        name = crop.title()
+        for field, label in labels.items():
+            if info.get(field):
+                snippets.append(f"{name} {label}: {info[field]}.")
+                metadata.append({'crop': crop, 'field': field, 'terms': f"{name} {label}"})
+        if info.get('pests'):
+            snippets.append(f"{name} common pests: {', '.join(info['pests'])}.")
+            metadata.append({'crop': crop, 'field': 'pests', 'terms': snippets[-1]})
+        if info.get('diseases'):
+            snippets.append(f"{name} common diseases: {', '.join(info['diseases'])}.")
+            metadata.append({'crop': crop, 'field': 'diseases', 'terms': snippets[-1]})
+        if info.get('regions'):
+            snippets.append(f"{name} growing regions (where grown): {', '.join(info['regions'])}.")
+            metadata.append({'crop': crop, 'field': 'regions', 'terms': snippets[-1]})
+    for field, value in knowledge_base.get('weather_patterns', {}).items():
+        snippets.append(f"Zambia {field.replace('_', ' ')} (weather, rain): {value}.")
+        metadata.append({'topic': 'weather', 'field': field,
+                         'terms': f"Zambia {field.replace('_', ' ')} weather rain"})
+    for soil, advice in knowledge_base.get('soil_types', {}).items():
+        snippets.append(f"{soil.title()} soil: {advice}.")
+        metadata.append({'topic': 'soil', 'field': soil, 'terms': f"{soil} soil"})
+    for region, info in knowledge_base.get('regions', {}).items():
+        snippets.append(
+            f"{region} Province: agro-ecological region {info['agro_ecological_region']}, "
+            f"rainfall {info['rainfall']}."
+        )
+        metadata.append({'topic': 'region', 'field': region, 'terms': f"{region} province rainfall"})
+    return snippets, metadata
@@ -0,0 +1,213 @@
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from metrics import record_cache_lookup
+from retrieval import tokenize
+
+
+# Words that flip or narrow a question without moving its vector much, so two
+# questions only share an answer when they agree on them. Local-language
+# entries are starter vocabulary, like the intent keyword tables.
+NEGATION_WORDS = frozenset([
+    'not', 'no', 'never', 'without', 'cannot', 'dont', 'doesnt', 'didnt', 'cant', 'wont', 'shouldnt',
+    'isnt', 'arent', 'avoid',
+    'ayi', 'osati',  # Nyanja
+    'awe', 'te',  # Bemba
+    'pe',  # Tonga
+])
+QUALIFIER_WORDS = frozenset([
+    'dry', 'wet', 'rainy', 'cold', 'hot', 'season', 'winter', 'summer', 'early', 'late', 'before', 'after',
+    'during', 'now', 'today', 'tomorrow',
+    'january', 'february', 'march', 'april', 'may', 'june', 'july', 'august', 'september', 'october',
+    'november', 'december',
+    'chilimwe', 'dzinja',  # Nyanja
+    'cilimwe', 'mainsa',  # Bemba
+    'cilimo', 'mainza',  # Tonga
+])
+
+_WORD_RE = re.compile(r"[a-z]+(?:['’]t\b)?")
+
+
+def question_qualifiers(message: str) -> Tuple[List[str], List[str]]:
+    """(negation, qualifiers) in message: ['not'] if it is negated, and the season and time words it uses"""
+    words = _WORD_RE.findall(message.lower())
+    # Any n't contraction negates ("haven't", "shouldn’t")
+    negated = any(word in NEGATION_WORDS or word.endswith(("'t", '’t')) for word in words)
+    return (['not'] if negated else []), [word for word in words if word in QUALIFIER_WORDS]
+
+
+class QuestionVectorizer:
+    """Embed a question as a dense, L2-normalized vector without any network call.
+
+    Stemmed content words and their character trigrams are hashed into ``dim``
+    signed buckets, so "what month do I plant my maize" lands close to "when
+    should I plant maize?" and small spelling differences still overlap.
+    """
+
+    def __init__(self, dim: int = 256, char_weight: float = 0.35):
+        self.dim = dim
+        self.char_weight = char_weight
+
+    def _hash(self, feature: str):
+        h = zlib.crc32(feature.encode('utf-8'))
+        return h % self.dim, 1.0 if h & 0x80000000 else -1.0
+
+    def vectorize(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in tokenize(text):
+            index, sign = self._hash(word)
+            vector[index] += sign
+            padded = f"<{word}>"
+            for i in range(len(padded) - 2):
+                index, sign = self._hash('#' + padded[i:i + 3])
+                vector[index] += sign * self.char_weight
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class _Partition:
+    """Growable matrix of question vectors with the answers stored alongside"""
+
+    __slots__ = ('vectors', 'expires', 'ids', 'size')
+
+    def __init__(self, dim: int):
+        self.vectors = np.zeros((16, dim), dtype=np.float32)
+        self.expires = np.zeros(16, dtype=np.float64)
+        self.ids = [None] * 16
+        self.size = 0
+
+    def append(self, entry_id: int, vector: np.ndarray, expires_at: float) -> int:
+        if self.size == len(self.ids):
+            capacity = 2 * self.size
+            self.vectors = np.resize(self.vectors, (capacity, self.vectors.shape[1]))
+            self.expires = np.resize(self.expires, capacity)
+            self.ids.extend([None] * (capacity - self.size))
+        slot = self.size
+        self.vectors[slot] = vector
+        self.expires[slot] = expires_at
+        self.ids[slot] = entry_id
+        self.size += 1
+        return slot
+
+    def remove(self, slot: int) -> Optional[int]:
+        """Swap the last row into slot; return the id of the moved entry, if any"""
+        last = self.size - 1
+        moved = None
+        if slot != last:
+            self.vectors[slot] = self.vectors[last]
+            self.expires[slot] = self.expires[last]
+            self.ids[slot] = moved = self.ids[last]
+        self.ids[last] = None
+        self.size = last
+        return moved
+
+
+class SemanticCache:
+    """Answer cache matching questions by meaning rather than exact text.
+
+    Entries are grouped into partitions chosen by the caller (language plus
+    the crops, places and numbers a question mentions), so "plant maize" never
+    matches "plant cassava" and each lookup is one matrix-vector product over
+    a single partition instead of the whole cache. The oldest entry is evicted
+    once max_entries is reached; expired entries are skipped at lookup.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 21600,
+                 threshold: float = 0.75, dim: int = 256):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.vectorizer = QuestionVectorizer(dim)
+        self._partitions = {}
+        # entry id -> [partition key, slot, question, answer], oldest first
+        self._entries = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _nearest(self, partition: Optional[_Partition], vector: np.ndarray, now: float):
+        if partition is None or partition.size == 0:
+            return None, 0.0
+        scores = partition.vectors[:partition.size] @ vector
+        scores[partition.expires[:partition.size] <= now] = -1.0
+        slot = int(np.argmax(scores))
+        return slot, float(scores[slot])
+
+    def get(self, question: str, partition_key: Hashable) -> Optional[Any]:
+        """Return the answer stored for the most similar question, if similar enough"""
+        if self.max_entries <= 0:
+            return None
+        vector = self.vectorizer.vectorize(question)
+        with self._lock:
+            partition = self._partitions.get(partition_key)
+            slot, score = self._nearest(partition, vector, time.monotonic())
+            hit = slot is not None and score >= self.threshold
+            if hit:
+                self.hits += 1
+                answer = self._entries[partition.ids[slot]][3]
+            else:
+                self.misses += 1
+        record_cache_lookup('semantic', hit)
+        return answer if hit else None
+
+    def set(self, question: str, partition_key: Hashable, answer: Any) -> None:
+        """Store answer for question, replacing a near-identical cached question"""
+        if self.max_entries <= 0:
+            return
+        vector = self.vectorizer.vectorize(question)
+        now = time.monotonic()
+        with self._lock:
+            partition = self._partitions.get(partition_key)
+            slot, score = self._nearest(partition, vector, now)
+            if slot is not None and score >= 0.98:
+                self._remove(partition.ids[slot])
+            partition = self._partitions.setdefault(partition_key, _Partition(self.vectorizer.dim))
+            entry_id = self._next_id
+            self._next_id += 1
+            slot = partition.append(entry_id, vector, now + self.ttl)
+            self._entries[entry_id] = [partition_key, slot, question, answer]
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, entry_id: int) -> None:
+        partition_key, slot, _, _ = self._entries.pop(entry_id)
+        partition = self._partitions[partition_key]
+        moved = partition.remove(slot)
+        if moved is not None:
+            self._entries[moved][1] = slot
+        if partition.size == 0:
+            del self._partitions[partition_key]
+
+    def clear(self) -> None:
+        """Drop every cached entry (counters are kept)"""
+        with self._lock:
+            self._partitions.clear()
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'partitions': len(self._partitions),
+                'max_entries': self.max_entries,
+                'threshold': self.threshold,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+def partition_key(language: str, *entities: List[str]) -> tuple:
+    """Partition key from a language and the entities a question mentions"""
+    return (language.lower(),) + tuple(tuple(sorted(set(group))) for group in entities)
@@ -0,0 +1,152 @@
+import os
+import re
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+from cache import ResponseCache, create_cache, make_cache_key
+
+FARMER = 'Farmer'
+ASSISTANT = 'Assistant'
+EARLIER = 'Earlier'
+
+_SENTENCE_RE = re.compile(r"(?<=[.?!])\s")
+
+
+def _compact(text: str, limit: int) -> str:
+    """Collapse whitespace so a turn is one line, and cap its length"""
+    text = ' '.join(text.split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + '…'
+
+
+def summarize_turn(speaker: str, text: str, limit: int = 120) -> str:
+    """Extractive summary of a turn leaving the window: the first sentence of a farmer's message.
+
+    Assistant answers are not kept; the questions carry the thread of the
+    conversation and cost far fewer tokens.
+    """
+    if speaker != FARMER:
+        return ''
+    return _compact(_SENTENCE_RE.split(text, 1)[0], limit)
+
+
+class Conversation:
+    """Ring buffer of the last max_turns turns plus a rolling summary of older ones"""
+
+    __slots__ = ('turns', 'summary')
+
+    def __init__(self, max_turns: int, turns=(), summary: str = ''):
+        self.turns = deque(turns, maxlen=max_turns)
+        self.summary = summary
+
+    def to_json(self) -> List:
+        return [self.summary, [list(turn) for turn in self.turns]]
+
+    @classmethod
+    def from_json(cls, data: List, max_turns: int) -> 'Conversation':
+        summary, turns = data
+        return cls(max_turns, (tuple(turn) for turn in turns), summary)
+
+
+class SessionStore:
+    """Conversation history per session id for multi-turn chat.
+
+    Each session keeps its last max_turns turns (each capped at
+    max_turn_chars) in a ring buffer; turns pushed out are folded into a short
+    summary of at most summary_chars when summarize is on. Sessions live in
+    the configured cache backend, so with CACHE_BACKEND=sqlite every worker
+    sees the same history. The backend holds at most max_sessions sessions,
+    evicting the least recently active, and drops sessions idle for idle_ttl
+    seconds, which bounds memory at roughly
+    max_sessions * max_turns * max_turn_chars.
+    """
+
+    def __init__(self, max_sessions: int = 5000, max_turns: int = 8, max_turn_chars: int = 800,
+                 idle_ttl: float = 3600, summarize: bool = True, summary_chars: int = 400):
+        self.max_turns = max_turns
+        self.max_turn_chars = max_turn_chars
+        self.summarize = summarize
+        self.summary_chars = summary_chars
+        self.cache = create_cache('sessions', max_entries=max_sessions, ttl=idle_ttl)
+        # In-memory backend: conversations are stored as live objects, not JSON
+        self._in_memory = isinstance(self.cache, ResponseCache)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'SessionStore':
+        """Build a store configured from SESSION_* variables"""
+        return cls(
+            max_sessions=int(os.getenv('SESSION_MAX_SESSIONS', '5000')),
+            max_turns=int(os.getenv('SESSION_MAX_TURNS', '8')),
+            max_turn_chars=int(os.getenv('SESSION_MAX_TURN_CHARS', '800')),
+            idle_ttl=float(os.getenv('SESSION_IDLE_TTL', '3600')),
+            summarize=os.getenv('SESSION_SUMMARY', 'true').lower() in ('1', 'true', 'yes')
+        )
+
+    @staticmethod
+    def _key(session_id: str) -> str:
+        return make_cache_key('session', session_id)
+
+    def _load(self, key: str) -> Optional[Conversation]:
+        value = self.cache.get(key)
+        if value is None or self._in_memory:
+            return value
+        return Conversation.from_json(value, self.max_turns)
+
+    def _save(self, key: str, conversation: Conversation) -> None:
+        self.cache.set(key, conversation if self._in_memory else conversation.to_json())
+
+    def history(self, session_id: Optional[str]) -> List[str]:
+        """The session's conversation as lines: an 'Earlier: ...' summary, then 'Farmer: ...' / 'Assistant: ...' turns"""
+        if not session_id or self.max_turns <= 0:
+            return []
+        with self._lock:
+            conversation = self._load(self._key(session_id))
+            if conversation is None:
+                return []
+            lines = [f"{EARLIER}: {conversation.summary}"] if conversation.summary else []
+            lines.extend(f"{speaker}: {text}" for speaker, text in conversation.turns)
+        return lines
+
+    def append(self, session_id: Optional[str], user_message: str, answer: Optional[str]) -> None:
+        """Record one question/answer exchange, pushing the oldest turns out of the window"""
+        if not session_id or self.max_turns <= 0 or not answer:
+            return
+        key = self._key(session_id)
+        with self._lock:
+            conversation = self._load(key) or Conversation(self.max_turns)
+            for speaker, text in ((FARMER, user_message), (ASSISTANT, answer)):
+                if len(conversation.turns) == self.max_turns:
+                    oldest = conversation.turns[0]
+                    if self.summarize:
+                        conversation.summary = self._fold(conversation.summary, *oldest)
+                conversation.turns.append((speaker, _compact(text, self.max_turn_chars)))
+            self._save(key, conversation)
+
+    def _fold(self, summary: str, speaker: str, text: str) -> str:
+        """Add a turn leaving the window to the summary, dropping the oldest summary text if too long"""
+        point = summarize_turn(speaker, text)
+        if not point:
+            return summary
+        summary = f"{summary} | {point}" if summary else point
+        if len(summary) > self.summary_chars:
+            summary = '…' + summary[-(self.summary_chars - 1):].split(' | ', 1)[-1]
+        return summary
+
+    def clear(self, session_id: str) -> None:
+        """Forget a session's history"""
+        self.cache.delete(self._key(session_id))
+
+    def stats(self) -> Dict:
+        return self.cache.stats()
+
+
+def history_messages(lines: List[str]) -> List[Dict[str, str]]:
+    """Turn history lines back into chat messages (the summary line is skipped; it goes in the system prompt)"""
+    roles = {FARMER: 'user', ASSISTANT: 'assistant'}
+    messages = []
+    for line in lines:
+        speaker, _, text = line.partition(': ')
+        if speaker in roles:
+            messages.append({'role': roles[speaker], 'content': text})
+    return messages
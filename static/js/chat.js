@@ -9,11 +9,24 @@ class ZambianFarmerChatbot {
         this.chatPopup = document.getElementById('chatPopup');
         this.closeChat = document.getElementById('closeChat');
         this.currentLanguage = 'english';
+        this.sessionId = this.getSessionId();
         
         this.initializeEventListeners();
         this.addWelcomeMessage();
     }
 
+    getSessionId() {
+        // One conversation per browser tab, so follow-up questions keep their context
+        let sessionId = sessionStorage.getItem('chatSessionId');
+        if (!sessionId) {
+            sessionId = window.crypto && crypto.randomUUID
+                ? crypto.randomUUID()
+                : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+            sessionStorage.setItem('chatSessionId', sessionId);
+        }
+        return sessionId;
+    }
+
     initializeEventListeners() {
         // Floating robot click to open chat
         this.floatingRobot.addEventListener('click', () => this.openChat());
@@ -125,31 +138,52 @@ What would you like to know about farming in Zambia?`,
         this.showLoading();
 
         try {
-            // Send to backend
-            const response = await fetch('/api/chat', {
+            // Stream the answer from the backend as Server-Sent Events
+            const response = await fetch('/api/chat/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                 },
                 body: JSON.stringify({
                     message: message,
-                    language: this.currentLanguage
+                    language: this.currentLanguage,
+                    session_id: this.sessionId
                 })
             });
 
-            const data = await response.json();
-
-            if (data.error) {
-                throw new Error(data.error);
+            if (!response.ok || !response.body) {
+                const data = await response.json().catch(() => ({}));
+                throw new Error(data.error || `Request failed (${response.status})`);
             }
 
-            // Add bot response
+            // Render the bot message on the first token and grow it as tokens arrive
             const botMessage = {
                 type: 'bot',
-                content: data.response,
+                content: '',
                 timestamp: new Date()
             };
-            this.addMessage(botMessage);
+            let contentElement = null;
+
+            await this.readEventStream(response, (event) => {
+                if (event.type === 'error') {
+                    throw new Error(event.error);
+                }
+                if (event.type !== 'token') {
+                    return;
+                }
+                botMessage.content += event.content;
+                if (!contentElement) {
+                    this.hideLoading();
+                    contentElement = this.addMessage(botMessage);
+                } else {
+                    this.renderMessageContent(contentElement, botMessage);
+                    this.scrollToBottom();
+                }
+            });
+
+            if (!contentElement) {
+                throw new Error('Empty response');
+            }
 
         } catch (error) {
             console.error('Error sending message:', error);
@@ -159,6 +193,33 @@ What would you like to know about farming in Zambia?`,
         }
     }
 
+    async readEventStream(response, onEvent) {
+        // Minimal SSE parser: events are separated by a blank line, payload is JSON in "data:" lines
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const rawEvent = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                const data = rawEvent
+                    .split('\n')
+                    .filter(line => line.startsWith('data:'))
+                    .map(line => line.slice(5).trim())
+                    .join('\n');
+                if (data) {
+                    onEvent(JSON.parse(data));
+                }
+            }
+        }
+    }
+
     handleQuickAction(action) {
         const actionMessages = {
             weather: "Tell me about the weather and climate for farming in Zambia",
@@ -237,18 +298,23 @@ What would you like to know about farming in Zambia?`,
 
         const content = document.createElement('div');
         content.className = 'message-content';
-        content.innerHTML = this.formatMessageContent(message.content);
+        this.renderMessageContent(content, message);
 
-        const time = document.createElement('div');
-        time.className = 'message-time';
-        time.textContent = this.formatTime(message.timestamp);
-
-        content.appendChild(time);
         messageElement.appendChild(avatar);
         messageElement.appendChild(content);
 
         this.chatMessages.appendChild(messageElement);
         this.scrollToBottom();
+        return content;
+    }
+
+    renderMessageContent(contentElement, message) {
+        contentElement.innerHTML = this.formatMessageContent(message.content);
+
+        const time = document.createElement('div');
+        time.className = 'message-time';
+        time.textContent = this.formatTime(message.timestamp);
+        contentElement.appendChild(time);
     }
 
     addSystemMessage(content) {
@@ -0,0 +1,36 @@
+import importlib
+
+import jwt
+import pytest
+
+SECRET = 'test-secret-at-least-32-bytes-long'
+
+
+@pytest.fixture(scope='module')
+def app_module(tmp_path_factory):
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv('LOG_FILE', str(tmp_path_factory.mktemp('logs') / 'app.log'))
+        mp.setenv('SUPABASE_JWT_SECRET', SECRET)
+        yield importlib.import_module('app')
+
+
+def token(**claims):
+    return jwt.encode(dict(claims, aud='authenticated'), SECRET, algorithm='HS256')
+
+
+def test_claimed_identity_is_not_used_for_limits(app_module):
+    email, phone, verified = app_module.authenticate({}, email='a@x.com')
+    assert (email, verified) == ('a@x.com', False)
+    assert app_module.ask_identity(email, phone, verified) is None
+
+
+def test_verified_token_identity_is_used_for_limits(app_module):
+    headers = {'Authorization': f"Bearer {token(email='A@x.com')}"}
+    email, phone, verified = app_module.authenticate(headers, email='someone@else.com')
+    assert verified
+    assert app_module.ask_identity(email, phone, verified) == 'email:a@x.com'
+
+
+def test_invalid_token_is_rejected(app_module):
+    with pytest.raises(PermissionError):
+        app_module.authenticate({'Authorization': 'Bearer not-a-token'})
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+from rate_limit import MemoryCounterStore, RateLimiter
+
+
+def completion(answer, prompt_tokens=100, completion_tokens=20):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=answer))],
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    )
+
+
+class SlowCompletions:
+    """Fake chat.completions that takes long enough for identical questions to coalesce"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, **params):
+        self.calls += 1
+        time.sleep(0.2)
+        return completion('Plant maize with the first rains.')
+
+
+class SlowAsyncCompletions(SlowCompletions):
+    async def create(self, **params):
+        self.calls += 1
+        await asyncio.sleep(0.2)
+        return completion('Plant maize with the first rains.')
+
+
+def test_coalesced_completion_is_charged_to_every_farmer(bot):
+    completions = SlowCompletions()
+    bot._openai_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    limiter = RateLimiter(MemoryCounterStore())
+
+    def ask(farmer):
+        with limiter.charging(farmer):
+            return bot._get_openai_response('When should I plant maize?', 'english')
+
+    threads = [threading.Thread(target=ask, args=(farmer,)) for farmer in ('alice', 'bob')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert completions.calls == 1
+    assert limiter.tokens_used('alice') == limiter.tokens_used('bob') == 120
+
+
+def test_coalesced_async_completion_is_charged_to_every_farmer(bot):
+    completions = SlowAsyncCompletions()
+    bot._async_openai_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    limiter = RateLimiter(MemoryCounterStore())
+
+    async def ask(farmer):
+        with limiter.charging(farmer):
+            return await bot._get_openai_response_async('When should I plant maize?', 'english')
+
+    async def main():
+        return await asyncio.gather(ask('alice'), ask('bob'))
+
+    assert asyncio.run(main()) == ['Plant maize with the first rains.'] * 2
+    assert completions.calls == 1
+    assert limiter.tokens_used('alice') == limiter.tokens_used('bob') == 120
+
+
+def direct_answer(bot, message, language):
+    return bot._get_direct_answer(message, language, bot.intent_classifier.classify(message))
+
+
+def test_topic_only_message_is_answered_directly(bot):
+    assert direct_answer(bot, 'chimanga', 'njanja')
+    assert direct_answer(bot, 'ndiuzeni za chimanga', 'njanja')
+
+
+def test_message_saying_more_than_the_topic_goes_to_the_llm(bot):
+    assert direct_answer(bot, 'chimanga changa chili ndi masamba achikasu', 'njanja') is None
+    assert direct_answer(bot, 'mtengo wa chimanga', 'njanja') is None
@@ -0,0 +1,40 @@
+from circuit_breaker import CircuitBreaker
+
+
+def breaker():
+    return CircuitBreaker('test_upstream', max_timeout=10, min_timeout=0.5, min_samples=5,
+                          failure_threshold=100)
+
+
+def test_timeout_follows_recent_latency():
+    cb = breaker()
+    assert cb.timeout() == 10
+    for _ in range(5):
+        cb.record_success(0.5)
+    assert cb.timeout() == 1.0
+
+
+def test_timed_out_call_widens_the_timeout_and_drops_old_samples():
+    cb = breaker()
+    for _ in range(5):
+        cb.record_success(0.5)
+    cb.record_failure(timed_out=True)
+    assert cb.timeout() == 2.0
+    cb.record_failure(timed_out=True)
+    cb.record_failure(timed_out=True)
+    cb.record_failure(timed_out=True)
+    assert cb.timeout() == 10
+    # Four new samples are not enough to shrink it again
+    for _ in range(4):
+        cb.record_success(0.5)
+    assert cb.timeout() == 10
+
+
+def test_kinds_keep_separate_timeouts():
+    cb = breaker()
+    for _ in range(5):
+        cb.record_success(0.5, kind='stream')
+        cb.record_success(2.0)
+    cb.record_failure('stream', timed_out=True)
+    assert cb.timeout('stream') == 2.0
+    assert cb.timeout() == 4.0
@@ -0,0 +1,64 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from farm_profile import FarmProfileStore
+
+
+def farmer(name):
+    return {'data': {'full_name': name, 'farms': []}}
+
+
+class Lookups:
+    """Fake Supabase lookup that records every call"""
+
+    def __init__(self, users):
+        self.users = users
+        self.calls = []
+
+    def __call__(self, email=None, phone=None):
+        self.calls.append((email, phone))
+        return self.users.get((email, phone))
+
+
+def test_phone_only_lookup_does_not_reuse_email_and_phone_profile():
+    fetch = Lookups({('a@x.com', '+260111'): farmer('Alice'), (None, '+260111'): None})
+    store = FarmProfileStore()
+
+    assert store.get(fetch, email='a@x.com', phone='+260111')['full_name'] == 'Alice'
+    assert store.get(fetch, phone='+260111') == {'found': False}
+    assert fetch.calls == [('a@x.com', '+260111'), (None, '+260111')]
+
+
+def test_repeated_lookup_is_cached():
+    fetch = Lookups({('a@x.com', None): farmer('Alice')})
+    store = FarmProfileStore()
+
+    store.get(fetch, email='a@x.com')
+    store.get(fetch, email=' A@X.com ')
+    assert fetch.calls == [('a@x.com', None)]
+
+
+def test_invalidate_drops_every_lookup_made_with_the_identity():
+    fetch = Lookups({('a@x.com', '+260111'): farmer('Alice'), ('a@x.com', None): farmer('Alice')})
+    store = FarmProfileStore()
+    store.get(fetch, email='a@x.com', phone='+260111')
+    store.get(fetch, email='a@x.com')
+
+    assert store.invalidate(email='a@x.com') == 2
+    assert store.invalidate(email='a@x.com') == 0
+
+    store.get(fetch, email='a@x.com', phone='+260111')
+    store.get(fetch, phone='+260111')
+    assert store.invalidate(phone='+260 111') == 2
+
+
+def test_concurrent_lookups_keep_every_alias_on_shared_cache(monkeypatch, tmp_path):
+    monkeypatch.setenv('CACHE_BACKEND', 'sqlite')
+    monkeypatch.setenv('CACHE_PATH', str(tmp_path / 'cache.db'))
+    phones = [f'+260{i:06d}' for i in range(20)]
+    fetch = Lookups({('a@x.com', phone): farmer('Alice') for phone in phones})
+    store = FarmProfileStore()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda phone: store.get(fetch, email='a@x.com', phone=phone), phones))
+
+    assert store.invalidate(email='a@x.com') == len(phones)
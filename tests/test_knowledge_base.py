@@ -0,0 +1,24 @@
+import pytest
+
+from knowledge_base import KnowledgeBase
+
+
+@pytest.fixture
+def kb(tmp_path):
+    return KnowledgeBase(path=str(tmp_path / 'knowledge.db'))
+
+
+def names(kb, kind, text):
+    return [match['name'] for match in kb.find_terms(kind, text)]
+
+
+def test_terms_match_whole_words_only(kb):
+    assert names(kb, 'disease', "I don't trust this seed") == []
+    assert names(kb, 'disease', 'rusty tools') == []
+    assert names(kb, 'disease', 'my beans have rust') == ['Rust']
+
+
+def test_plural_and_multi_word_terms(kb):
+    assert names(kb, 'pest', 'fall armyworms everywhere') == ['Fall armyworm']
+    assert 'maize' in kb.find_terms('pest', 'aphids on cabbage')[0]['crops']
+    assert names(kb, 'region', 'I live in Eastern province') == ['Eastern']
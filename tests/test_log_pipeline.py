@@ -0,0 +1,24 @@
+from log_pipeline import StreamWithFields, annotate
+
+
+def test_annotations_while_streaming_land_in_the_request_fields():
+    def chunks():
+        annotate(tokens=3)
+        yield b'a'
+        yield b'b'
+
+    closed = []
+    fields = {}
+    body = StreamWithFields(chunks(), fields, lambda: closed.append(True))
+    assert list(body) == [b'a', b'b']
+    body.close()
+    assert fields == {'tokens': 3}
+    assert closed == [True]
+
+
+def test_on_close_runs_when_the_client_leaves_before_the_first_chunk():
+    closed = []
+    body = StreamWithFields(iter([b'a']), {}, lambda: closed.append(True))
+    body.close()
+    body.close()
+    assert closed == [True]
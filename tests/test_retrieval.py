@@ -0,0 +1,27 @@
+import json
+import os
+
+from retrieval import RetrievalIndex, knowledge_base_snippets
+
+KNOWLEDGE_BASE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'knowledge_base.json')
+
+
+def index():
+    with open(KNOWLEDGE_BASE, encoding='utf-8') as f:
+        return RetrievalIndex(*knowledge_base_snippets(json.load(f)))
+
+
+def test_filler_words_do_not_match_fact_text():
+    results = index().search('tell me about rust', k=3, min_score=0.1)
+    assert results
+    assert all('rust' in snippet.lower() for _, snippet, _ in results)
+
+
+def test_fact_needs_a_shared_content_term():
+    # "months" only appears in harvest time values, never in a fact's subject
+    assert index().search('how many months', k=3, min_score=0.01) == []
+
+
+def test_crop_question_still_finds_its_fact():
+    score, snippet, _ = index().search('When should I plant maize?', k=1)[0]
+    assert snippet.startswith('Maize planting season')
@@ -0,0 +1,18 @@
+from semantic_cache import SemanticCache, question_qualifiers
+
+
+def test_negation_and_season_words_are_qualifiers():
+    assert question_qualifiers("Why hasn't my maize germinated?") == (['not'], [])
+    assert question_qualifiers('Can I plant beans in the dry season?') == ([], ['dry', 'season'])
+    assert question_qualifiers('When should I plant maize?') == ([], [])
+
+
+def test_negated_and_qualified_questions_do_not_share_answers(bot):
+    question = 'When should I plant beans?'
+    cache = SemanticCache()
+    cache.set(question, bot._semantic_partition(question, 'english'), 'Plant beans in February.')
+
+    for other in ('When should I not plant beans?', 'When should I plant beans in the dry season?'):
+        assert cache.get(other, bot._semantic_partition(other, 'english')) is None
+    paraphrase = 'What month do I plant beans?'
+    assert cache.get(paraphrase, bot._semantic_partition(paraphrase, 'english')) == 'Plant beans in February.'